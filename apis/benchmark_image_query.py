@@ -0,0 +1,167 @@
+"""
+Latency of the image query path for large paste-in images:
+
+    python apis/benchmark_image_query.py --min-side 384
+    python apis/benchmark_image_query.py --images a.png b.jpg \
+        --hub http://0.0.0.0:9181 --model siglip_v2 --repeats 20
+
+Offline, every image is pushed through the hub -> service leg of both paths
+on the CPU, without a model:
+  base64  full decode, RGB, JPEG encode, base64 + JSON, base64 decode, full decode
+  binary  draft decode + downscale to --min-side, JPEG encode, draft decode
+and the payload size and p50 / p99 time are reported. With --hub, the same
+images are also sent end to end to /hub/<model>_image_search, once as a
+data: URI form field and once as a multipart file.
+
+Without --images, a synthetic 3840x2160 frame is used as JPEG and as PNG
+(clipboard pastes usually arrive as PNG).
+"""
+
+import io
+import time
+import base64
+import argparse
+import ujson
+import numpy as np
+from PIL import Image
+
+from pathlib import Path
+import sys
+
+current_path = Path(__file__).resolve()
+for parent in current_path.parents:
+    if parent.name == "SIU_Pumpking":
+        #print(f"Adding {parent} to sys.path")
+        sys.path.append(str(parent))
+        break
+else:
+    raise RuntimeError("Could not find 'SIU_Pumpking' in the path hierarchy.")
+
+from utils.image_io import decode_image, encode_jpeg
+
+
+def synthetic_images(width=3840, height=2160, seed=0):
+    """(name, bytes) of a 4K frame with gradients and sensor-like noise."""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    frame = np.stack([(x / 15) % 256, (y / 8) % 256, ((x + y) / 20) % 256], axis=-1)
+    frame = np.clip(frame + rng.normal(0, 8, frame.shape), 0, 255).astype(np.uint8)
+    image = Image.fromarray(frame)
+    images = []
+    for fmt in ("JPEG", "PNG"):
+        buffered = io.BytesIO()
+        image.save(buffered, format=fmt)
+        images.append((f"4k.{fmt.lower()}", buffered.getvalue()))
+    return images
+
+
+def base64_path(data):
+    """Previous hub -> service leg: returns the JSON body size."""
+    image = Image.open(io.BytesIO(data))
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    buffered = io.BytesIO()
+    image.save(buffered, format="JPEG")
+    body = ujson.dumps({"image_data": base64.b64encode(buffered.getvalue()).decode("utf-8")})
+    Image.open(io.BytesIO(base64.b64decode(ujson.loads(body)["image_data"]))).convert("RGB")
+    return len(body)
+
+
+def binary_path(data, min_side):
+    """New hub -> service leg: returns the uploaded file size."""
+    payload = encode_jpeg(decode_image(data, min_side=min_side))
+    decode_image(payload, min_side=min_side)
+    return len(payload)
+
+
+def timed(fn, repeats):
+    latencies = np.empty(repeats, dtype=np.float64)
+    for i in range(repeats):
+        start = time.perf_counter()
+        size = fn()
+        latencies[i] = time.perf_counter() - start
+    return size, latencies
+
+
+def row(image, path, size, latencies):
+    return {
+        "image": image,
+        "path": path,
+        "bytes": size,
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 2),
+        "p99_ms": round(float(np.percentile(latencies, 99)) * 1000, 2),
+    }
+
+
+def benchmark_offline(images, min_side, repeats):
+    rows = []
+    for name, data in images:
+        size, latencies = timed(lambda: base64_path(data), repeats)
+        rows.append(row(name, "base64", size, latencies))
+        size, latencies = timed(lambda: binary_path(data, min_side), repeats)
+        rows.append(row(name, "binary", size, latencies))
+    return rows
+
+
+def benchmark_hub(images, hub, model, repeats, k):
+    import requests
+
+    url = f"{hub.rstrip('/')}/hub/{model}_image_search"
+    rows = []
+    for name, data in images:
+        mime = Image.open(io.BytesIO(data)).get_format_mimetype()
+        data_uri = f"data:{mime};base64," + base64.b64encode(data).decode("utf-8")
+        requests_by_path = {
+            "hub_base64": lambda: requests.post(
+                url, data={"image_path": data_uri, "k": k}
+            ),
+            "hub_binary": lambda: requests.post(
+                url, data={"k": k}, files={"image": (name, data, mime)}
+            ),
+        }
+        for path, send in requests_by_path.items():
+            # warm-up: first request pays for connection and model warm-up
+            send().raise_for_status()
+            latencies = np.empty(repeats, dtype=np.float64)
+            for i in range(repeats):
+                start = time.perf_counter()
+                response = send()
+                latencies[i] = time.perf_counter() - start
+                response.raise_for_status()
+            size = len(data_uri) if path == "hub_base64" else len(data)
+            rows.append(row(name, path, size, latencies))
+    return rows
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Image query path benchmark")
+    parser.add_argument("--images", nargs="*", default=None, help="query images to send")
+    parser.add_argument("--min-side", type=int, default=384, help="model input size")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--hub", default=None, help="hub base URL, e.g. http://0.0.0.0:9181")
+    parser.add_argument("--model", default="siglip_v2", choices=["siglip_v2", "metaclip", "metaclip_v2"])
+    parser.add_argument("--k", type=int, default=100)
+    parser.add_argument("--output", default=None, help="also write the results as JSON")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.images:
+        images = [(Path(path).name, Path(path).read_bytes()) for path in args.images]
+    else:
+        images = synthetic_images()
+
+    rows = benchmark_offline(images, args.min_side, args.repeats)
+    if args.hub:
+        rows += benchmark_hub(images, args.hub, args.model, args.repeats, args.k)
+
+    print(f"{'image':<16} {'path':<11} {'bytes':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for r in rows:
+        print(
+            f"{r['image']:<16} {r['path']:<11} {r['bytes']:>10} "
+            f"{r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f}"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            ujson.dump(rows, f, indent=2)
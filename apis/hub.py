@@ -35,6 +35,7 @@ else:
     raise RuntimeError("Could not find 'SIU_Pumpking' in the path hierarchy.")
 
 from configs.app import AppConfig
+from configs.hub_config import HubConfig
 from schema.api import APIResponse
 from utils.logger import get_logger, setup_logger
 
@@ -96,8 +97,9 @@ def setup_app() -> FastAPI:
     )
 
     app.add_middleware(
-        LimitUploadSizeMiddleware, max_upload_size=10 * 1024 * 1024
-    )  # 10 MB
+        LimitUploadSizeMiddleware,
+        max_upload_size=HubConfig().HUB_MAX_UPLOAD_MB * 1024 * 1024,
+    )
 
     # Set up templates
     templates_dir = BASE_DIR / "templates"
@@ -35,6 +35,8 @@ class METACLIPConfig:
                 raise FileNotFoundError(f"Feature path '{path}' does not exist")
 
         self.METACLIP_FEATURES_SIZE = int(os.getenv("METACLIP_FEATURES_SIZE", "1024"))
+        # model input resolution: query images are decoded / downscaled to it
+        self.METACLIP_IMAGE_SIZE = int(os.getenv("METACLIP_IMAGE_SIZE", "224"))
 
         self.METACLIP_DUMMY_VECTOR_PATH = os.getenv("METACLIP_DUMMY_VECTOR_PATH")
         assert (
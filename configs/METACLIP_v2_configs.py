@@ -39,6 +39,8 @@ class METACLIPV2Config:
         self.METACLIP_V2_FEATURES_SIZE = int(
             os.getenv("METACLIP_V2_FEATURES_SIZE", "1024")
         )
+        # model input resolution: query images are decoded / downscaled to it
+        self.METACLIP_V2_IMAGE_SIZE = int(os.getenv("METACLIP_V2_IMAGE_SIZE", "378"))
 
         self.METACLIP_V2_DUMMY_VECTOR_PATH = os.getenv("METACLIP_V2_DUMMY_VECTOR_PATH")
         assert (
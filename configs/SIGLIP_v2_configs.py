@@ -37,6 +37,8 @@ class SIGLIPV2Config:
                 raise FileNotFoundError(f"Feature path '{path}' does not exist")
 
         self.SIGLIP_V2_FEATURES_SIZE = int(os.getenv("SIGLIP_V2_FEATURES_SIZE", "1536"))
+        # model input resolution: query images are decoded / downscaled to it
+        self.SIGLIP_V2_IMAGE_SIZE = int(os.getenv("SIGLIP_V2_IMAGE_SIZE", "384"))
 
         self.SIGLIP_V2_DUMMY_VECTOR_PATH = os.getenv("SIGLIP_V2_DUMMY_VECTOR_PATH")
         assert (
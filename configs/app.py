@@ -1,6 +1,6 @@
 import os
 import ast
-from typing import List
+from typing import List, Optional
 
 
 class AppConfig:
@@ -26,12 +26,35 @@ class AppConfig:
         self.S2T_PATH: List[str] = ast.literal_eval(s2t_env)
 
         self.OBJECT_PATH: str = os.getenv("OBJECT_PATH")
+        # Optional root of the local transcript (BM25) indexes, one per collection
+        self.S2T_INDEX_PATH: Optional[str] = os.getenv("S2T_INDEX_PATH")
+
+        # Offline VLM shot captions (engine/VLMs/src/pipeline.py results.jsonl
+        # or exported JSON), the VLM shot JSON folder for results without a
+        # frame range, and the root of the caption (BM25) indexes
+        caption_env = os.getenv("CAPTION_PATH", "[]")
+        self.CAPTION_PATH: List[str] = ast.literal_eval(caption_env)
+        self.CAPTION_SHOT_DIR: Optional[str] = os.getenv("CAPTION_SHOT_DIR")
+        self.CAPTION_INDEX_PATH: Optional[str] = os.getenv("CAPTION_INDEX_PATH")
 
         fps_env = os.getenv("FPS_PATH", "[]")
         self.FPS_PATH: List[str] = ast.literal_eval(fps_env)
 
         shot_env = os.getenv("SHOT_PATH", "[]")
         self.SHOT_PATH: List[str] = ast.literal_eval(shot_env)
+
+        # Collection index profile: binary, scalar, product or none
+        # (engine/vector_database/index_profiles.py)
+        self.QDRANT_INDEX_PROFILE: str = os.getenv("QDRANT_INDEX_PROFILE", "binary")
+
+        # Search result cache behind pagination cursors
+        self.SEARCH_CACHE_TTL: int = int(os.getenv("SEARCH_CACHE_TTL", "600"))
+        self.SEARCH_CACHE_MAX_ENTRIES: int = int(
+            os.getenv("SEARCH_CACHE_MAX_ENTRIES", "256")
+        )
+        self.SEARCH_CACHE_MAX_ITEMS: int = int(
+            os.getenv("SEARCH_CACHE_MAX_ITEMS", "500000")
+        )
         # --- VALIDATIONS ---
 
         # Mandatory string values
@@ -63,8 +86,8 @@ class AppConfig:
                     f"{dir_var}='{dir_val}' does not exist or is not a directory"
                 )
 
-        # File check
-        if not os.path.isfile(self.OBJECT_PATH):
+        # File check (legacy total_json.json or an object store directory)
+        if not os.path.exists(self.OBJECT_PATH):
             raise FileNotFoundError(f"{self.OBJECT_PATH} does not exist")
 
         for path in self.S2T_PATH:
@@ -75,8 +98,18 @@ class AppConfig:
             if not os.path.isfile(path):
                 raise FileNotFoundError(f"FPS_PATH entry '{path}' does not exist")
 
+        for path in self.CAPTION_PATH:
+            if not os.path.isfile(path):
+                raise FileNotFoundError(f"CAPTION_PATH entry '{path}' does not exist")
+
+        valid_profiles = {"binary", "scalar", "product", "none"}
+        if self.QDRANT_INDEX_PROFILE not in valid_profiles:
+            raise ValueError(
+                f"QDRANT_INDEX_PROFILE '{self.QDRANT_INDEX_PROFILE}' is invalid. Must be one of {valid_profiles}"
+            )
+
         # LOWRES_FORMAT validation (example: jpg, png)
-        valid_formats = {".avif", ".jpg"}
+        valid_formats = {".avif", ".jpg", ".webp"}
         if self.LOWRES_FORMAT.lower() not in valid_formats:
             raise ValueError(
                 f"LOWRES_FORMAT '{self.LOWRES_FORMAT}' is invalid. Must be one of {valid_formats}"
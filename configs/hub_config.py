@@ -15,7 +15,11 @@ class HubConfig:
 
         self.HUB_MAX_WORKERS: int = int(os.getenv("HUB_MAX_WORKERS", "5"))
 
+        # request body limit in MB, binary query images are uploaded as they are
+        self.HUB_MAX_UPLOAD_MB: int = int(os.getenv("HUB_MAX_UPLOAD_MB", "32"))
+
         # --- VALIDATIONS ---
         assert self.HUB_HOST, "HUB_HOST must be set"
         assert self.HUB_PORT, "HUB_PORT must be set"
         assert self.HUB_MAX_WORKERS, "HUB_MAX_WORKERS must be set"
+        assert self.HUB_MAX_UPLOAD_MB > 0, "HUB_MAX_UPLOAD_MB must be positive"
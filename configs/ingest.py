@@ -0,0 +1,107 @@
+import os
+import ast
+from typing import Dict, List, Optional
+
+
+class IngestConfig:
+    def __init__(self) -> None:
+        # DATASET BATCH (can be overridden from the command line)
+        self.INGEST_VIDEO_ROOT: Optional[str] = os.getenv("INGEST_VIDEO_ROOT")
+        self.INGEST_OUTPUT_ROOT: Optional[str] = os.getenv("INGEST_OUTPUT_ROOT")
+        self.INGEST_SPLIT_NAME: str = os.getenv("INGEST_SPLIT_NAME", "autoshot")
+        self.INGEST_LEDGER_NAME: str = os.getenv(
+            "INGEST_LEDGER_NAME", ".ingest_ledger.jsonl"
+        )
+        self.TRANSFORMERS_CACHE: str = os.getenv(
+            "TRANSFORMERS_CACHE",
+            "/workspace/competitions/AIC_2025/SIU_Pumpking/data/weights",
+        )
+
+        # STAGES: empty list means every registered stage
+        stages_env = os.getenv("INGEST_STAGES", "[]")
+        self.INGEST_STAGES: List[str] = ast.literal_eval(stages_env)
+
+        # Process pool size per stage
+        cpu_count = os.cpu_count() or 1
+        workers_env = os.getenv("INGEST_WORKERS", "{}")
+        self.INGEST_WORKERS: Dict[str, int] = {
+            "shots": 1,
+            "thumbnails": cpu_count,
+            "index": 2,
+            "features": 1,
+            "objects": 1,
+            "speech": 1,
+            "speech_align": 2,
+            "fps": 1,
+            "features_shard": 1,
+            "objects_compile": 1,
+            "speech_compile": 1,
+        }
+        self.INGEST_WORKERS.update(ast.literal_eval(workers_env))
+
+        # CUDA_VISIBLE_DEVICES per GPU stage
+        devices_env = os.getenv("INGEST_DEVICES", "{}")
+        self.INGEST_DEVICES: Dict[str, str] = {
+            "shots": "0",
+            "features": "0",
+            "objects": "0",
+            "speech": "0",
+        }
+        self.INGEST_DEVICES.update(ast.literal_eval(devices_env))
+
+        # Stage parameters (part of every task fingerprint)
+        self.INGEST_OBJECT_THRESHOLD: float = float(
+            os.getenv("INGEST_OBJECT_THRESHOLD", "0.3")
+        )
+        self.INGEST_OBJECT_BATCH_SIZE: int = int(
+            os.getenv("INGEST_OBJECT_BATCH_SIZE", "16")
+        )
+        self.INGEST_OBJECT_LOADER_WORKERS: int = int(
+            os.getenv("INGEST_OBJECT_LOADER_WORKERS", "4")
+        )
+        # wav2vec2 regions per forward pass and KenLM beam search settings
+        self.INGEST_SPEECH_BATCH_SIZE: int = int(
+            os.getenv("INGEST_SPEECH_BATCH_SIZE", "8")
+        )
+        self.INGEST_SPEECH_BEAM_WIDTH: int = int(
+            os.getenv("INGEST_SPEECH_BEAM_WIDTH", "500")
+        )
+        self.INGEST_SPEECH_DECODE_WORKERS: int = int(
+            os.getenv("INGEST_SPEECH_DECODE_WORKERS", str(cpu_count))
+        )
+        # Stored feature dtype: float32, float16 or int8 (per-vector scale)
+        self.INGEST_FEATURE_DTYPE: str = os.getenv("INGEST_FEATURE_DTYPE", "float16")
+        self.INGEST_AVIF_QUALITY: int = int(os.getenv("INGEST_AVIF_QUALITY", "10"))
+        # Longest edge of the low-res keyframes (0 keeps the original size)
+        self.INGEST_THUMBNAIL_MAX_EDGE: int = int(
+            os.getenv("INGEST_THUMBNAIL_MAX_EDGE", "640")
+        )
+        # Optional extra thumbnail next to the AVIF one: "", "webp" or "jpeg"
+        self.INGEST_THUMBNAIL_FALLBACK: str = os.getenv("INGEST_THUMBNAIL_FALLBACK", "")
+
+        # --- VALIDATIONS ---
+        for var in ["INGEST_WORKERS", "INGEST_DEVICES"]:
+            val = getattr(self, var)
+            if not isinstance(val, dict):
+                raise ValueError(f"{var} must be a dict, got {val!r}")
+
+        for stage, workers in self.INGEST_WORKERS.items():
+            if not isinstance(workers, int) or workers < 1:
+                raise ValueError(
+                    f"INGEST_WORKERS['{stage}'] must be a positive int, got {workers!r}"
+                )
+
+        if self.INGEST_THUMBNAIL_FALLBACK not in {"", "webp", "jpeg"}:
+            raise ValueError(
+                f"INGEST_THUMBNAIL_FALLBACK '{self.INGEST_THUMBNAIL_FALLBACK}' is invalid. "
+                "Must be one of '', 'webp', 'jpeg'"
+            )
+
+        if self.INGEST_FEATURE_DTYPE not in {"float32", "float16", "int8"}:
+            raise ValueError(
+                f"INGEST_FEATURE_DTYPE '{self.INGEST_FEATURE_DTYPE}' is invalid. "
+                "Must be one of 'float32', 'float16', 'int8'"
+            )
+
+        if not isinstance(self.INGEST_STAGES, list):
+            raise ValueError(f"INGEST_STAGES must be a list, got {self.INGEST_STAGES!r}")
@@ -7,9 +7,9 @@ from typing import List, Optional, Dict, Any
 import os
 import dotenv
 import numpy as np
-from PIL import Image
 
 from utils.logger import get_logger
+from utils.frame_loader import FrameLoader, unique_frames
 
 # >>> THAY ĐỔI 1: Import lớp Qwen25VL chung mà bạn đã tạo
 from engine.VLM_Extractor.llm_model.qwen25vl.qwen25vl import Qwen25VL
@@ -33,14 +33,19 @@ class EventLocalizer:
     Lớp này gọi đến lớp Qwen25VL chung để thực hiện suy luận.
     """
 
-    def __init__(self):
+    def __init__(self, frame_loader: Optional[FrameLoader] = None):
         """
         Khởi tạo EventLocalizer bằng cách gọi lớp Qwen25VL chung.
+        frame_loader: (Tùy chọn) FrameLoader dùng chung với TitleExtractor.
         """
         logger.info("🚀 [EventLocalizer] Đang khởi tạo Qwen25VL dùng chung...")
         # >>> THAY ĐỔI 2: Sử dụng lại lớp Qwen25VL của bạn.
         # Toàn bộ logic tải model phức tạp đã được chuyển vào đây.
         self.qwen_model = Qwen25VL()
+        # Đường dẫn frame đã đầy đủ, không cần thêm .jpg
+        self.frame_loader = frame_loader or FrameLoader.for_processor(
+            self.qwen_model.processor, suffix=None
+        )
 
         # Tải prompt template như bình thường
         self.prompt_template = self._load_prompt_template(PROMPT_CAPTION_PATH)
@@ -58,20 +63,8 @@ class EventLocalizer:
             return f.read()
 
     def _load_images(self, frame_paths: List[str]) -> Optional[List[np.ndarray]]:
-        """Tải ảnh từ danh sách đường dẫn."""
-        # ... (Hàm này không thay đổi)
-        images = []
-        unique_paths = sorted(list(set(frame_paths)), key=frame_paths.index)
-        for path_str in unique_paths:
-            p = Path(path_str)  # Không cần thêm .jpg vì đường dẫn đã đầy đủ
-            if not p.exists():
-                logger.warning(f"  [EventLocalizer] Bỏ qua frame không tồn tại: {p}")
-                continue
-            try:
-                with Image.open(p) as img:
-                    images.append(np.array(img.convert("RGB")))
-            except Exception as e:
-                logger.warning(f"  [EventLocalizer] Không thể mở ảnh {p}: {e}")
+        """Tải ảnh (song song, có cache) ở độ phân giải đầu vào của model."""
+        images = self.frame_loader.load_many(unique_frames(frame_paths))
         return images if images else None
 
     def _build_prompt(self, s2t: str, context_text: str) -> str:
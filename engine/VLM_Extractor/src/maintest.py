@@ -31,6 +31,7 @@ from engine.VLM_Extractor.src.context_extractor import ContextExtractor
 from engine.VLM_Extractor.llm_model.qwen3.qwen3 import QwenChatModel
 from engine.VLM_Extractor.src.caption import EventLocalizer
 from utils.logger import get_logger
+from utils.frame_loader import FrameLoader
 
 # --- CẤU HÌNH ---
 logger = get_logger()
@@ -43,6 +44,8 @@ class MainWorkflow:
     """
 
     def __init__(self):
+        # Dùng chung cho bước 1 và bước 4: frame của shot chỉ giải mã một lần
+        self.frame_loader = FrameLoader(suffix=None)
         logger.info("✅ Workflow đã được khởi tạo (chưa tải model).")
 
     def execute_step_1_title(self, frame_paths: list) -> str:
@@ -52,7 +55,7 @@ class MainWorkflow:
         logger.info("🚀 [Bước 1] Đang tải mô hình TitleExtractor...")
         title = None
         try:
-            title_extractor = TitleExtractor()
+            title_extractor = TitleExtractor(frame_loader=self.frame_loader)
             title = title_extractor.extract_from_paths(frame_paths)
         finally:
             del title_extractor
@@ -105,7 +108,7 @@ class MainWorkflow:
 
         caption_result = None
         try:
-            event_localizer = EventLocalizer()
+            event_localizer = EventLocalizer(frame_loader=self.frame_loader)
             shot_data = {"frames": frame_paths, "s2t": ""}
 
             result_dict = event_localizer.localize_events_in_shot(
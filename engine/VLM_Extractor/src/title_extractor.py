@@ -1,11 +1,9 @@
 # file: title_extractor.py
 import os
 import dotenv
-import numpy as np
-from PIL import Image
-from concurrent.futures import ThreadPoolExecutor
-from typing import List
+from typing import List, Optional
 from utils.logger import get_logger
+from utils.frame_loader import FrameLoader
 
 # Import lớp Qwen25VL
 from engine.VLM_Extractor.llm_model.qwen25vl.qwen25vl import Qwen25VL
@@ -21,41 +19,19 @@ class TitleExtractor:
     Nó sử dụng một instance của Qwen25VL để thực hiện suy luận.
     """
 
-    def __init__(self):
+    def __init__(self, frame_loader: Optional[FrameLoader] = None):
         logger.info("🚀 [TitleExtractor] Đang khởi tạo...")
         self.qwen_model = Qwen25VL()
+        # Đường dẫn frame đã đầy đủ, không cần thêm .jpg
+        self.frame_loader = frame_loader or FrameLoader.for_processor(
+            self.qwen_model.processor, suffix=None
+        )
         logger.info("✅ [TitleExtractor] Đối tượng đã sẵn sàng.")
 
     def read_prompt(self, PROMPT_TITLE_EXTRACTOR_PATH):
         with open(PROMPT_TITLE_EXTRACTOR_PATH, "r", encoding="utf-8") as file:
             return file.read()
 
-    def _load_frames_parallel(
-        self, frame_paths: list, max_workers: int = 16
-    ) -> np.ndarray:
-        """Tải các frame ảnh song song từ đường dẫn."""
-
-        def _load_single_frame(path: str):
-            try:
-                # --------------------------------------------------------------------
-                # SỬA LỖI NẰM Ở ĐÂY:
-                # Đường dẫn `path` được truyền vào đã là đường dẫn đầy đủ,
-                # không cần cộng thêm ".jpg" nữa.
-                # --------------------------------------------------------------------
-                # Dòng cũ (lỗi): return np.array(Image.open(f"{path}.jpg").convert("RGB"))
-                # Dòng mới (đã sửa):
-                return np.array(Image.open(path).convert("RGB"))
-            except Exception as e:
-                # Thay đổi đường dẫn trong log để hiển thị đúng đường dẫn đang cố mở
-                logger.warning(f"⚠️  Không thể tải frame: {path}. Lỗi: {e}")
-                return None
-
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            results = executor.map(_load_single_frame, frame_paths)
-            loaded_frames = [frame for frame in results if frame is not None]
-
-        return np.stack(loaded_frames) if loaded_frames else None
-
     def extract_from_paths(self, frame_paths: List[str]) -> str:
         """
         Tải các frame từ đường dẫn và trích xuất tiêu đề.
@@ -65,7 +41,7 @@ class TitleExtractor:
             return "Lỗi: Danh sách đường dẫn frame rỗng."
 
         logger.info(f"🖼️  [TitleExtractor] Đang tải {len(frame_paths)} khung hình...")
-        loaded_frames = self._load_frames_parallel(frame_paths)
+        loaded_frames = self.frame_loader.video(frame_paths)
         if loaded_frames is None:
             return "Lỗi: Không thể tải bất kỳ frame nào."
 
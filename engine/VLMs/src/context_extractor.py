@@ -44,7 +44,10 @@ class ContextExtractor:
         if not context_text:
             logging.error("❌ Không tìm thấy context trong các file output.")
             return None
+        return self.summarize(context_text)
 
+    def summarize(self, context_text):
+        """Gửi Qwen để trích xuất thông tin từ một đoạn nội dung (vd. một bài báo)."""
         prompt = f"""Bạn là hệ thống trích xuất thông tin.
 Dựa trên nội dung dưới đây, hãy liệt kê đầy đủ tất cả các thông tin và chi tiết quan trọng nhất.
 
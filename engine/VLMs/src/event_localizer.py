@@ -3,42 +3,25 @@
 import json
 import logging
 import re
-from pathlib import Path
 from typing import List, Optional, Dict, Any
 
 import numpy as np
 import torch
-from PIL import Image
-from transformers import AutoProcessor, Qwen2_5_VLForConditionalGeneration
-
-# ==============================================================================
-# HELPER FUNCTION
-# ==============================================================================
-
-
-def sample_frames_evenly(frame_paths: List[str], max_frames: int = 40) -> List[str]:
-    """
-    Chọn mẫu các frame một cách "đều" và có ý nghĩa từ danh sách.
-    """
-    if not frame_paths:
-        return []
-
-    unique_paths = sorted(list(set(frame_paths)), key=frame_paths.index)
-    n = len(unique_paths)
 
-    if n <= max_frames:
-        return unique_paths
-
-    indices_to_keep = {0, n - 1}
-    num_middle_frames = max_frames - 2
-
-    if num_middle_frames > 0:
-        middle_indices = np.linspace(1, n - 2, num=num_middle_frames, dtype=int)
-        indices_to_keep.update(middle_indices)
+from pathlib import Path
+import sys
 
-    sorted_indices = sorted(list(indices_to_keep))
-    return [unique_paths[i] for i in sorted_indices]
+current_path = Path(__file__).resolve()
+for parent in current_path.parents:
+    if parent.name == "SIU_Pumpking":
+        #print(f"Adding {parent} to sys.path")
+        sys.path.append(str(parent))
+        break
+else:
+    raise RuntimeError("Could not find 'SIU_Pumpking' in the path hierarchy.")
 
+from utils.frame_loader import FrameLoader, sample_frames_evenly
+from qwen_vl import load_qwen_vl, generate_video_batch
 
 # ==============================================================================
 # MAIN CLASS
@@ -51,20 +34,29 @@ class EventLocalizer:
     phân cảnh video (shot), dựa trên hình ảnh, âm thanh (S2T) và ngữ cảnh văn bản.
     """
 
-    def __init__(self, model_path: str):
+    def __init__(
+        self,
+        model_path: str = None,
+        model=None,
+        processor=None,
+        frame_loader: Optional[FrameLoader] = None,
+    ):
         """
         Khởi tạo EventLocalizer bằng cách tải model và processor.
+        model, processor: (Tùy chọn) Qwen2.5-VL đã tải sẵn (load_qwen_vl), dùng
+        chung với TitleExtractor.
+        frame_loader: (Tùy chọn) FrameLoader dùng chung, để frame đã giải mã
+        được cache giữa các module.
         """
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         logging.info(f"🚀 [EventLocalizer] Khởi tạo model trên device: {self.device}")
+        self.frame_loader = frame_loader or FrameLoader()
 
+        if model is not None and processor is not None:
+            self.model, self.processor = model, processor
+            return
         try:
-            self.model = Qwen2_5_VLForConditionalGeneration.from_pretrained(
-                model_path,
-                torch_dtype=torch.float16,  # torch_dtype=torch.float16,
-                device_map="auto",
-            )
-            self.processor = AutoProcessor.from_pretrained(model_path)
+            self.model, self.processor = load_qwen_vl(model_path)
             logging.info("✅ [EventLocalizer] Model và processor đã sẵn sàng.")
         except Exception as e:
             logging.critical(
@@ -72,23 +64,6 @@ class EventLocalizer:
             )
             raise
 
-    def _load_images(self, frame_paths: List[str]) -> Optional[List[np.ndarray]]:
-        """Tải ảnh từ danh sách đường dẫn và chuyển thành list các numpy array."""
-        images = []
-
-        for path_str in frame_paths:
-            p = Path(path_str).with_suffix(".jpg")
-            if not p.exists():
-                logging.warning(f"  [EventLocalizer] Bỏ qua frame không tồn tại: {p}")
-                continue
-            try:
-                with Image.open(p) as img:
-                    images.append(np.array(img.convert("RGB")))
-            except Exception as e:
-                logging.warning(f"  [EventLocalizer] Không thể mở ảnh {p}: {e}")
-
-        return images if images else None
-
     def _build_prompt(self, s2t: str, context_text: str) -> str:
         """Tạo prompt chi tiết cho model."""
         return f"""Bạn là một chuyên gia phân tích video. Nhiệm vụ của bạn là xác định và phân đoạn các sự kiện riêng biệt trong một video clip.
@@ -135,6 +110,55 @@ class EventLocalizer:
             )
             return None
 
+    def shot_video(
+        self, shot_data: Dict[str, Any], max_frames: int = 45
+    ) -> Optional[np.ndarray]:
+        """Các frame được lấy mẫu đều của một shot, dạng (n, h, w, 3)."""
+        frames = shot_data.get("frames", [])
+        if not frames:
+            logging.warning("  [EventLocalizer] Shot không có danh sách frames, bỏ qua.")
+            return None
+
+        video = self.frame_loader.video(sample_frames_evenly(frames, max_frames))
+        if video is None:
+            logging.error(
+                "  [EventLocalizer] Không thể tải bất kỳ frame nào, không thể xử lý."
+            )
+        return video
+
+    def localize_events_in_videos(
+        self,
+        videos: List[np.ndarray],
+        s2ts: List[str],
+        context_texts: List[str],
+        max_new_tokens: int = 32768,
+    ) -> List[Dict[str, Any]]:
+        """Khoanh vùng sự kiện của nhiều shot trong một lần suy luận."""
+        prompts = [
+            self._build_prompt(s2t=s2t, context_text=context_text)
+            for s2t, context_text in zip(s2ts, context_texts)
+        ]
+        logging.info(
+            f"  [EventLocalizer] Đang xử lý {len(videos)} shot "
+            f"({sum(len(video) for video in videos)} frame) trên model..."
+        )
+        raw_output_texts = generate_video_batch(
+            self.model,
+            self.processor,
+            videos,
+            prompts,
+            max_new_tokens=max_new_tokens,
+            do_sample=False,
+        )
+        return [
+            {
+                "localized_events": self._parse_json_from_model_output(raw_output_text),
+                "model_raw_output": raw_output_text,
+                "context_provided": context_text,
+            }
+            for raw_output_text, context_text in zip(raw_output_texts, context_texts)
+        ]
+
     def localize_events_in_shot(
         self, shot_data: Dict[str, Any], context_text: str, max_frames: int = 45
     ) -> Optional[Dict[str, Any]]:
@@ -142,64 +166,13 @@ class EventLocalizer:
         Phương thức chính để xử lý một shot duy nhất.
         """
         try:
-            frames = shot_data.get("frames", [])
-            if not frames:
-                logging.warning(
-                    "  [EventLocalizer] Shot không có danh sách frames, bỏ qua."
-                )
-                return None
-
-            selected_frames = sample_frames_evenly(frames, max_frames)
-            images = self._load_images(selected_frames)
-            if not images:
-                logging.error(
-                    "  [EventLocalizer] Không thể tải bất kỳ frame nào, không thể xử lý."
-                )
+            video_data = self.shot_video(shot_data, max_frames)
+            if video_data is None:
                 return None
 
-            video_data = np.stack(images)
-            s2t = shot_data.get("s2t", "")
-            prompt = self._build_prompt(s2t=s2t, context_text=context_text)
-
-            messages = [
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "video", "video": video_data},
-                        {"type": "text", "text": prompt},
-                    ],
-                }
-            ]
-            text_prompt = self.processor.apply_chat_template(
-                messages, tokenize=False, add_generation_prompt=True
-            )
-            inputs = self.processor(
-                text=[text_prompt],
-                videos=[video_data],
-                padding=True,
-                return_tensors="pt",
-            ).to(self.device)
-
-            logging.info(
-                f"  [EventLocalizer] Đang xử lý {len(images)} frame trên model..."
-            )
-            with torch.no_grad():
-                generated_ids = self.model.generate(
-                    **inputs, max_new_tokens=32768, do_sample=False
-                )
-
-            output_ids = generated_ids[0][len(inputs.input_ids[0]) :]
-            raw_output_text = self.processor.decode(
-                output_ids, skip_special_tokens=True
-            ).strip()
-
-            parsed_json = self._parse_json_from_model_output(raw_output_text)
-
-            return {
-                "localized_events": parsed_json,
-                "model_raw_output": raw_output_text,
-                "context_provided": context_text,
-            }
+            return self.localize_events_in_videos(
+                [video_data], [shot_data.get("s2t", "")], [context_text]
+            )[0]
 
         except Exception as e:
             logging.error(
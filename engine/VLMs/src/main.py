@@ -6,6 +6,7 @@ from title_extractor import TitleExtractor
 from context_web import NewsPipeline
 from context_extractor import ContextExtractor
 from event_localizer import EventLocalizer
+from utils.frame_loader import FrameLoader
 
 
 def setup_logging(log_dir):
@@ -124,9 +125,15 @@ def main():
     # ===== KHỞI TẠO CÁC MODEL LỚN MỘT LẦN DUY NHẤT =====
     # Điều này giúp tiết kiệm thời gian và bộ nhớ, không cần tải lại model cho mỗi shot
     try:
-        title_extractor = TitleExtractor(model_path=config["LOCAL_MODEL_PATH"])
+        # Frame đầu shot dùng cho cả tiêu đề lẫn sự kiện: giải mã một lần
+        frame_loader = FrameLoader()
+        title_extractor = TitleExtractor(
+            model_path=config["LOCAL_MODEL_PATH"], frame_loader=frame_loader
+        )
         # Không cần khởi tạo ContextExtractor ở đây vì nó không tải model nặng
-        event_localizer = EventLocalizer(model_path=config["LOCAL_MODEL_PATH"])
+        event_localizer = EventLocalizer(
+            model_path=config["LOCAL_MODEL_PATH"], frame_loader=frame_loader
+        )
         logging.info("✅ Tất cả các model lớn đã được khởi tạo.")
     except Exception as e:
         logging.critical(f"❌ Lỗi nghiêm trọng khi khởi tạo model: {e}", exc_info=True)
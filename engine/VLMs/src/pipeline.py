@@ -0,0 +1,436 @@
+# file: pipeline.py
+"""
+Pipeline khoanh vùng sự kiện cho các shot class 2 của nhiều video:
+
+    python pipeline.py --shots /workspace/.../shot/vlm \\
+        --metadata-dir /dataset/AIC2024/original_dataset/0/metadata/media-info \\
+        --work-dir /workspace/.../engine/VLMs/run_0 --batch-size 4
+
+Khác với main.py (từng shot một):
+- Qwen2.5-VL và Qwen3 chỉ tải một lần; TitleExtractor và EventLocalizer dùng
+  chung một model, generate() chạy theo batch shot của nhiều video.
+- Tiêu đề và bài báo tìm được được cache theo frame / tiêu đề, bản tóm tắt
+  theo hash nội dung bài báo, nên một tin lặp lại ở nhiều bản tin (kể cả
+  đăng lại trên nhiều trang) chỉ crawl và tóm tắt một lần.
+- Các tiêu đề của một batch được crawl đồng thời (AsyncNewsCrawler).
+- Một luồng nền đọc file shot và tải frame của batch kế tiếp (hàng đợi công
+  việc) trong lúc GPU xử lý batch hiện tại. Frame được giải mã thẳng ở độ
+  phân giải đầu vào của model và cache (LRU) trong FrameLoader dùng chung.
+- Kết quả ghi nối tiếp vào results.jsonl; chạy lại sẽ bỏ qua shot đã xong.
+- Mỗi kết quả có start_frame / end_frame của shot: results.jsonl là đầu vào
+  của caption index (CAPTION_PATH, QDRANT.addCaptions / GET /setup_captions).
+
+ShotPipeline chỉ cần các đối tượng có cùng giao diện, nên có thể kiểm thử với
+model nhỏ thay thế:
+    title_extractor.extract_titles(videos) -> List[str]
+    event_localizer.localize_events_in_videos(videos, s2ts, contexts) -> List[dict]
+    summarizer(text) -> str | None
+    async crawler.crawl_many([(title, year)]) -> List[List[article dict]]
+"""
+
+import os
+import json
+import queue
+import asyncio
+import hashlib
+import logging
+import argparse
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from context_web import NewsPipeline, publish_year
+from utils.frame_loader import FrameLoader, sample_frames_evenly
+
+DEFAULT_CONTEXT = "Không có ngữ cảnh bổ sung từ web."
+
+
+class JsonlStore:
+    """
+    Bảng key -> value lưu dạng jsonl, mỗi lần set() ghi thêm một dòng nên dừng
+    giữa chừng vẫn giữ được phần đã xong. Dòng cuối bị cắt dở thì bỏ qua.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.data: Dict[str, object] = {}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        torn = False
+        if os.path.isfile(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    torn = not line.endswith("\n")
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.data[entry["key"]] = entry["value"]
+        self._file = open(path, "a", encoding="utf-8")
+        if torn:
+            self._file.write("\n")
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.data
+
+    def __len__(self):
+        return len(self.data)
+
+    def get(self, key: str, default=None):
+        return self.data.get(key, default)
+
+    def set(self, key: str, value) -> None:
+        self.data[key] = value
+        self._file.write(json.dumps({"key": key, "value": value}, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def frame_range(frame_paths: List[str]) -> Dict[str, Optional[int]]:
+    """Số frame đầu / cuối của shot (tên file frame là số frame), để gắn caption vào keyframe."""
+    try:
+        frame_numbers = [int(Path(p).stem) for p in frame_paths]
+    except ValueError:
+        return {"start_frame": None, "end_frame": None}
+    return {"start_frame": min(frame_numbers), "end_frame": max(frame_numbers)}
+
+
+def is_valid_title(title: Optional[str]) -> bool:
+    return bool(title) and not title.startswith("Lỗi:")
+
+
+class ShotPipeline:
+    """Tiêu đề -> crawl web -> tóm tắt -> khoanh vùng sự kiện, theo batch shot."""
+
+    def __init__(
+        self,
+        title_extractor,
+        event_localizer,
+        summarizer,
+        crawler,
+        work_dir: str,
+        batch_size: int = 4,
+        max_frames: int = 26,
+        title_frames: int = 10,
+        load_workers: int = 16,
+        prefetch: int = 2,
+        frame_loader: Optional[FrameLoader] = None,
+    ):
+        self.title_extractor = title_extractor
+        self.event_localizer = event_localizer
+        self.summarizer = summarizer
+        self.crawler = crawler
+        self.batch_size = batch_size
+        self.max_frames = max_frames
+        self.title_frames = title_frames
+        self.prefetch = prefetch
+        # nên dùng chung với title_extractor / event_localizer
+        self.frame_loader = frame_loader or FrameLoader(workers=load_workers)
+
+        cache_dir = os.path.join(work_dir, "cache")
+        self.results = JsonlStore(os.path.join(work_dir, "results.jsonl"))
+        self.titles = JsonlStore(os.path.join(cache_dir, "titles.jsonl"))
+        self.articles = JsonlStore(os.path.join(cache_dir, "articles.jsonl"))
+        self.summaries = JsonlStore(os.path.join(cache_dir, "summaries.jsonl"))
+
+    # ------------------------------------------------------------------ keys
+
+    @staticmethod
+    def result_key(video: str, shot_index: int) -> str:
+        return f"{video}/{shot_index}"
+
+    @staticmethod
+    def title_key(frame_paths: List[str]) -> str:
+        """Tiêu đề phụ thuộc vào đúng các frame đưa vào model."""
+        return hashlib.blake2b("\n".join(frame_paths).encode("utf-8"), digest_size=16).hexdigest()
+
+    @staticmethod
+    def article_key(title: str, year: Optional[str]) -> str:
+        """Truy vấn tìm kiếm gồm tiêu đề và năm phát hành trong metadata."""
+        return f"{year or ''}\t{title}"
+
+    # ------------------------------------------------------------ work queue
+
+    def load_frames(self, frame_paths: List[str]) -> Optional[np.ndarray]:
+        """Frame ở độ phân giải của model; frame tiêu đề và frame sự kiện trùng nhau chỉ giải mã một lần."""
+        return self.frame_loader.video(frame_paths)
+
+    def _pending_shots(self, shot_files: Iterable[str], metadata_dir: Optional[str]):
+        """Các shot class 2 chưa có kết quả, kèm frame đã tải sẵn."""
+        for shot_file in shot_files:
+            video = Path(shot_file).stem
+            metadata_path = (
+                os.path.join(metadata_dir, os.path.basename(shot_file)) if metadata_dir else None
+            )
+            try:
+                with open(shot_file, "r", encoding="utf-8") as f:
+                    shots = json.load(f)
+            except Exception as e:
+                logging.error(f"❌ Không đọc được file shot {shot_file}: {e}")
+                continue
+            year = None
+            for shot_index, shot_data in enumerate(shots):
+                if shot_data.get("class") != 2:
+                    continue
+                if self.result_key(video, shot_index) in self.results:
+                    continue
+                frames = shot_data.get("frames", [])
+                if not frames:
+                    logging.warning(f"{video} shot #{shot_index}: không có frame, bỏ qua.")
+                    continue
+                if year is None:
+                    year = publish_year(metadata_path) or ""
+
+                title_paths = frames[: self.title_frames]
+                title_key = self.title_key(title_paths)
+                title_video = None
+                if title_key not in self.titles:
+                    title_video = self.load_frames(title_paths)
+                event_video = self.load_frames(sample_frames_evenly(frames, self.max_frames))
+                if event_video is None or (title_key not in self.titles and title_video is None):
+                    logging.error(f"{video} shot #{shot_index}: không tải được frame, bỏ qua.")
+                    continue
+
+                yield {
+                    "video": video,
+                    "shot_index": shot_index,
+                    **frame_range(frames),
+                    "s2t": shot_data.get("s2t", ""),
+                    "metadata_path": metadata_path,
+                    "year": year,
+                    "title_key": title_key,
+                    "title": self.titles.get(title_key),
+                    "title_video": title_video,
+                    "event_video": event_video,
+                }
+
+    def _producer(self, shot_files, metadata_dir, work_queue: queue.Queue):
+        try:
+            batch = []
+            for item in self._pending_shots(shot_files, metadata_dir):
+                batch.append(item)
+                if len(batch) == self.batch_size:
+                    work_queue.put(batch)
+                    batch = []
+            if batch:
+                work_queue.put(batch)
+        except Exception as e:
+            work_queue.put(e)
+        work_queue.put(None)
+
+    # -------------------------------------------------------------- stages
+
+    def _generate(self, fn, *columns) -> List:
+        """fn theo batch; nếu lỗi (vd. hết bộ nhớ GPU) thì chạy lại từng phần tử."""
+        try:
+            return fn(*columns)
+        except Exception as e:
+            if len(columns[0]) == 1:
+                logging.error(f"❌ Lỗi khi suy luận: {e}", exc_info=True)
+                return [None]
+            logging.warning(f"⚠️ Batch {len(columns[0])} shot lỗi ({e}), chạy lại từng shot.")
+            results = []
+            for i in range(len(columns[0])):
+                results += self._generate(fn, *[[column[i]] for column in columns])
+            return results
+
+    def _extract_titles(self, batch):
+        todo = {}
+        for item in batch:
+            if item["title"] is None:
+                item["title"] = self.titles.get(item["title_key"])
+            if item["title"] is None:
+                todo.setdefault(item["title_key"], item)
+        if todo:
+            titles = self._generate(
+                self.title_extractor.extract_titles,
+                [item["title_video"] for item in todo.values()],
+            )
+            for key, title in zip(todo, titles):
+                if is_valid_title(title):
+                    self.titles.set(key, title)
+        for item in batch:
+            if item["title"] is None:
+                item["title"] = self.titles.get(item["title_key"])
+            logging.info(f"{item['video']} shot #{item['shot_index']} - Tiêu đề: {item['title']}")
+
+    def _attach_contexts(self, batch):
+        items = [item for item in batch if is_valid_title(item["title"])]
+
+        # bài báo của các tiêu đề chưa có trong cache, crawl đồng thời
+        queries = {}
+        for item in items:
+            key = self.article_key(item["title"], item["year"])
+            if key not in self.articles and key not in queries:
+                queries[key] = (item["title"], item["year"] or None)
+        if queries:
+            found = asyncio.run(self.crawler.crawl_many(list(queries.values())))
+            for key, articles in zip(queries, found):
+                if articles:
+                    self.articles.set(
+                        key, {k: articles[0][k] for k in ("url", "content", "content_hash")}
+                    )
+
+        # tóm tắt mỗi bài báo một lần, theo hash nội dung
+        for item in items:
+            article = self.articles.get(self.article_key(item["title"], item["year"]))
+            if article is None:
+                continue
+            item["source_url"] = article["url"]
+            digest = article["content_hash"]
+            if digest not in self.summaries:
+                try:
+                    summary = self.summarizer(article["content"])
+                except Exception as e:
+                    logging.error(f"❌ Lỗi khi tóm tắt {article['url']}: {e}", exc_info=True)
+                    summary = None
+                if summary:
+                    self.summaries.set(digest, summary)
+            item["context"] = self.summaries.get(digest)
+
+    def _process_batch(self, batch) -> int:
+        self._extract_titles(batch)
+        self._attach_contexts(batch)
+
+        results = self._generate(
+            self.event_localizer.localize_events_in_videos,
+            [item["event_video"] for item in batch],
+            [item["s2t"] for item in batch],
+            [item.get("context") or DEFAULT_CONTEXT for item in batch],
+        )
+        done = 0
+        for item, result in zip(batch, results):
+            if result is None:
+                continue
+            result.update(
+                video=item["video"],
+                shot_index=item["shot_index"],
+                start_frame=item["start_frame"],
+                end_frame=item["end_frame"],
+                title=item["title"],
+                source_url=item.get("source_url"),
+            )
+            self.results.set(self.result_key(item["video"], item["shot_index"]), result)
+            done += 1
+        return done
+
+    def run(self, shot_files: Iterable[str], metadata_dir: Optional[str] = None) -> int:
+        """Xử lý mọi shot class 2 chưa có kết quả, trả về số shot đã xử lý."""
+        work_queue = queue.Queue(maxsize=self.prefetch)
+        producer = threading.Thread(
+            target=self._producer,
+            args=(list(shot_files), metadata_dir, work_queue),
+            daemon=True,
+        )
+        producer.start()
+
+        done = 0
+        while True:
+            batch = work_queue.get()
+            if batch is None:
+                break
+            if isinstance(batch, Exception):
+                raise batch
+            done += self._process_batch(batch)
+            logging.info(f"✅ Đã xử lý {done} shot ({len(self.results)} trong results.jsonl).")
+        producer.join()
+        logging.info(
+            f"Frame cache: {self.frame_loader.hits} hit / {self.frame_loader.misses} miss."
+        )
+        return done
+
+    def export(self, output_path: str) -> None:
+        """Ghi toàn bộ kết quả ra một file JSON, theo thứ tự video và shot."""
+        results = sorted(
+            self.results.data.values(), key=lambda r: (r["video"], r["shot_index"])
+        )
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    def close(self) -> None:
+        self.frame_loader.close()
+        for store in (self.results, self.titles, self.articles, self.summaries):
+            store.close()
+
+
+def list_shot_files(paths: List[str]) -> List[str]:
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(str(p) for p in Path(path).glob("*.json"))
+        else:
+            files.append(path)
+    return files
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Batched VLM event localization")
+    parser.add_argument("--shots", nargs="+", required=True, help="file shot JSON hoặc thư mục")
+    parser.add_argument("--metadata-dir", default=None)
+    parser.add_argument("--work-dir", required=True, help="results.jsonl và cache/")
+    parser.add_argument(
+        "--vl-model", default="/workspace/competitions/NCKH/An/Qwen2.5-VL-3B-Instruct"
+    )
+    parser.add_argument("--summary-model", default="Qwen/Qwen3-1.7B")
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--max-frames", type=int, default=26)
+    parser.add_argument(
+        "--max-pixels", type=int, default=None, help="giới hạn số pixel mỗi frame đưa vào model"
+    )
+    parser.add_argument("--frame-cache-mb", type=int, default=2048)
+    parser.add_argument("--crawl-deadline", type=float, default=30.0, help="giây cho mỗi tiêu đề")
+    parser.add_argument("--export", default=None, help="ghi toàn bộ kết quả ra file JSON")
+    return parser.parse_args()
+
+
+def main():
+    from main import setup_logging
+    from qwen_vl import load_qwen_vl
+    from title_extractor import TitleExtractor
+    from event_localizer import EventLocalizer
+    from context_extractor import ContextExtractor
+    from LLM_sumuray import QwenChatModel
+
+    args = parse_args()
+    setup_logging(args.work_dir)
+
+    # ===== KHỞI TẠO CÁC MODEL MỘT LẦN DUY NHẤT =====
+    model, processor = load_qwen_vl(args.vl_model)
+    frame_loader = FrameLoader.for_processor(
+        processor, max_pixels=args.max_pixels, cache_bytes=args.frame_cache_mb << 20
+    )
+    summarizer = ContextExtractor(
+        None, model_object=QwenChatModel(model_path=args.summary_model)
+    ).summarize
+    pipeline = ShotPipeline(
+        title_extractor=TitleExtractor(
+            model=model, processor=processor, frame_loader=frame_loader
+        ),
+        event_localizer=EventLocalizer(
+            model=model, processor=processor, frame_loader=frame_loader
+        ),
+        summarizer=summarizer,
+        crawler=NewsPipeline.default_crawler(
+            os.path.join(args.work_dir, "cache", "article_cache"),
+            deadline=args.crawl_deadline,
+        ),
+        work_dir=args.work_dir,
+        batch_size=args.batch_size,
+        max_frames=args.max_frames,
+        frame_loader=frame_loader,
+    )
+    try:
+        done = pipeline.run(list_shot_files(args.shots), args.metadata_dir)
+        logging.info(f"✅✅✅ Pipeline hoàn tất, {done} shot mới được xử lý.")
+        if args.export:
+            pipeline.export(args.export)
+            logging.info(f"Kết quả cuối cùng đã được lưu tại: {args.export}")
+    finally:
+        pipeline.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# file: qwen_vl.py
+import logging
+from typing import List
+
+import numpy as np
+import torch
+from transformers import (
+    Qwen2_5_VLForConditionalGeneration,
+    AutoProcessor,
+    BitsAndBytesConfig,
+)
+
+
+def load_qwen_vl(model_path: str, load_in_4bit: bool = False):
+    """
+    Tải Qwen2.5-VL và processor. Tải một lần rồi truyền vào TitleExtractor và
+    EventLocalizer để hai module dùng chung một model.
+    """
+    logging.info(f"🧠 [QwenVL] Đang tải mô hình từ: {model_path}")
+    kwargs = {}
+    if load_in_4bit:
+        kwargs["quantization_config"] = BitsAndBytesConfig(
+            load_in_4bit=True,
+            bnb_4bit_quant_type="nf4",
+            bnb_4bit_compute_dtype=torch.float16,
+        )
+    model = Qwen2_5_VLForConditionalGeneration.from_pretrained(
+        model_path,
+        torch_dtype=torch.float16,
+        device_map="auto",
+        **kwargs,
+    )
+    processor = AutoProcessor.from_pretrained(model_path)
+    return model, processor
+
+
+def generate_video_batch(
+    model,
+    processor,
+    videos: List[np.ndarray],
+    prompts: List[str],
+    max_new_tokens: int,
+    **generate_kwargs,
+) -> List[str]:
+    """
+    Sinh câu trả lời cho nhiều cặp (video, prompt) trong một lần generate().
+    Mỗi video là mảng (n, h, w, 3); số frame giữa các video có thể khác nhau.
+    """
+    text_prompts = [
+        processor.apply_chat_template(
+            [
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "video", "video": video},
+                        {"type": "text", "text": prompt},
+                    ],
+                }
+            ],
+            tokenize=False,
+            add_generation_prompt=True,
+        )
+        for video, prompt in zip(videos, prompts)
+    ]
+    # generate() theo batch cần padding bên trái: mọi prompt kết thúc cùng vị trí
+    processor.tokenizer.padding_side = "left"
+    inputs = processor(
+        text=text_prompts,
+        videos=list(videos),
+        padding=True,
+        return_tensors="pt",
+    ).to(model.device)
+
+    with torch.no_grad():
+        generated_ids = model.generate(
+            **inputs, max_new_tokens=max_new_tokens, **generate_kwargs
+        )
+
+    output_texts = processor.batch_decode(
+        generated_ids[:, inputs.input_ids.shape[1] :],
+        skip_special_tokens=True,
+        clean_up_tokenization_spaces=False,
+    )
+    return [text.strip() for text in output_texts]
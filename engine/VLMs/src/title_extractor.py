@@ -1,14 +1,24 @@
 # file: title_extractor.py
 import logging
+from typing import List, Optional
+
 import torch
 import numpy as np
-from PIL import Image
-from concurrent.futures import ThreadPoolExecutor
-from transformers import (
-    Qwen2_5_VLForConditionalGeneration,
-    AutoProcessor,
-    BitsAndBytesConfig,
-)
+
+from pathlib import Path
+import sys
+
+current_path = Path(__file__).resolve()
+for parent in current_path.parents:
+    if parent.name == "SIU_Pumpking":
+        #print(f"Adding {parent} to sys.path")
+        sys.path.append(str(parent))
+        break
+else:
+    raise RuntimeError("Could not find 'SIU_Pumpking' in the path hierarchy.")
+
+from utils.frame_loader import FrameLoader
+from qwen_vl import load_qwen_vl, generate_video_batch
 
 
 class TitleExtractor:
@@ -16,80 +26,50 @@ class TitleExtractor:
     Một lớp để tải mô hình Qwen2.5-VL và trích xuất tiêu đề từ các frame ảnh.
     """
 
-    def __init__(self, model_path: str):
+    USER_PROMPT = "Các khung hình này được trích từ phần đầu của một bản tin thời sự. Hãy quét kỹ các khung hình để tìm và trích xuất chính xác văn bản của tiêu đề chính. Chỉ trả về nội dung văn bản của tiêu đề."
+
+    def __init__(
+        self,
+        model_path: str = None,
+        model=None,
+        processor=None,
+        frame_loader: Optional[FrameLoader] = None,
+    ):
+        """
+        model, processor: (Tùy chọn) Qwen2.5-VL đã tải sẵn (load_qwen_vl), dùng
+        chung với EventLocalizer. Nếu không có thì tự tải bản 4-bit từ model_path.
+        frame_loader: (Tùy chọn) FrameLoader dùng chung với EventLocalizer.
+        """
         logging.info("🚀 [TitleExtractor] Đang khởi tạo...")
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        self.model, self.processor = self._load_model(model_path)
+        self.frame_loader = frame_loader or FrameLoader()
+        if model is not None and processor is not None:
+            self.model, self.processor = model, processor
+        else:
+            self.model, self.processor = self._load_model(model_path)
         logging.info("✅ [TitleExtractor] Đối tượng đã sẵn sàng.")
 
     def _load_model(self, model_path: str):
-        logging.info(f"🧠 [TitleExtractor] Đang tải mô hình từ: {model_path}")
-        quantization_config = BitsAndBytesConfig(
-            load_in_4bit=True,
-            bnb_4bit_quant_type="nf4",
-            bnb_4bit_compute_dtype=torch.float16,
-        )
-        model = Qwen2_5_VLForConditionalGeneration.from_pretrained(
-            model_path,
-            quantization_config=quantization_config,
-            torch_dtype=torch.float16,
-            device_map="auto",
-        )
-        processor = AutoProcessor.from_pretrained(model_path)
-        return model, processor
-
-    def _load_frames_parallel(self, frame_paths: list, max_workers: int = 16):
-        def _load_single_frame(path: str):
-            try:
-                return np.array(Image.open(f"{path}.jpg").convert("RGB"))
-            except Exception:
-                return None
-
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            results = executor.map(_load_single_frame, frame_paths)
-            loaded_frames = [frame for frame in results if frame is not None]
-
-        return np.stack(loaded_frames) if loaded_frames else None
+        return load_qwen_vl(model_path, load_in_4bit=True)
 
     def extract_title(self, frame_paths: list) -> str:
         if not frame_paths:
             return "Lỗi: Danh sách frame rỗng."
 
         logging.info(f"🖼️  [TitleExtractor] Đang tải {len(frame_paths)} khung hình...")
-        loaded_frames = self._load_frames_parallel(frame_paths)
+        loaded_frames = self.frame_loader.video(frame_paths)
         if loaded_frames is None:
             return "Lỗi: Không thể tải được frames."
 
-        user_prompt = "Các khung hình này được trích từ phần đầu của một bản tin thời sự. Hãy quét kỹ các khung hình để tìm và trích xuất chính xác văn bản của tiêu đề chính. Chỉ trả về nội dung văn bản của tiêu đề."
-        messages = [
-            {
-                "role": "user",
-                "content": [
-                    {"type": "video", "video": loaded_frames},
-                    {"type": "text", "text": user_prompt},
-                ],
-            }
-        ]
-        text_prompt = self.processor.apply_chat_template(
-            messages, tokenize=False, add_generation_prompt=True
-        )
-        inputs = self.processor(
-            text=[text_prompt],
-            videos=[loaded_frames],
-            padding=True,
-            return_tensors="pt",
-        ).to(self.model.device)
-
-        logging.info("🧠 [TitleExtractor] Đang suy luận...")
-        generated_ids = self.model.generate(**inputs, max_new_tokens=120)
-        generated_ids_trimmed = [
-            out_ids[len(in_ids) :]
-            for in_ids, out_ids in zip(inputs.input_ids, generated_ids)
-        ]
-        output_text = self.processor.batch_decode(
-            generated_ids_trimmed,
-            skip_special_tokens=True,
-            clean_up_tokenization_spaces=False,
-        )[0]
+        return self.extract_titles([loaded_frames])[0]
 
-        return output_text.strip()
+    def extract_titles(self, videos: List[np.ndarray], max_new_tokens: int = 120) -> List[str]:
+        """Trích xuất tiêu đề của nhiều shot trong một lần suy luận."""
+        logging.info(f"🧠 [TitleExtractor] Đang suy luận {len(videos)} shot...")
+        return generate_video_batch(
+            self.model,
+            self.processor,
+            videos,
+            [self.USER_PROMPT] * len(videos),
+            max_new_tokens=max_new_tokens,
+        )
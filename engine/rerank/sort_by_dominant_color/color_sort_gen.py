@@ -1,8 +1,7 @@
-from pathlib import Path
-import ujson
-import math
-import colorsys
 import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
 from tqdm import tqdm
 
 # Add project path
@@ -18,7 +17,7 @@ for parent in current_path.parents:
 else:
     raise RuntimeError("Could not find 'SIU_Pumpking' in the path hierarchy.")
 
-from engine.rerank.sort_by_dominant_color.dominant_color import get_dominant_color
+from utils.color_table import TABLE_DIR, HIST_LEVELS, ColorTableWriter
 
 # Define dataset paths
 dataset_paths = {
@@ -36,48 +35,101 @@ dataset_paths = {
     },
 }
 
-
-def get_luminance(r, g, b):
-    return math.sqrt(0.241 * r + 0.691 * g + 0.068 * b)
-
-
-def step_sort_key(r, g, b, repetitions=1):
-    lum = get_luminance(r, g, b)
-    h, s, v = colorsys.rgb_to_hsv(r, g, b)
-    h2 = int(h * repetitions)
-    lum2 = int(lum * repetitions)
-    v2 = int(v * repetitions)
-
-    if h2 % 2 == 1:
-        v2 = repetitions - v2
-        lum2 = repetitions - lum2
-
-    return (h2, lum2, v2)
-
-
-def process_dataset(frames_path, save_path):
-    frame_paths = list(Path(frames_path).rglob("*.jpg"))
-
-    for frame in tqdm(frame_paths, desc=f"Processing {frames_path}"):
-        relative_path = Path(*frame.parts[frame.parts.index("autoshot") :])
-        save_json_path = Path(save_path) / relative_path.with_suffix("")
-
-        if save_json_path.with_suffix(".json").exists():
-            continue
-
-        save_json_path.parent.mkdir(parents=True, exist_ok=True)
-
+# Colour features are computed on a thumbnail: JPEG draft mode decodes it at
+# 1/2, 1/4 or 1/8 scale directly, k-means runs on at most SAMPLE_SIZE² pixels
+SAMPLE_SIZE = 64
+KMEANS_CLUSTERS = 5
+KMEANS_ITERATIONS = 10
+
+
+def load_pixels(image_path, size=SAMPLE_SIZE) -> np.ndarray:
+    """(n, 3) float32 RGB pixels of a downsampled decode of image_path."""
+    with Image.open(image_path) as image:
+        image.draft("RGB", (size, size))
+        image = image.convert("RGB")
+        image.thumbnail((size, size), Image.BILINEAR)
+        return np.asarray(image, dtype=np.float32).reshape(-1, 3)
+
+
+def kmeans_dominant(pixels, k=KMEANS_CLUSTERS, iterations=KMEANS_ITERATIONS) -> np.ndarray:
+    """
+    Centre of the largest k-means cluster of the pixels. Centres start from
+    farthest-point seeding (median-luminance pixel first), so the result is
+    deterministic and one large uniform area is not split between seeds.
+    """
+    k = min(k, len(pixels))
+    luminance = pixels @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    seeds = [int(np.argsort(luminance, kind="stable")[len(pixels) // 2])]
+    nearest = ((pixels - pixels[seeds[0]]) ** 2).sum(axis=1)
+    for _ in range(1, k):
+        seeds.append(int(np.argmax(nearest)))
+        np.minimum(nearest, ((pixels - pixels[seeds[-1]]) ** 2).sum(axis=1), out=nearest)
+    centers = pixels[seeds].copy()
+    for _ in range(iterations):
+        distances = ((pixels[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        labels = distances.argmin(axis=1)
+        counts = np.bincount(labels, minlength=k)
+        sums = np.zeros_like(centers)
+        np.add.at(sums, labels, pixels)
+        updated = np.where(counts[:, None] > 0, sums / np.maximum(counts, 1)[:, None], centers)
+        if np.allclose(updated, centers, atol=0.5):
+            centers = updated
+            break
+        centers = updated
+    return centers[np.argmax(counts)]
+
+
+def color_histogram(pixels, levels=HIST_LEVELS) -> np.ndarray:
+    """L1-normalised levels³-bin RGB histogram."""
+    quantised = np.minimum((pixels * (levels / 256.0)).astype(np.int64), levels - 1)
+    bins = (quantised[:, 0] * levels + quantised[:, 1]) * levels + quantised[:, 2]
+    hist = np.bincount(bins, minlength=levels**3).astype(np.float32)
+    return hist / max(hist.sum(), 1.0)
+
+
+def video_colors(video_dir):
+    """(video_name, frames, dominant rgb, histograms) of every keyframe of one video."""
+    frames, rgb, hist = [], [], []
+    for image_path in sorted(Path(video_dir).glob("*.jpg")):
         try:
-            dominant_color = get_dominant_color(frame)
-            data = {
-                "rgb": dominant_color,
-                "hsv": colorsys.rgb_to_hsv(*dominant_color),
-                "hls": colorsys.rgb_to_hls(*dominant_color),
-            }
-            with open(save_json_path.with_suffix(".json"), "w") as f:
-                ujson.dump(data, f, indent=4)
+            pixels = load_pixels(image_path)
         except Exception as e:
-            print(f"Failed to process {frame}: {e}")
+            print(f"Failed to process {image_path}: {e}")
+            continue
+        frames.append(int(image_path.stem))
+        rgb.append(np.rint(kmeans_dominant(pixels)))
+        hist.append(color_histogram(pixels))
+    return (
+        Path(video_dir).name,
+        np.asarray(frames, dtype=np.int32),
+        np.asarray(rgb, dtype=np.float32).reshape(-1, 3),
+        np.asarray(hist, dtype=np.float32).reshape(len(frames), -1),
+    )
+
+
+def process_dataset(frames_path, save_path, workers=None):
+    """
+    Dominant colours and histograms of every keyframe of one batch, written
+    to <save_path>/autoshot/color_table (RERANK_COLOR_PATH points at
+    <save_path>/autoshot). Videos finished by an interrupted run are skipped.
+    """
+    output_dir = os.path.join(save_path, "autoshot", TABLE_DIR)
+    os.makedirs(os.path.dirname(output_dir), exist_ok=True)
+    video_dirs = sorted(
+        str(path)
+        for path in Path(frames_path).glob("Keyframes_*/keyframes/*")
+        if path.is_dir()
+    )
+
+    with ColorTableWriter(output_dir) as writer:
+        todo = [path for path in video_dirs if Path(path).name not in writer.done]
+        print(f"{frames_path}: {len(video_dirs) - len(todo)} videos done, {len(todo)} to go")
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            for video_name, frames, rgb, hist in tqdm(
+                pool.map(video_colors, todo), total=len(todo), desc=f"Processing {frames_path}"
+            ):
+                writer.add_video(video_name, frames, rgb, hist)
+    print(f"Color table: {writer.rows} frames in {output_dir}")
 
 
 def main():
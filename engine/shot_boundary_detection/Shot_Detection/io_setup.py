@@ -67,16 +67,18 @@ class CutKeyFrameLoader:
     A class for extracting keyframes from videos based on scene information.
     """
 
-    def __init__(self, scene_json_dir: str, key_frame_dir: str):
+    def __init__(self, scene_json_dir: str, key_frame_dir: str, frame_name_format: str = "{}.jpg"):
         """
         Initialize the CutKeyFrameLoader.
 
         Args:
             scene_json_dir (str): Directory containing scene JSON files.
             key_frame_dir (str): Directory to save extracted keyframes.
+            frame_name_format (str): Format of the saved keyframe file name. Default is "{}.jpg".
         """
         self.scene_json_dir = scene_json_dir
         self.keyframes_dir = key_frame_dir
+        self.frame_name_format = frame_name_format
 
     def sample_frames_from_shot(self, start: int, end: int, num_samples: int = 3) -> List[int]:
         """
@@ -138,7 +140,7 @@ class CutKeyFrameLoader:
             key (str): Identifier for the video (used in error messages).
             keyframe_path (str): Directory to save the frame.
         """
-        filename = os.path.join(keyframe_path, f"{index}.jpg")
+        filename = os.path.join(keyframe_path, self.frame_name_format.format(index))
         ret, frame = self.read_frame(cap, index)
         if ret:
             if not self.save_frame(frame, filename):
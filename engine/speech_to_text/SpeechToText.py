@@ -9,15 +9,31 @@ import numpy as np
 from pyctcdecode import Alphabet, BeamSearchDecoderCTC, LanguageModel
 import os
 import math
-from pydub import AudioSegment
+import time
+from multiprocessing import get_context
+from typing import List, Optional
 from collections import defaultdict, OrderedDict
 
+from pathlib import Path
+import sys
+
+current_path = Path(__file__).resolve()
+for parent in current_path.parents:
+    if parent.name == "SIU_Pumpking":
+        #print(f"Adding {parent} to sys.path")
+        sys.path.append(str(parent))
+        break
+else:
+    raise RuntimeError("Could not find 'SIU_Pumpking' in the path hierarchy.")
+
+from configs.METACLIP_v2_configs import METACLIPV2Config
+
 HF_token = METACLIPV2Config().HUGGINGFACE_HUB_TOKEN
 
 
 class SpeechToText:
-    # load language decoder from "ngram_lm_path" (.bin file)
-    def get_decoder_ngram_model(self, tokenizer, ngram_lm_path):
+    # CTC alphabet of the wav2vec2 tokenizer
+    def build_alphabet(self, tokenizer):
         vocab_dict = tokenizer.get_vocab()
         sort_vocab = sorted((value, key) for (key, value) in vocab_dict.items())
         vocab = [x[1] for x in sort_vocab][:-2]
@@ -25,13 +41,19 @@ class SpeechToText:
         vocab_list[tokenizer.pad_token_id] = ""
         vocab_list[tokenizer.unk_token_id] = ""
         vocab_list[tokenizer.word_delimiter_token_id] = " "
-        alphabet = Alphabet.build_alphabet(
-            vocab_list, ctc_token_idx=tokenizer.pad_token_id
-        )
+        return Alphabet.build_alphabet(vocab_list, ctc_token_idx=tokenizer.pad_token_id)
+
+    # load language decoder from "ngram_lm_path" (.bin file)
+    def get_decoder_ngram_model(self, tokenizer, ngram_lm_path):
+        alphabet = self.build_alphabet(tokenizer)
         lm_model = kenlm.Model(ngram_lm_path)
         decoder = BeamSearchDecoderCTC(alphabet, language_model=LanguageModel(lm_model))
         return decoder
 
+    # plain CTC beam search decoder, without language model
+    def get_decoder_model(self, tokenizer):
+        return BeamSearchDecoderCTC(self.build_alphabet(tokenizer))
+
     # read wav file and return frame_rate, vector
     def read(self, f, normalized=True):
         a = pydub.AudioSegment.from_mp3(f)
@@ -48,24 +70,50 @@ class SpeechToText:
         sr, x = self.read(audio_path)
         return x
 
-    def __init__(self):
-        self.device = "cuda"
+    def __init__(
+        self,
+        device: str = "cuda",
+        model_name: str = "phamgiakiet273/wav2vec2-base-vi-vlsp530h",
+        lm_file: Optional[str] = "/workspace/ai_intern/kietpg/cache/vi_lm_4grams.bin",
+        beam_width: int = 500,
+        batch_size: int = 8,
+        max_batch_seconds: float = 240.0,
+        decode_workers: Optional[int] = None,
+    ):
+        self.device = device if torch.cuda.is_available() else "cpu"
+        self.sampling_rate = 16_000
+        self.beam_width = beam_width
+        self.batch_size = batch_size
+        self.max_batch_seconds = max_batch_seconds
+        self.decode_workers = (
+            decode_workers if decode_workers is not None else (os.cpu_count() or 1)
+        )
+        self._decode_pool = None
+        self.last_stats = {}
+
         # load processor and model for speech to text
         self.processor = Wav2Vec2Processor.from_pretrained(
-            "phamgiakiet273/wav2vec2-base-vi-vlsp530h",
+            model_name,
             use_auth_token=HF_token,
         )
-        self.model = Wav2Vec2ForCTC.from_pretrained(
-            "phamgiakiet273/wav2vec2-base-vi-vlsp530h",
-            use_auth_token=HF_token,
-        ).to(self.device)
-
-        # init language model decoder
-        self.lm_file = "/workspace/ai_intern/kietpg/cache/vi_lm_4grams.bin"
-        self.ngram_lm_model = self.get_decoder_ngram_model(
-            self.processor.tokenizer, self.lm_file
+        self.model = (
+            Wav2Vec2ForCTC.from_pretrained(
+                model_name,
+                use_auth_token=HF_token,
+            )
+            .to(self.device)
+            .eval()
         )
 
+        # init language model decoder (plain CTC beam search without lm_file)
+        self.lm_file = lm_file
+        if self.lm_file:
+            self.ngram_lm_model = self.get_decoder_ngram_model(
+                self.processor.tokenizer, self.lm_file
+            )
+        else:
+            self.ngram_lm_model = self.get_decoder_model(self.processor.tokenizer)
+
         # init audio model and pipeline for voice activity detection
         self.audio_model = Model.from_pretrained(
             "pyannote/segmentation",
@@ -85,46 +133,138 @@ class SpeechToText:
         }
         self.audio_pipeline.instantiate(HYPER_PARAMETERS)
 
+    def decode_pool(self):
+        # pyctcdecode shares the language model with forked workers, so the
+        # pool has to be created after the decoder
+        if self._decode_pool is None and self.decode_workers > 1:
+            self._decode_pool = get_context("fork").Pool(self.decode_workers)
+        return self._decode_pool
+
+    def close(self):
+        if self._decode_pool is not None:
+            self._decode_pool.close()
+            self._decode_pool.join()
+            self._decode_pool = None
+
+    # decode the whole audio track of a video to a mono 16 kHz float32 vector
+    def load_audio(self, video_path: str) -> np.ndarray:
+        command = [
+            "ffmpeg",
+            "-nostdin",
+            "-loglevel",
+            "error",
+            "-i",
+            video_path,
+            "-f",
+            "f32le",
+            "-ac",
+            "1",
+            "-ar",
+            str(self.sampling_rate),
+            "-",
+        ]
+        output = subprocess.run(command, capture_output=True, check=True).stdout
+        return np.frombuffer(output, dtype=np.float32)
+
+    # wav2vec2 logits of a list of audio vectors, batched by similar length
+    def batch_logits(self, audios: List[np.ndarray]) -> List[np.ndarray]:
+        order = sorted(range(len(audios)), key=lambda i: len(audios[i]))
+        max_batch_samples = self.max_batch_seconds * self.sampling_rate
+        batches, batch = [], []
+        for i in order:
+            # sorted by length: the padded size of the batch is the current item
+            if batch and (
+                len(batch) == self.batch_size
+                or (len(batch) + 1) * len(audios[i]) > max_batch_samples
+            ):
+                batches.append(batch)
+                batch = []
+            batch.append(i)
+        if batch:
+            batches.append(batch)
+
+        logits = [None] * len(audios)
+        for batch in batches:
+            inputs = self.processor(
+                [audios[i] for i in batch],
+                sampling_rate=self.sampling_rate,
+                padding=True,
+                return_tensors="pt",
+            ).to(self.device)
+            with torch.inference_mode():
+                outputs = self.model(**inputs).logits.float().cpu().numpy()
+            lengths = self.model._get_feat_extract_output_lengths(
+                torch.tensor([len(audios[i]) for i in batch])
+            ).tolist()
+            for row, (i, length) in enumerate(zip(batch, lengths)):
+                logits[i] = outputs[row, :length]
+        return logits
+
+    # beam search decode every logits matrix, in parallel over decode_workers
+    def decode(self, logits: List[np.ndarray]) -> List[str]:
+        if not logits:
+            return []
+        return self.ngram_lm_model.decode_batch(
+            self.decode_pool(), logits, beam_width=self.beam_width
+        )
+
+    # return transcripts of in-memory 16k audio vectors
+    def transcribe(self, audios: List[np.ndarray]) -> List[str]:
+        return self.decode(self.batch_logits(audios))
+
     # return transcript from audio file with beam search decode
     # audio file must be .wav file and 16k sampling rate
     def speech_to_text(self, audio_path: str):
         audio_vector = self.audio_to_vector(audio_path)
-        inputs = self.processor(
-            audio_vector, sampling_rate=16_000, return_tensors="pt"
-        ).to(self.device)
-        with torch.no_grad():
-            outputs = self.model(**inputs).logits
-        transcription = self.ngram_lm_model.decode(
-            outputs.cpu().detach().numpy()[0], beam_width=500
+        return self.transcribe([audio_vector])[0]
+
+    # return transcript from video file, entirely in memory
+    # (wav_path is kept for compatibility, nothing is written to it anymore)
+    # the return is a dict : { "start_end" : transcript }
+    def video_to_text(self, video_path: str, wav_path: Optional[str] = None):
+        started = time.perf_counter()
+        audio = self.load_audio(video_path)
+        audio_seconds = len(audio) / self.sampling_rate
+        loaded = time.perf_counter()
+
+        video_speech_region = self.audio_pipeline(
+            {
+                "waveform": torch.from_numpy(audio).unsqueeze(0),
+                "sample_rate": self.sampling_rate,
+            }
         )
-        return transcription
-
-    # return transcript from video file
-    # the function will save splitted .wav files in wav_path
-    # the return is a dict : { tuple(start,end) : transcript }
-    def video_to_text(self, video_path: str, wav_path: str):
-        video_name = os.path.basename(video_path)
-        total_wav_path = wav_path + str(video_name).replace(".mp4", "") + ".wav"
-        if not (os.path.exists(total_wav_path)):
-            command = (
-                "ffmpeg -y -i " + video_path + " -ac 1 -ar 16000 " + total_wav_path
-            )
-            subprocess.call(command, shell=True)
-        video_speech_region = self.audio_pipeline(total_wav_path)
-        video_audio = AudioSegment.from_wav(total_wav_path)
-        video_transcript = {}
+        keys, regions = [], []
         for speech in video_speech_region.get_timeline().support():
             # active speech between speech.start and speech.end
             start = math.floor(speech.start)
             end = math.ceil(speech.end)
-            print("speech start: ", start, " ---- ", "speech end: ", end)
-            cur_audio = video_audio[start * 1000 : end * 1000 + 1]
-            cur_audo_path = wav_path + "speech" + str(start) + "-" + str(end) + ".wav"
-            cur_audio.export(cur_audo_path, format="wav")
-            transcription = self.speech_to_text(cur_audo_path)
-            video_transcript[str(str(start) + "_" + str(end))] = transcription
-        # text = self.speech_to_text(wav_path)
-        return OrderedDict(video_transcript)
+            # same slice as the former pydub export: [start s, end s + 1 ms]
+            regions.append(
+                audio[
+                    start * self.sampling_rate : end * self.sampling_rate
+                    + self.sampling_rate // 1000
+                ]
+            )
+            keys.append(str(str(start) + "_" + str(end)))
+        detected = time.perf_counter()
+
+        logits = self.batch_logits(regions)
+        acoustic = time.perf_counter()
+        transcriptions = self.decode(logits)
+        decoded = time.perf_counter()
+
+        total = decoded - started
+        self.last_stats = {
+            "audio_seconds": round(audio_seconds, 2),
+            "regions": len(regions),
+            "load_seconds": round(loaded - started, 2),
+            "vad_seconds": round(detected - loaded, 2),
+            "acoustic_seconds": round(acoustic - detected, 2),
+            "decode_seconds": round(decoded - acoustic, 2),
+            "rtf": round(total / audio_seconds, 4) if audio_seconds else 0.0,
+        }
+        print(os.path.basename(video_path), self.last_stats)
+        return OrderedDict(zip(keys, transcriptions))
 
 
 # s2t = SpeechToText()
@@ -1,4 +1,3 @@
-from SpeechToText import SpeechToText
 import pathlib
 from pathlib import Path
 import os
@@ -6,7 +5,18 @@ import json
 from collections import defaultdict, OrderedDict
 import pandas as pd
 
-s2t = SpeechToText()
+import sys
+
+current_path = Path(__file__).resolve()
+for parent in current_path.parents:
+    if parent.name == "SIU_Pumpking":
+        #print(f"Adding {parent} to sys.path")
+        sys.path.append(str(parent))
+        break
+else:
+    raise RuntimeError("Could not find 'SIU_Pumpking' in the path hierarchy.")
+
+from engine.speech_to_text.SpeechToText import SpeechToText
 
 dataset_video_path_0 = "/dataset/AIC2024/original_dataset/0/videos/"
 json_save_path_0 = "/dataset/KLTN/0/speech_to_text/"
@@ -33,21 +43,27 @@ json_save_path_2 = "/dataset/KLTN/2/speech_to_text/"
 # json_save_path_test = "/dataset/AIC2024/pumkin_dataset/0/speech_to_text/"
 
 
-def folder_scan(data_path: str, save_path: str):
+def transcribe_video(s2t: SpeechToText, video_path: str, save_path: str):
+    """
+    Transcribe one video into save_path/<video>.json. Audio is decoded and
+    split in memory, no wav files are written. Returns the transcript dict.
+    """
+    video_name = pathlib.PurePath(video_path).name
+    Path(save_path).mkdir(parents=True, exist_ok=True)
+    video_json_path = str(Path(save_path) / str(video_name).replace(".mp4", "")) + ".json"
+    video_dict = s2t.video_to_text(video_path=str(video_path))
+    with open(video_json_path, "w", encoding="utf-8-sig") as outfile:
+        json.dump(video_dict, outfile, indent=4, ensure_ascii=False)
+    return video_dict
+
+
+def folder_scan(s2t: SpeechToText, data_path: str, save_path: str):
     total_dict = {}
     for file in Path(data_path).glob("**/*.mp4"):
         if not file.is_file():  # Skip directories
             continue
         video_name = pathlib.PurePath(file).name
-        video_save_path = save_path + str(video_name).replace(".mp4", "") + "/"
-        video_save_path = Path(video_save_path)
-        video_save_path.mkdir(parents=True, exist_ok=True)
-        video_json_path = str(video_save_path) + ".json"
-        video_dict = s2t.video_to_text(
-            video_path=str(file), wav_path=str(video_save_path) + "/"
-        )
-        with open(video_json_path, "w", encoding="utf-8-sig") as outfile:
-            json.dump(video_dict, outfile, indent=4, ensure_ascii=False)
+        video_dict = transcribe_video(s2t, str(file), save_path)
         total_dict.update({str(video_name).replace(".mp4", ""): video_dict})
         total_dict = OrderedDict(total_dict)
         with open(
@@ -57,9 +73,12 @@ def folder_scan(data_path: str, save_path: str):
         print(file)
 
 
-folder_scan(dataset_video_path_0, json_save_path_0)
-folder_scan(dataset_video_path_1, json_save_path_1)
-folder_scan(dataset_video_path_2, json_save_path_2)
+if __name__ == "__main__":
+    s2t = SpeechToText()
+
+    folder_scan(s2t, dataset_video_path_0, json_save_path_0)
+    folder_scan(s2t, dataset_video_path_1, json_save_path_1)
+    folder_scan(s2t, dataset_video_path_2, json_save_path_2)
 
 
 # folder_scan(dataset_video_path_1, json_save_path_1)
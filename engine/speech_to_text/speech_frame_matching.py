@@ -1,6 +1,3 @@
-import torch
-from transformers import AutoModel, AutoTokenizer
-import py_vncorenlp
 import re
 
 import numpy as np
@@ -15,6 +12,11 @@ def cosine(a, b):
 
 class PhoBERT:
     def __init__(self) -> None:
+        # Imported here so that the alignment helpers below (align_frames,
+        # align_video, matching) load without torch / transformers / VnCoreNLP
+        from transformers import AutoModel, AutoTokenizer
+        import py_vncorenlp
+
         self.device = "cuda"
         self.phobert = AutoModel.from_pretrained("vinai/phobert-base-v2")
         self.tokenizer = AutoTokenizer.from_pretrained("vinai/phobert-base-v2")
@@ -39,6 +41,8 @@ class PhoBERT:
         return text
 
     def extract(self, text: str):
+        import torch
+
         input_ids = torch.tensor([self.tokenizer.encode(text)])
         input_ids.to(self.device)
         with torch.no_grad():
@@ -54,6 +58,7 @@ import numpy as np
 
 import pandas as pd
 from collections import defaultdict, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 
 speech_json_0 = "/dataset/KLTN/0/speech_to_text/"
 keyframe_jpg_0 = "/dataset/KLTN/0/frames/autoshot/"
@@ -70,87 +75,144 @@ keyframe_jpg_2 = "/dataset/KLTN/2/frames/autoshot/"
 save_path_2 = "/dataset/KLTN/2/speech_to_text/"
 fps_dict_2 = "/dataset/KLTN/fps/video_fps_2.json"
 
-fps_dict_all = {}
-
-with open(fps_dict_0, "r", encoding="utf-8-sig") as infile:
-    fps_dict_all.update(json.load(infile))
-
-with open(fps_dict_1, "r", encoding="utf-8-sig") as infile:
-    fps_dict_all.update(json.load(infile))
-
-with open(fps_dict_2, "r", encoding="utf-8-sig") as infile:
-    fps_dict_all.update(json.load(infile))
-
-phobert = PhoBERT()
 
-
-def matching(speech_json, keyframe_jpg, save_path):
-    total_dict = {}
-    for video_json in Path(speech_json).glob("*.json"):
-
-        video_name = str(os.path.basename(video_json)).replace(".json", "")
+def load_fps_dict(fps_paths):
+    fps_dict_all = {}
+    for fps_path in fps_paths:
+        with open(fps_path, "r", encoding="utf-8-sig") as infile:
+            fps_dict_all.update(json.load(infile))
+    return fps_dict_all
+
+
+def read_transcript(segmenter, video_json):
+    """
+    Load a per-video transcript json ({"start_end": text}) into sorted
+    start / end arrays (seconds) and the segmented words of every region.
+    `segmenter` is any callable text -> list of words (PhoBERT.segmenter).
+    """
+    with open(str(video_json), encoding="utf-8-sig") as f:
+        data = json.load(f)
+
+    regions = []
+    for key, text in data.items():
+        start_frame, end_frame = key.split("_", 1)
+        regions.append((int(start_frame), int(end_frame), text))
+    regions.sort(key=lambda region: (region[0], region[1]))
+
+    starts = np.array([region[0] for region in regions], dtype=np.float64)
+    ends = np.array([region[1] for region in regions], dtype=np.float64)
+    transcripts = [segmenter(region[2]) for region in regions]
+    return starts, ends, transcripts
+
+
+def align_frames(starts, ends, seconds):
+    """
+    Index of the speech region of every keyframe timestamp: the region whose
+    [start, end] contains it, otherwise the first region starting after it
+    (the last region if none does). Returns -1 everywhere when there is no
+    region at all.
+    """
+    if len(starts) == 0:
+        return np.full(len(seconds), -1, dtype=np.int64)
+    # number of regions starting at or before each timestamp
+    pos = np.searchsorted(starts, seconds, side="right")
+    previous = np.maximum(pos - 1, 0)
+    inside = (pos > 0) & (ends[previous] >= seconds)
+    following = np.minimum(pos, len(starts) - 1)
+    return np.where(inside, previous, following)
+
+
+def align_video(segmenter, video_json, keyframes_folder, fps):
+    """
+    Attach to every keyframe of keyframes_folder the segmented transcript of
+    the speech region it falls in. Returns {"00000.jpg": [words]}.
+    """
+    starts, ends, transcripts = read_transcript(segmenter, video_json)
+
+    pic_names = sorted(
+        entry.name
+        for entry in os.scandir(keyframes_folder)
+        if entry.is_file() and entry.name.endswith(".jpg")
+    )
+    seconds = np.array(
+        [int(pic_name[: -len(".jpg")]) for pic_name in pic_names], dtype=np.float64
+    ) / float(fps)
+
+    indices = align_frames(starts, ends, seconds)
+    return OrderedDict(
+        (pic_name, transcripts[index] if index >= 0 else [])
+        for pic_name, index in zip(pic_names, indices.tolist())
+    )
+
+
+def default_segmenter():
+    return PhoBERT().segmenter
+
+
+# Segmenter of the current worker process, built once by _init_worker
+_worker_segmenter = None
+
+
+def _init_worker(segmenter_factory):
+    global _worker_segmenter
+    _worker_segmenter = segmenter_factory()
+
+
+def _align_job(job):
+    video_name, video_json, keyframes_folder, fps = job
+    return video_name, align_video(_worker_segmenter, video_json, keyframes_folder, fps)
+
+
+def matching(
+    fps_dict_all,
+    speech_json,
+    keyframe_jpg,
+    save_path,
+    segmenter_factory=default_segmenter,
+    workers=1,
+):
+    """
+    Align every transcript of speech_json with its keyframes and write
+    transcript_all_autoshot_segmented.json once at the end. Videos are split
+    across `workers` processes, each building its own segmenter with
+    segmenter_factory (a picklable callable returning text -> words).
+    """
+    jobs = []
+    for video_json in sorted(Path(speech_json).glob("*.json")):
+        video_name = video_json.stem
         if not (video_name.startswith("L")):
             continue
         keyframes_folder = (
             keyframe_jpg + "Keyframes_" + video_name[:3] + "/keyframes/" + video_name
         )
-        with open(str(video_json), encoding="utf-8-sig") as f:
-            data = json.load(f)
-
-        transcript_dict = {}
-        for frame_transcript in data.items():
-            start_frame = ""
-            end_frame = ""
-            for i in range(0, len(frame_transcript[0])):
-                if frame_transcript[0][i] == "_":
-                    end_frame = frame_transcript[0][i + 1 :]
-                    break
-                start_frame += frame_transcript[0][i]
-            start_frame = int(start_frame)
-            end_frame = int(end_frame)
-            transcript_dict[(start_frame, end_frame)] = phobert.segmenter(
-                frame_transcript[1]
-            )
-
-        video_dict = {}
-
-        # prev_transcript = ""
-
-        for file in Path(keyframes_folder).glob("**/*.jpg"):
-            if not file.is_file():  # Skip directories
-                continue
-            pic_name = str(os.path.basename(str(file)))
-            pic_frame = int(os.path.basename(str(file).replace(".jpg", "")))
-            second = float(pic_frame) / float(fps_dict_all[video_name])
-            for x in transcript_dict.keys():
-                if second >= x[0] and second <= x[1]:
-                    print(second, x[0], x[1], transcript_dict[x])
-                    video_dict[pic_name] = transcript_dict[x]
-                    # prev_transcript = transcript_dict[x]
-                    break
-                if x[0] > second:
-                    break
-            print(file)
-
-            if not pic_name in video_dict:
-                for x in transcript_dict.keys():
-                    transcript = transcript_dict[x]
-                    if x[0] > second:
-                        break
-                video_dict[pic_name] = transcript
-            # prev_transcript = video_dict[pic_name]
-
-        video_dict = OrderedDict(sorted(video_dict.items()))
-        total_dict[str(video_name + ".mp4")] = video_dict
-        total_dict = OrderedDict(sorted(total_dict.items()))
-        with open(
-            save_path + "transcript_all_autoshot_segmented.json",
-            "w",
-            encoding="utf-8-sig",
-        ) as outfile:
-            json.dump(total_dict, outfile, indent=4, ensure_ascii=False)
-
-
-matching(speech_json_0, keyframe_jpg_0, save_path_0)
-matching(speech_json_1, keyframe_jpg_1, save_path_1)
-matching(speech_json_2, keyframe_jpg_2, save_path_2)
+        jobs.append(
+            (video_name, str(video_json), keyframes_folder, fps_dict_all[video_name])
+        )
+
+    total_dict = {}
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(segmenter_factory,)
+    ) as executor:
+        for video_name, video_dict in executor.map(_align_job, jobs):
+            print(video_name)
+            total_dict[str(video_name + ".mp4")] = video_dict
+
+    total_dict = OrderedDict(sorted(total_dict.items()))
+    with open(
+        save_path + "transcript_all_autoshot_segmented.json",
+        "w",
+        encoding="utf-8-sig",
+    ) as outfile:
+        json.dump(total_dict, outfile, indent=4, ensure_ascii=False)
+    return total_dict
+
+
+if __name__ == "__main__":
+    fps_dict_all = load_fps_dict([fps_dict_0, fps_dict_1, fps_dict_2])
+
+    for speech_json, keyframe_jpg, save_path in [
+        (speech_json_0, keyframe_jpg_0, save_path_0),
+        (speech_json_1, keyframe_jpg_1, save_path_1),
+        (speech_json_2, keyframe_jpg_2, save_path_2),
+    ]:
+        matching(fps_dict_all, speech_json, keyframe_jpg, save_path, workers=4)
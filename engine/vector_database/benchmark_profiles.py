@@ -0,0 +1,234 @@
+"""
+Recall / latency benchmark of the index profiles against a local Qdrant:
+
+    python engine/vector_database/benchmark_profiles.py \
+        --profiles binary scalar product none \
+        --hnsw-ef 64 128 256 --oversampling 1.0 2.0 4.0
+
+For every profile a bench_<profile> collection is built from the same corpus
+(synthetic clustered unit vectors, or rows sampled from --features .npy files),
+then every (hnsw_ef, oversampling) setting is queried and compared with exact
+numpy cosine search: recall@k and p50 / p99 latency per query.
+"""
+
+import os
+import time
+import argparse
+import ujson
+import numpy as np
+
+from pathlib import Path
+import sys
+
+current_path = Path(__file__).resolve()
+for parent in current_path.parents:
+    if parent.name == "SIU_Pumpking":
+        #print(f"Adding {parent} to sys.path")
+        sys.path.append(str(parent))
+        break
+else:
+    raise RuntimeError("Could not find 'SIU_Pumpking' in the path hierarchy.")
+
+from qdrant_client import QdrantClient, models
+
+from engine.vector_database.index_profiles import (
+    INDEX_PROFILES,
+    collection_config,
+    search_params,
+)
+from utils.logger import get_logger
+
+logger = get_logger()
+
+
+def normalise(x):
+    x = np.asarray(x, dtype=np.float32)
+    return x / np.maximum(np.linalg.norm(x, axis=1, keepdims=True), 1e-12)
+
+
+def synthetic_corpus(size, dim, clusters=256, spread=0.35, seed=0):
+    """Clustered unit vectors, closer to CLIP features than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = normalise(rng.standard_normal((clusters, dim)))
+    labels = rng.integers(0, clusters, size)
+    noise = rng.standard_normal((size, dim)).astype(np.float32) * spread / np.sqrt(dim)
+    return normalise(centers[labels] + noise)
+
+
+def sampled_corpus(feature_paths, size, seed=0):
+    """Up to `size` rows sampled uniformly from (n, dim) .npy feature files."""
+    rng = np.random.default_rng(seed)
+    arrays = [np.load(path, mmap_mode="r") for path in sorted(feature_paths)]
+    counts = np.array([len(a) for a in arrays])
+    total = int(counts.sum())
+    rows = np.sort(rng.choice(total, min(size, total), replace=False))
+    offsets = np.r_[0, np.cumsum(counts)]
+    file_idx = np.searchsorted(offsets, rows, side="right") - 1
+    return normalise(
+        np.concatenate(
+            [
+                arrays[i][rows[file_idx == i] - offsets[i]]
+                for i in range(len(arrays))
+                if np.any(file_idx == i)
+            ]
+        )
+    )
+
+
+def split_queries(corpus, num_queries, noise=0.05, seed=1):
+    """Queries are perturbed corpus rows, so every query has real near neighbours."""
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(corpus), num_queries, replace=False)
+    queries = corpus[rows] + rng.standard_normal((num_queries, corpus.shape[1])).astype(
+        np.float32
+    ) * noise / np.sqrt(corpus.shape[1])
+    return normalise(queries)
+
+
+def exact_top_k(corpus, queries, k, chunk=256):
+    """Ground truth ids (row numbers) of exact cosine search."""
+    result = np.empty((len(queries), k), dtype=np.int64)
+    for start in range(0, len(queries), chunk):
+        scores = queries[start : start + chunk] @ corpus.T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+        result[start : start + chunk] = np.take_along_axis(top, order, axis=1)
+    return result
+
+
+def build_collection(client, name, profile, corpus, batch_size=1024):
+    if client.collection_exists(collection_name=name):
+        client.delete_collection(collection_name=name)
+    client.create_collection(
+        collection_name=name,
+        # few shards: the benchmark corpus is small and runs on one node
+        **collection_config(profile, corpus.shape[1], shard_number=1),
+    )
+    start = time.perf_counter()
+    for offset in range(0, len(corpus), batch_size):
+        batch = corpus[offset : offset + batch_size]
+        client.upsert(
+            collection_name=name,
+            points=models.Batch(
+                ids=list(range(offset, offset + len(batch))),
+                vectors=batch.tolist(),
+            ),
+            wait=True,
+        )
+    # queries must hit a built index, not the optimizer backlog
+    while client.get_collection(collection_name=name).status != models.CollectionStatus.GREEN:
+        time.sleep(1)
+    return time.perf_counter() - start
+
+
+def run_queries(client, name, queries, k, params):
+    ids = np.full((len(queries), k), -1, dtype=np.int64)
+    latencies = np.empty(len(queries), dtype=np.float64)
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        points = client.query_points(
+            collection_name=name, query=query.tolist(), limit=k, search_params=params
+        ).points
+        latencies[i] = time.perf_counter() - start
+        found = [p.id for p in points]
+        ids[i, : len(found)] = found
+    return ids, latencies
+
+
+def recall_at_k(found, truth):
+    hits = sum(len(np.intersect1d(f, t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def benchmark(args):
+    if args.features:
+        corpus = sampled_corpus(args.features, args.size, seed=args.seed)
+    else:
+        corpus = synthetic_corpus(args.size, args.dim, seed=args.seed)
+    queries = split_queries(corpus, args.queries, seed=args.seed + 1)
+    logger.info(f"Corpus {corpus.shape}, {len(queries)} queries, computing exact top-{args.k}")
+    truth = exact_top_k(corpus, queries, args.k)
+
+    client = QdrantClient(url=args.url, port=None, prefer_grpc=True, timeout=args.timeout)
+    rows = []
+    for profile in args.profiles:
+        name = f"bench_{profile}"
+        build_seconds = build_collection(client, name, profile, corpus)
+        logger.info(f"{name}: built in {build_seconds:.1f}s")
+
+        quantised = INDEX_PROFILES[profile]["quantization_config"] is not None
+        settings = [(None, None)]
+        settings += [(ef, None) for ef in args.hnsw_ef]
+        if quantised:
+            settings += [(ef, os_) for ef in args.hnsw_ef for os_ in args.oversampling]
+
+        for hnsw_ef, oversampling in settings:
+            params = search_params(
+                profile,
+                hnsw_ef=hnsw_ef,
+                rescore=None if oversampling is None else True,
+                oversampling=oversampling,
+            )
+            # warm-up: first queries pay for loading segments
+            run_queries(client, name, queries[: min(10, len(queries))], args.k, params)
+            found, latencies = run_queries(client, name, queries, args.k, params)
+            rows.append(
+                {
+                    "profile": profile,
+                    "hnsw_ef": params.hnsw_ef,
+                    "oversampling": params.quantization.oversampling
+                    if params.quantization
+                    else None,
+                    "recall": round(recall_at_k(found, truth), 4),
+                    "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 2),
+                    "p99_ms": round(float(np.percentile(latencies, 99)) * 1000, 2),
+                    "build_s": round(build_seconds, 1),
+                }
+            )
+
+        if not args.keep:
+            client.delete_collection(collection_name=name)
+    return rows
+
+
+def print_table(rows, k):
+    header = f"{'profile':<8} {'hnsw_ef':>8} {'oversamp':>8} {'recall@' + str(k):>10} {'p50 ms':>8} {'p99 ms':>8}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        print(
+            f"{row['profile']:<8} {str(row['hnsw_ef']):>8} {str(row['oversampling']):>8} "
+            f"{row['recall']:>10.4f} {row['p50_ms']:>8.2f} {row['p99_ms']:>8.2f}"
+        )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Index profile recall / latency benchmark")
+    parser.add_argument("--url", default="http://0.0.0.0:6333")
+    parser.add_argument(
+        "--profiles", nargs="+", default=list(INDEX_PROFILES), choices=list(INDEX_PROFILES)
+    )
+    parser.add_argument(
+        "--features", nargs="*", default=None, help=".npy feature files to sample the corpus from"
+    )
+    parser.add_argument("--size", type=int, default=100_000, help="corpus size")
+    parser.add_argument("--dim", type=int, default=1152, help="synthetic vector size")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=100)
+    parser.add_argument("--hnsw-ef", nargs="*", type=int, default=[64, 128, 256])
+    parser.add_argument("--oversampling", nargs="*", type=float, default=[1.0, 2.0, 4.0])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=int, default=1800)
+    parser.add_argument("--keep", action="store_true", help="keep the bench_* collections")
+    parser.add_argument("--output", default=None, help="also write the results as JSON")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    rows = benchmark(args)
+    print_table(rows, args.k)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            ujson.dump(rows, f, indent=2)
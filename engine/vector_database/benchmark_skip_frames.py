@@ -0,0 +1,160 @@
+"""
+Request size and latency of skip_frames exclusion on an ingested collection:
+
+    python engine/vector_database/benchmark_skip_frames.py \
+        --collection SIGLIP_V2 --shots 50 --queries 200
+
+Samples --shots distinct shots from the collection and compares the legacy
+filter (HasIdCondition over every keyframe id of the skipped shots) with the
+shot_id MatchAny filter: serialized filter size, number of ids sent, and
+p50 / p99 latency of query_points with random query vectors.
+"""
+
+import time
+import argparse
+import ujson
+import numpy as np
+
+from pathlib import Path
+import sys
+
+current_path = Path(__file__).resolve()
+for parent in current_path.parents:
+    if parent.name == "SIU_Pumpking":
+        #print(f"Adding {parent} to sys.path")
+        sys.path.append(str(parent))
+        break
+else:
+    raise RuntimeError("Could not find 'SIU_Pumpking' in the path hierarchy.")
+
+from qdrant_client import models
+
+from engine.vector_database.qdrant_database import QDRANT
+from utils.logger import get_logger
+
+logger = get_logger()
+
+# random retrieve rounds before giving up on finding --shots distinct shots
+MAX_SAMPLE_ROUNDS = 20
+
+
+def sample_skip_frames(qdrant, num_shots, seed=0):
+    """
+    skip_frames entries of num_shots distinct shots, as the UI sends them.
+    Fewer when the collection has fewer shots (or they cannot be found in
+    MAX_SAMPLE_ROUNDS rounds).
+    """
+    rng = np.random.default_rng(seed)
+    total = qdrant.client.count(collection_name=qdrant.collection_name, exact=True).count
+    skip_frames = {}
+    for _ in range(MAX_SAMPLE_ROUNDS):
+        if len(skip_frames) >= num_shots or total == 0:
+            break
+        sample_size = min(total, num_shots * 4)
+        ids = rng.choice(total, sample_size, replace=False).tolist()
+        points = qdrant.client.retrieve(
+            collection_name=qdrant.collection_name,
+            ids=ids,
+            with_payload=[
+                "video_name",
+                "frame_name",
+                "related_start_frame",
+                "related_end_frame",
+            ],
+        )
+        for point in points:
+            video_name = point.payload["video_name"].replace(".mp4", "")
+            key = (video_name, int(point.payload["related_start_frame"]))
+            skip_frames.setdefault(
+                key,
+                {
+                    "video_name": video_name,
+                    "frame_name": str(point.payload["frame_name"]),
+                    "related_start_frame": str(point.payload["related_start_frame"]),
+                    "related_end_frame": str(point.payload["related_end_frame"]),
+                },
+            )
+            if len(skip_frames) == num_shots:
+                break
+        if sample_size == total:
+            break  # every point was retrieved, there are no more shots to find
+    if len(skip_frames) < num_shots:
+        logger.warning(f"Only {len(skip_frames)} distinct shots found, asked for {num_shots}")
+    return list(skip_frames.values())
+
+
+def time_queries(qdrant, query_filter, queries, limit):
+    latencies = np.empty(len(queries), dtype=np.float64)
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        qdrant.client.query_points(
+            collection_name=qdrant.collection_name,
+            query=query.tolist(),
+            query_filter=query_filter,
+            timeout=qdrant.timeout,
+            limit=limit,
+        )
+        latencies[i] = time.perf_counter() - start
+    return latencies
+
+
+def benchmark(args):
+    qdrant = QDRANT(args.collection)
+    skip_frames = sample_skip_frames(qdrant, args.shots, seed=args.seed)
+
+    qdrant.shot_id_indexed = False
+    legacy = qdrant._skip_conditions(skip_frames)
+    qdrant.shot_id_indexed = True
+    compact = qdrant._skip_conditions(skip_frames)
+
+    dim = qdrant.client.get_collection(
+        collection_name=qdrant.collection_name
+    ).config.params.vectors.size
+    rng = np.random.default_rng(args.seed + 1)
+    queries = rng.standard_normal((args.queries, dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    rows = []
+    for name, conditions in [("has_id", legacy), ("shot_id", compact)]:
+        query_filter = models.Filter(must_not=conditions)
+        # warm-up: first queries pay for loading segments
+        time_queries(qdrant, query_filter, queries[:10], args.k)
+        latencies = time_queries(qdrant, query_filter, queries, args.k)
+        condition = conditions[0]
+        rows.append(
+            {
+                "filter": name,
+                "ids": len(condition.has_id)
+                if isinstance(condition, models.HasIdCondition)
+                else len(condition.match.any),
+                "bytes": len(query_filter.model_dump_json(exclude_none=True)),
+                "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 2),
+                "p99_ms": round(float(np.percentile(latencies, 99)) * 1000, 2),
+            }
+        )
+    return rows
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="skip_frames filter benchmark")
+    parser.add_argument("--collection", required=True)
+    parser.add_argument("--shots", type=int, default=50, help="number of skipped shots")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="also write the results as JSON")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    rows = benchmark(args)
+    print(f"{'filter':<8} {'ids':>8} {'bytes':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for row in rows:
+        print(
+            f"{row['filter']:<8} {row['ids']:>8} {row['bytes']:>10} "
+            f"{row['p50_ms']:>8.2f} {row['p99_ms']:>8.2f}"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            ujson.dump(rows, f, indent=2)
@@ -0,0 +1,101 @@
+from qdrant_client import models
+from qdrant_client.models import Distance, VectorParams, HnswConfigDiff
+
+from typing import Optional
+
+# Named index profiles: quantisation + HNSW build settings of a collection and
+# the search-time defaults that go with them. "binary" is the historical setup.
+INDEX_PROFILES = {
+    "binary": {
+        "quantization_config": models.BinaryQuantization(
+            binary=models.BinaryQuantizationConfig(always_ram=True),
+        ),
+        "hnsw_config": HnswConfigDiff(
+            m=8,
+            ef_construct=50,
+            full_scan_threshold=0,
+            on_disk=False,
+        ),
+        "shard_number": 80,
+        # None keeps the Qdrant server defaults used so far
+        "search": {"hnsw_ef": None, "rescore": None, "oversampling": None},
+    },
+    "scalar": {
+        "quantization_config": models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8,
+                quantile=0.99,
+                always_ram=True,
+            ),
+        ),
+        "hnsw_config": HnswConfigDiff(m=16, ef_construct=100, on_disk=False),
+        "shard_number": 8,
+        "search": {"hnsw_ef": 128, "rescore": True, "oversampling": 1.5},
+    },
+    "product": {
+        "quantization_config": models.ProductQuantization(
+            product=models.ProductQuantizationConfig(
+                compression=models.CompressionRatio.X16,
+                always_ram=True,
+            ),
+        ),
+        "hnsw_config": HnswConfigDiff(m=16, ef_construct=100, on_disk=False),
+        "shard_number": 8,
+        "search": {"hnsw_ef": 128, "rescore": True, "oversampling": 3.0},
+    },
+    "none": {
+        "quantization_config": None,
+        "hnsw_config": HnswConfigDiff(m=16, ef_construct=100, on_disk=False),
+        "shard_number": 8,
+        "search": {"hnsw_ef": 128, "rescore": None, "oversampling": None},
+    },
+}
+
+
+def get_profile(name: str) -> dict:
+    if name not in INDEX_PROFILES:
+        raise ValueError(
+            f"Unknown index profile '{name}', expected one of {list(INDEX_PROFILES)}"
+        )
+    return INDEX_PROFILES[name]
+
+
+def collection_config(name: str, feature_size: int, shard_number: Optional[int] = None) -> dict:
+    """create_collection keyword arguments of profile `name`."""
+    profile = get_profile(name)
+    return {
+        "vectors_config": VectorParams(
+            size=feature_size,
+            distance=Distance.COSINE,
+            quantization_config=profile["quantization_config"],
+        ),
+        "optimizers_config": models.OptimizersConfigDiff(
+            default_segment_number=4, max_segment_size=2000000000
+        ),
+        "on_disk_payload": True,
+        "shard_number": shard_number or profile["shard_number"],
+        "hnsw_config": profile["hnsw_config"],
+    }
+
+
+def search_params(
+    name: str,
+    hnsw_ef: Optional[int] = None,
+    rescore: Optional[bool] = None,
+    oversampling: Optional[float] = None,
+    exact: bool = False,
+) -> models.SearchParams:
+    """
+    Search-time parameters: request values override the defaults of profile
+    `name`. Quantisation parameters are only sent to quantised collections.
+    """
+    profile = get_profile(name)
+    defaults = profile["search"]
+    hnsw_ef = hnsw_ef if hnsw_ef is not None else defaults["hnsw_ef"]
+    quantization = None
+    if profile["quantization_config"] is not None:
+        quantization = models.QuantizationSearchParams(
+            rescore=rescore if rescore is not None else defaults["rescore"],
+            oversampling=oversampling if oversampling is not None else defaults["oversampling"],
+        )
+    return models.SearchParams(hnsw_ef=hnsw_ef, exact=exact, quantization=quantization)
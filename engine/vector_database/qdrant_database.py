@@ -7,8 +7,9 @@ import ujson
 import glob
 
 from typing import List, Optional, Any
-from collections import defaultdict
+from collections import defaultdict, Counter
 import bisect
+from PIL import Image
 
 from pathlib import Path
 import sys
@@ -22,8 +23,29 @@ for parent in current_path.parents:
 else:
     raise RuntimeError("Could not find 'SIU_Pumpking' in the path hierarchy.")
 
+from engine.vector_database.index_profiles import collection_config, search_params
+from utils.feature_store import open_features
 from utils.metadata_util import get_batch  # , get_videos_from_batch
-from utils.vector_database_util import merge_scores, preprocess_object_dict
+from utils.vector_database_util import (
+    shot_id,
+    merge_scores,
+    fuse_scores,
+    mmr_select,
+    preprocess_object_dict,
+    object_label_key,
+    summarize_objects,
+)
+from utils.object_store import ObjectStore
+from utils.s2t_index import (
+    S2TIndex,
+    S2TIndexWriter,
+    caption_terms,
+    folded_text,
+    syllables,
+    term_overlap,
+    transcript_terms,
+)
+from utils.caption_util import read_shot_captions
 
 from utils.logger import get_logger
 
@@ -31,9 +53,37 @@ logger = get_logger()
 
 
 class QDRANT:
-    def __init__(self, collection_name=None, timeout=1800):
+    # s2t_filter sends at most this many point ids, larger match sets are
+    # filtered inside Qdrant on the diacritic-folded "s2t_folded" text index
+    S2T_PREFILTER_MAX_IDS = 4096
+    # hybrid search: dense / lexical candidates fetched per requested result
+    HYBRID_CANDIDATE_FACTOR = 3
+    # diversification: candidates re-ranked per requested result
+    DIVERSITY_CANDIDATE_FACTOR = 5
+    # addCaptions: set_payload operations sent per batch_update_points call
+    CAPTION_BATCH_SIZE = 256
+
+    def __init__(
+        self,
+        collection_name=None,
+        timeout=1800,
+        s2t_index_path=None,
+        index_profile="binary",
+        caption_index_path=None,
+    ):
         self.timeout = timeout
+        self.index_profile = index_profile
         self.collection_name = collection_name
+        self.shot_collection_name = (
+            f"{collection_name}_SHOT" if collection_name else None
+        )
+        self.s2t_index_path = s2t_index_path
+        self.s2t_index = self._load_s2t_index()
+        self.caption_index_path = caption_index_path
+        self.caption_index = self._load_caption_index()
+        # None: not checked yet, see _skip_conditions / _s2t_filter_conditions
+        self.shot_id_indexed = None
+        self.s2t_folded_indexed = None
 
         self.client = QdrantClient(
             url="http://0.0.0.0:6333", port=None, prefer_grpc=True, timeout=self.timeout
@@ -53,9 +103,19 @@ class QDRANT:
         FPS_PATH: List[str],
         SHOT_PATH: List[str],
         create_collection: bool = True,
+        object_index_top_n: int = 64,
+        S2T_INDEX_PATH: Optional[str] = None,
+        build_shot_collection: bool = True,
+        shot_pooling: str = "mean",
+        index_profile: Optional[str] = None,
     ):
 
         self.collection_name = collection_name
+        self.shot_id_indexed = None
+        self.s2t_folded_indexed = None
+        if index_profile:
+            self.index_profile = index_profile
+        self.shot_collection_name = f"{collection_name}_SHOT"
         self.size = feature_size
 
         if create_collection:
@@ -64,33 +124,22 @@ class QDRANT:
                 logger.warning("Collection existed, deleting...")
                 self.client.delete_collection(collection_name=self.collection_name)
 
-            logger.info(f"Creating collection {collection_name}...")
+            logger.info(
+                f"Creating collection {collection_name} ({self.index_profile} profile)..."
+            )
+            # profiles: engine/vector_database/index_profiles.py
+            # https://medium.com/@benitomartin/balancing-accuracy-and-speed-with-qdrant-hyperparameters-hydrid-search-and-semantic-caching-part-84b26037e594
             self.client.create_collection(
                 collection_name=collection_name,
-                vectors_config=VectorParams(
-                    size=feature_size,
-                    distance=Distance.COSINE,
-                    quantization_config=models.BinaryQuantization(
-                        binary=models.BinaryQuantizationConfig(always_ram=True),
-                    ),
-                ),
-                optimizers_config=models.OptimizersConfigDiff(
-                    default_segment_number=4, max_segment_size=2000000000
-                ),
-                on_disk_payload=True,
-                shard_number=80,
-                hnsw_config=HnswConfigDiff(
-                    m=8,
-                    ef_construct=50,
-                    full_scan_threshold=0,
-                    on_disk=False,
-                )  # https://medium.com/@benitomartin/balancing-accuracy-and-speed-with-qdrant-hyperparameters-hydrid-search-and-semantic-caching-part-84b26037e594
-                # optimizers_config=models.OptimizersConfigDiff(default_segment_number=64)
+                **collection_config(self.index_profile, feature_size),
             )
             logger.info(f"Collection {collection_name} Created!")
         else:
             logger.info("Collection creation skipped!")
 
+        if build_shot_collection:
+            self._create_shot_collection(feature_size)
+
         dict_fps = {}
         for dict_fps_path in FPS_PATH:
             with open(dict_fps_path, encoding="utf-8-sig") as json_file:
@@ -105,12 +154,17 @@ class QDRANT:
             dict_s2t = dict_s2t | dict_s2t_append
         logger.info("STT Dict Loaded")
 
-        dict_obj = {}
-        with open(OBJECT_PATH, encoding="utf-8-sig") as json_file:
-            dict_obj = ujson.load(json_file)
-        logger.info("Object Dict Loaded")
-        dict_obj = preprocess_object_dict(dict_obj)
-        logger.info("Object Dict Preprocessed")
+        if os.path.isdir(OBJECT_PATH):
+            # Columnar store: memory-mapped, (video, frame) lookups by offset
+            dict_obj = ObjectStore(OBJECT_PATH)
+            logger.info(f"Object Store Loaded ({len(dict_obj)} detections)")
+        else:
+            dict_obj = {}
+            with open(OBJECT_PATH, encoding="utf-8-sig") as json_file:
+                dict_obj = ujson.load(json_file)
+            logger.info("Object Dict Loaded")
+            dict_obj = preprocess_object_dict(dict_obj)
+            logger.info("Object Dict Preprocessed")
 
         dict_shot = {}
         for dict_shot_path in SHOT_PATH:
@@ -119,20 +173,36 @@ class QDRANT:
             dict_shot = dict_shot | dict_shot_append
         logger.info("SHOT Dict Loaded")
 
+        # transcript index of this collection, updated video by video. Point
+        # ids restart at 0 on every run, so a new collection starts from an
+        # empty index and videos left out of this run are dropped below.
+        if S2T_INDEX_PATH:
+            self.s2t_index_path = S2T_INDEX_PATH
+        s2t_writer = (
+            S2TIndexWriter(
+                os.path.join(self.s2t_index_path, collection_name),
+                reset=create_collection,
+            )
+            if self.s2t_index_path
+            else None
+        )
+        ingested_videos = set()
+
         logger.info("Inserting Data...")
 
         struct_id = 0
+        shot_struct_id = 0
+        label_frequency = Counter()
 
         for idx_folder, folder_path in enumerate(FEATURES_PATH):
             insert_points = []
+            insert_shot_points = []
 
-            for feat_npy in tqdm(sorted(os.listdir(folder_path))):
-                video_name = feat_npy.split(".")[0]
-                npy_path = os.path.join(folder_path, feat_npy)
-
-                # lazy‐load the entire feature array, then batch‐cast & reshape
-                feats_arr = np.load(npy_path, mmap_mode="r")
-                vectors = feats_arr.astype("float32").reshape(-1, feats_arr.shape[-1])
+            # per-video .npy folder or consolidated shard, both memory-mapped;
+            # only the vectors of the current video are cast to float32
+            features = open_features(folder_path)
+            for video_name in tqdm(features.videos):
+                vectors = features.get(video_name)
 
                 # prepare frame list and pre‐parsed frame numbers
                 frame_path = os.path.join(
@@ -146,6 +216,9 @@ class QDRANT:
                 )
                 frame_list = sorted(os.listdir(frame_path))
                 frame_nums = [int(fn.replace(".jpg", "")) for fn in frame_list]
+                # all keyframes of a video share its resolution
+                with Image.open(os.path.join(frame_path, frame_list[0])) as first_frame:
+                    frame_width, frame_height = first_frame.size
 
                 # pull these out once per file
                 fps = dict_fps[video_name]
@@ -158,6 +231,15 @@ class QDRANT:
                 shot = dict_shot[video_name] if video_name in dict_shot else ""
                 base_id = struct_id
 
+                object_summaries = [
+                    summarize_objects(
+                        get_objs((video_name, int(frm)), []), frame_width, frame_height
+                    )
+                    for frm in frame_nums
+                ]
+                for summary in object_summaries:
+                    label_frequency.update(summary["object_count"].keys())
+
                 # build all PointStructs in one go
                 points = [
                     PointStruct(
@@ -169,7 +251,10 @@ class QDRANT:
                             "frame_name": frm,
                             "fps": fps,
                             "s2t": s2t_map[frame_list[idx]] if s2t_map != "" else [],
-                            "object": get_objs((video_name, int(frm)), []),
+                            "s2t_folded": folded_text(s2t_map[frame_list[idx]])
+                            if s2t_map != ""
+                            else "",
+                            **object_summaries[idx],
                             "frame_class": shot[frame_list[idx]][0]
                             if shot != ""
                             else 2,
@@ -178,26 +263,69 @@ class QDRANT:
                             else 0,
                             "related_end_frame": shot[frame_list[idx]][2]
                             if shot != ""
-                            else 50000
+                            else 50000,
+                            "shot_id": shot_id(
+                                video_name,
+                                shot[frame_list[idx]][1] if shot != "" else 0,
+                            ),
                             # frame_class: (int / string)
                             # 0 là đoạn có MC
                             # 1 là đoạn tóm tắt
                             # 2 là đoạn chính
                         },
                     )
-                    for idx, (vec, frm) in enumerate(zip(vectors, frame_nums))
+                    # one tolist() per video instead of a conversion per point
+                    for idx, (vec, frm) in enumerate(zip(vectors.tolist(), frame_nums))
                 ]
 
                 insert_points.extend(points)
                 struct_id += len(points)
 
+                if build_shot_collection:
+                    shot_points = self._build_shot_points(
+                        shot_struct_id,
+                        base_id,
+                        idx_folder,
+                        video_name,
+                        vectors[: len(points)],
+                        frame_nums,
+                        [shot[fn] if shot != "" else [2, 0, 50000] for fn in frame_list],
+                        shot_pooling,
+                    )
+                    insert_shot_points.extend(shot_points)
+                    shot_struct_id += len(shot_points)
+
+                ingested_videos.add(video_name)
+                if s2t_writer is not None:
+                    if s2t_map != "":
+                        s2t_writer.update_video(
+                            video_name,
+                            range(base_id, base_id + len(points)),
+                            [s2t_map[fn] for fn in frame_list[: len(points)]],
+                        )
+                    else:
+                        s2t_writer.remove_video(video_name)
+
             operation_info = self.client.upsert(
                 collection_name=self.collection_name, wait=False, points=insert_points
             )
+            if insert_shot_points:
+                self.client.upsert(
+                    collection_name=self.shot_collection_name,
+                    wait=False,
+                    points=insert_shot_points,
+                )
             logger.info(
                 f"Dataset Insert Completed {str(int(idx_folder)+1)}/{len(FEATURES_PATH)}"
             )
 
+        if s2t_writer is not None:
+            for video_name in list(s2t_writer.videos):
+                if video_name not in ingested_videos:
+                    s2t_writer.remove_video(video_name)
+            logger.info(f"S2T index written ({s2t_writer.close()} documents)")
+            self.s2t_index = self._load_s2t_index()
+
         logger.info("Cleaning up dictionary")
 
         logger.info("Creating index...")
@@ -224,6 +352,19 @@ class QDRANT:
             ),
         )
 
+        # s2t_filter on large match sets: folded syllables, no length limits
+        self.client.create_payload_index(
+            collection_name=self.collection_name,
+            field_name="s2t_folded",
+            field_schema=models.TextIndexParams(
+                type="text",
+                tokenizer=models.TokenizerType.WORD,
+                lowercase=True,
+                on_disk=True,
+            ),
+        )
+        self.s2t_folded_indexed = True
+
         self.client.create_payload_index(
             collection_name=self.collection_name,
             field_name="frame_class",
@@ -234,10 +375,475 @@ class QDRANT:
                 range=True,
             ),
         )
+
+        # skip_frames exclusion: one MatchAny over shot ids
+        self.client.create_payload_index(
+            collection_name=self.collection_name,
+            field_name="shot_id",
+            field_schema=models.IntegerIndexParams(
+                type=models.IntegerIndexType.INTEGER,
+                on_disk=True,
+                lookup=True,
+                range=False,
+            ),
+        )
+        self.shot_id_indexed = True
+
+        # Object filters: distinct labels, labels inside the nested detections,
+        # and per-label count / max confidence for the most frequent labels
+        self.client.create_payload_index(
+            collection_name=self.collection_name,
+            field_name="object_labels",
+            field_schema=models.KeywordIndexParams(
+                type=models.KeywordIndexType.KEYWORD,
+                on_disk=True,
+            ),
+        )
+        self.client.create_payload_index(
+            collection_name=self.collection_name,
+            field_name="object[].object",
+            field_schema=models.KeywordIndexParams(
+                type=models.KeywordIndexType.KEYWORD,
+                on_disk=True,
+            ),
+        )
+        for label_key, _ in label_frequency.most_common(object_index_top_n):
+            self.client.create_payload_index(
+                collection_name=self.collection_name,
+                field_name=f"object_count.{label_key}",
+                field_schema=models.IntegerIndexParams(
+                    type=models.IntegerIndexType.INTEGER,
+                    on_disk=True,
+                    lookup=False,
+                    range=True,
+                ),
+            )
+            self.client.create_payload_index(
+                collection_name=self.collection_name,
+                field_name=f"object_max_conf.{label_key}",
+                field_schema=models.FloatIndexParams(
+                    type=models.FloatIndexType.FLOAT,
+                    on_disk=True,
+                ),
+            )
         logger.info("Create payload index complete")
 
+        if build_shot_collection:
+            for field_name, field_schema in [
+                (
+                    "video_name",
+                    models.TextIndexParams(
+                        tokenizer=models.TokenizerType.PREFIX,
+                        type="text",
+                        on_disk=True,
+                    ),
+                ),
+                (
+                    "frame_class",
+                    models.IntegerIndexParams(
+                        type=models.IntegerIndexType.INTEGER,
+                        on_disk=True,
+                        lookup=False,
+                        range=True,
+                    ),
+                ),
+                (
+                    "shot_id",
+                    models.IntegerIndexParams(
+                        type=models.IntegerIndexType.INTEGER,
+                        on_disk=True,
+                        lookup=True,
+                        range=False,
+                    ),
+                ),
+            ]:
+                self.client.create_payload_index(
+                    collection_name=self.shot_collection_name,
+                    field_name=field_name,
+                    field_schema=field_schema,
+                )
+            logger.info(f"Shot collection {self.shot_collection_name} ready")
+
         return operation_info
 
+    def addCaptions(
+        self,
+        CAPTION_PATH: List[str],
+        SHOT_DIR: Optional[str] = None,
+        CAPTION_INDEX_PATH: Optional[str] = None,
+    ):
+        """
+        Attach the offline VLM shot captions (engine/VLMs/src/pipeline.py
+        results) to the keyframes of the collection: every keyframe inside a
+        captioned shot gets the shot caption as "caption" payload and as one
+        document of the BM25 caption index <CAPTION_INDEX_PATH>/<collection>,
+        keyed by its point id. Videos without captions keep no caption
+        documents. Returns the number of keyframes captioned.
+        """
+        if CAPTION_INDEX_PATH:
+            self.caption_index_path = CAPTION_INDEX_PATH
+        caption_writer = (
+            S2TIndexWriter(
+                os.path.join(self.caption_index_path, self.collection_name),
+                terms=caption_terms,
+            )
+            if self.caption_index_path
+            else None
+        )
+
+        documents = defaultdict(dict)
+        operations = []
+        for shot in read_shot_captions(CAPTION_PATH, SHOT_DIR):
+            ids = self._frame_ids_between(
+                shot["video"], shot["start_frame"], shot["end_frame"]
+            )
+            if not ids:
+                continue
+            documents[shot["video"]].update(dict.fromkeys(ids, shot["caption"]))
+            operations.append(
+                models.SetPayloadOperation(
+                    set_payload=models.SetPayload(
+                        payload={"caption": shot["caption"]}, points=ids
+                    )
+                )
+            )
+        logger.info(
+            f"Captions of {len(operations)} shots matched "
+            f"{sum(len(docs) for docs in documents.values())} keyframes"
+        )
+
+        for start in tqdm(range(0, len(operations), self.CAPTION_BATCH_SIZE)):
+            self.client.batch_update_points(
+                collection_name=self.collection_name,
+                update_operations=operations[start : start + self.CAPTION_BATCH_SIZE],
+                wait=False,
+            )
+
+        self.client.create_payload_index(
+            collection_name=self.collection_name,
+            field_name="caption",
+            field_schema=models.TextIndexParams(
+                type="text",
+                tokenizer=models.TokenizerType.WORD,
+                min_token_len=2,
+                max_token_len=15,
+                lowercase=True,
+                on_disk=True,
+            ),
+        )
+
+        if caption_writer is not None:
+            for video in self.frame_names:
+                if video in documents:
+                    ids = sorted(documents[video])
+                    caption_writer.update_video(
+                        video, ids, [documents[video][i] for i in ids]
+                    )
+                else:
+                    caption_writer.remove_video(video)
+            logger.info(f"Caption index written ({caption_writer.close()} documents)")
+            self.caption_index = self._load_caption_index()
+
+        return sum(len(docs) for docs in documents.values())
+
+    def _frame_ids_between(self, video_name: str, first_frame: int, last_frame: int):
+        """Point ids of the keyframes of a video with first_frame <= frame <= last_frame."""
+        frame_video = self.frame_names.get(str(video_name).replace(".mp4", ""))
+        if not frame_video:
+            return []
+        frames = list(frame_video)
+        lo = bisect.bisect_left(frames, int(first_frame))
+        hi = bisect.bisect_right(frames, int(last_frame))
+        return [frame_video[frame] for frame in frames[lo:hi]]
+
+    def _create_shot_collection(self, feature_size: int):
+        if self.client.collection_exists(collection_name=self.shot_collection_name):
+            logger.warning("Shot collection existed, deleting...")
+            self.client.delete_collection(collection_name=self.shot_collection_name)
+
+        # about one point per shot: small enough to keep full vectors in RAM
+        self.client.create_collection(
+            collection_name=self.shot_collection_name,
+            vectors_config=VectorParams(size=feature_size, distance=Distance.COSINE),
+            on_disk_payload=True,
+            shard_number=4,
+            hnsw_config=HnswConfigDiff(m=16, ef_construct=100, on_disk=False),
+        )
+        logger.info(f"Collection {self.shot_collection_name} Created!")
+
+    def _build_shot_points(
+        self,
+        shot_struct_id: int,
+        base_id: int,
+        idx_folder: int,
+        video_name: str,
+        vectors: np.ndarray,
+        frame_nums: List[int],
+        shot_info: List[list],
+        pooling: str = "mean",
+    ):
+        """
+        One point per shot of a video: the pooled (mean or max) L2-normalised
+        keyframe vectors, with the shot boundaries and keyframe ids as payload.
+        shot_info[i] is the [frame_class, related_start_frame,
+        related_end_frame] entry of keyframe i.
+        """
+        vectors = vectors / np.maximum(
+            np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12
+        )
+        shots = defaultdict(list)
+        for idx in range(len(vectors)):
+            shots[(int(shot_info[idx][1]), int(shot_info[idx][2]))].append(idx)
+
+        shot_points = []
+        for (start, end), rows in sorted(shots.items()):
+            if pooling == "max":
+                pooled = vectors[rows].max(axis=0)
+            else:
+                pooled = vectors[rows].mean(axis=0)
+            shot_points.append(
+                PointStruct(
+                    id=shot_struct_id + len(shot_points),
+                    vector=pooled.astype("float32"),
+                    payload={
+                        "idx_folder": idx_folder,
+                        "video_name": video_name + ".mp4",
+                        "frame_class": int(shot_info[rows[0]][0]),
+                        "related_start_frame": start,
+                        "related_end_frame": end,
+                        "shot_id": shot_id(video_name, start),
+                        "frame_ids": [base_id + idx for idx in rows],
+                        "frame_names": [int(frame_nums[idx]) for idx in rows],
+                    },
+                )
+            )
+        return shot_points
+
+    def _shot_frame_ids(
+        self,
+        query: List[float],
+        shot_k: int,
+        video_filter: str = "",
+        frame_class_filter: bool = True,
+        skip_frames: list = [],
+        params: models.SearchParams = None,
+    ):
+        """Coarse stage: keyframe ids of the shot_k best shots."""
+        must_field = []
+        if video_filter not in ("", None, []):
+            must_field.append(
+                models.Filter(
+                    should=[
+                        models.FieldCondition(
+                            key="video_name", match=models.MatchText(text=name)
+                        )
+                        for name in video_filter.split(",")
+                    ]
+                )
+            )
+        mustnot_field = []
+        if frame_class_filter:
+            mustnot_field.append(
+                models.FieldCondition(key="frame_class", match=models.MatchValue(value=0))
+            )
+        if skip_frames:
+            mustnot_field.append(
+                models.FieldCondition(
+                    key="shot_id",
+                    match=models.MatchAny(any=self._skip_shot_ids(skip_frames)),
+                )
+            )
+
+        SHOT_RESULTS = self.client.query_points(
+            collection_name=self.shot_collection_name,
+            query=query,
+            query_filter=models.Filter(must=must_field, must_not=mustnot_field),
+            search_params=params,
+            timeout=self.timeout,
+            limit=int(shot_k),
+            with_payload=["frame_ids"],
+        ).points
+        return [frame_id for shot in SHOT_RESULTS for frame_id in shot.payload["frame_ids"]]
+
+    @staticmethod
+    def _skip_shot_ids(skip_frames: list):
+        return sorted(
+            {
+                shot_id(frame["video_name"], frame["related_start_frame"])
+                for frame in skip_frames
+            }
+        )
+
+    def _skip_conditions(self, skip_frames: list):
+        """
+        must_not conditions excluding the shots of skip_frames. Collections
+        ingested with a shot_id index get one MatchAny over shot ids, whose
+        size does not depend on the shot lengths; older collections fall back
+        to the keyframe ids of every skipped shot.
+        """
+        if not skip_frames:
+            return []
+        if self.shot_id_indexed is None:
+            payload_schema = self.client.get_collection(
+                collection_name=self.collection_name
+            ).payload_schema
+            self.shot_id_indexed = "shot_id" in payload_schema
+        if self.shot_id_indexed:
+            return [
+                models.FieldCondition(
+                    key="shot_id",
+                    match=models.MatchAny(any=self._skip_shot_ids(skip_frames)),
+                )
+            ]
+
+        idCondition = set()
+        for frame in skip_frames:
+            idCondition |= set(
+                self._get_frames(
+                    frame["video_name"],
+                    frame["related_start_frame"],
+                    frame["related_end_frame"],
+                )
+            )
+        return [models.HasIdCondition(has_id=list(idCondition))]
+
+    def _load_s2t_index(self):
+        return self._load_text_index(self.s2t_index_path, "S2T")
+
+    def _load_caption_index(self):
+        return self._load_text_index(self.caption_index_path, "Caption")
+
+    def _load_text_index(self, index_path: Optional[str], name: str):
+        """BM25 index <index_path>/<collection> (S2TIndex layout), None if absent."""
+        if not (index_path and self.collection_name):
+            return None
+        index_dir = os.path.join(index_path, self.collection_name)
+        if not os.path.isdir(index_dir):
+            logger.warning(f"{name} index {index_dir} not found, using payload text index")
+            return None
+        text_index = S2TIndex(index_dir)
+        logger.info(f"{name} index loaded ({len(text_index)} documents)")
+        return text_index
+
+    def _s2t_filter_conditions(self, s2t_filter: str = None, candidate_ids: list = None):
+        """
+        Transcript filter; every matching frame is kept. With a local S2T
+        index the matching point ids are resolved there (diacritic-insensitive)
+        and sent as a HasIdCondition, intersected with candidate_ids when the
+        caller already restricts the search to them. Match sets larger than
+        S2T_PREFILTER_MAX_IDS, and searches without a local index, use the
+        "s2t_folded" payload text index (the "s2t" one on collections ingested
+        before it, which is diacritic-sensitive).
+        """
+        if s2t_filter in (None, ""):
+            return []
+        if self.s2t_index is not None:
+            ids = self.s2t_index.match_ids(s2t_filter)
+            if ids is None:
+                return []
+            if candidate_ids is not None:
+                ids = sorted(set(ids).intersection(candidate_ids))
+            if candidate_ids is not None or len(ids) <= self.S2T_PREFILTER_MAX_IDS:
+                return [models.HasIdCondition(has_id=ids)]
+            logger.info(
+                f"s2t_filter '{s2t_filter}' matches {len(ids)} frames, using payload index"
+            )
+
+        if self.s2t_folded_indexed is None:
+            payload_schema = self.client.get_collection(
+                collection_name=self.collection_name
+            ).payload_schema
+            self.s2t_folded_indexed = "s2t_folded" in payload_schema
+        if self.s2t_folded_indexed:
+            if not syllables(s2t_filter):
+                return []
+            return [
+                models.FieldCondition(
+                    key="s2t_folded",
+                    match=models.MatchText(text=" ".join(syllables(s2t_filter))),
+                )
+            ]
+        return [
+            models.FieldCondition(
+                key="s2t",
+                match=models.MatchText(text=s2t_filter),
+            )
+        ]
+
+    def _object_filter_conditions(self, object_filter: list = []):
+        """
+        Turn object filters ({"label", "min_count", "min_conf", "min_area",
+        "max_area", "region"}) into payload conditions evaluated inside the
+        ANN search. Area is a fraction of the frame, region is a normalised
+        [x1, y1, x2, y2] box the object centre must fall in.
+        """
+        must_field = []
+        for obj_filter in object_filter or []:
+            label = obj_filter["label"]
+            label_key = object_label_key(label)
+            min_count = int(obj_filter.get("min_count") or 1)
+            min_conf = obj_filter.get("min_conf")
+            min_area = obj_filter.get("min_area")
+            max_area = obj_filter.get("max_area")
+            region = obj_filter.get("region")
+
+            must_field.append(
+                models.FieldCondition(
+                    key="object_labels", match=models.MatchValue(value=label)
+                )
+            )
+            if min_count > 1:
+                must_field.append(
+                    models.FieldCondition(
+                        key=f"object_count.{label_key}",
+                        range=models.Range(gte=min_count),
+                    )
+                )
+            if min_conf is not None:
+                must_field.append(
+                    models.FieldCondition(
+                        key=f"object_max_conf.{label_key}",
+                        range=models.Range(gte=float(min_conf)),
+                    )
+                )
+
+            if min_area is None and max_area is None and not region:
+                continue
+            # geometry constraints must hold on one and the same detection
+            nested_must = [
+                models.FieldCondition(key="object", match=models.MatchValue(value=label))
+            ]
+            if min_conf is not None:
+                nested_must.append(
+                    models.FieldCondition(key="conf", range=models.Range(gte=float(min_conf)))
+                )
+            if min_area is not None or max_area is not None:
+                nested_must.append(
+                    models.FieldCondition(
+                        key="area",
+                        range=models.Range(
+                            gte=None if min_area is None else float(min_area),
+                            lte=None if max_area is None else float(max_area),
+                        ),
+                    )
+                )
+            if region:
+                x1, y1, x2, y2 = [float(x) for x in region]
+                nested_must.append(
+                    models.FieldCondition(key="cx", range=models.Range(gte=x1, lte=x2))
+                )
+                nested_must.append(
+                    models.FieldCondition(key="cy", range=models.Range(gte=y1, lte=y2))
+                )
+            must_field.append(
+                models.NestedCondition(
+                    nested=models.Nested(
+                        key="object", filter=models.Filter(must=nested_must)
+                    )
+                )
+            )
+        return must_field
+
     # cho video name, cho start time (00:00), cho end time (01:00) -> tất cả các frame nằm trong khoảng thời gian đó của video đó
     def scroll_video(
         self,
@@ -250,18 +856,45 @@ class QDRANT:
         skip_frames: list = [],
         return_s2t: bool = True,  # True mặc định là return bth, False là ko return field "s2t" trong cái result ở dưới
         return_object: bool = True,
+        object_filter: list = [],
     ):  # giống cái s2t ở trên, lần này là vs field "object"
+        return_result, _ = self.scroll_video_page(
+            k,
+            video_filter,
+            time_in=time_in,
+            time_out=time_out,
+            s2t_filter=s2t_filter,
+            frame_class_filter=frame_class_filter,
+            skip_frames=skip_frames,
+            return_s2t=return_s2t,
+            return_object=return_object,
+            object_filter=object_filter,
+        )
+        return return_result
+
+    # scroll_video + Qdrant pagination: start at point id `offset`, also
+    # return the offset of the next page (None after the last one)
+    def scroll_video_page(
+        self,
+        k,
+        video_filter: str,
+        time_in: str = None,
+        time_out: str = None,
+        s2t_filter: str = None,
+        frame_class_filter: bool = True,
+        skip_frames: list = [],
+        return_s2t: bool = True,
+        return_object: bool = True,
+        object_filter: list = [],
+        offset: int = None,
+    ):
 
         id_list = sorted(self._get_frames(video_filter, time_in, time_out))
         must_field = [models.HasIdCondition(has_id=id_list)]
+        must_field.extend(self._object_filter_conditions(object_filter))
 
-        if s2t_filter not in (None, ""):
-            must_field.append(
-                models.FieldCondition(
-                    key="s2t",
-                    match=models.MatchText(text=s2t_filter),
-                )
-            )
+        # resolved against this video's frames only, never truncated
+        must_field.extend(self._s2t_filter_conditions(s2t_filter, candidate_ids=id_list))
 
         mustnot_field = []
         if frame_class_filter:
@@ -272,17 +905,7 @@ class QDRANT:
                 ),
             )
 
-        idCondition = set()
-        for frame in skip_frames:
-            video_name = frame["video_name"]
-            frame_name = frame["frame_name"]
-            related_start_frame = frame["related_start_frame"]
-            related_end_frame = frame["related_end_frame"]
-
-            idCondition |= set(
-                self._get_frames(video_name, related_start_frame, related_end_frame)
-            )
-        mustnot_field.append(models.HasIdCondition(has_id=list(idCondition)))
+        mustnot_field.extend(self._skip_conditions(skip_frames))
 
         FILTER_RESULTS = models.Filter(must=must_field, must_not=mustnot_field)
 
@@ -292,6 +915,7 @@ class QDRANT:
             with_payload=True,
             with_vectors=False,
             limit=int(k),
+            offset=offset,
         )
 
         return_result = self._format_search_results(
@@ -302,7 +926,7 @@ class QDRANT:
         )
 
         logger.info("Processed scene 1 for temporal")
-        return return_result
+        return return_result, SCROLL_RESULT[1]
 
     def search(
         self,
@@ -315,9 +939,47 @@ class QDRANT:
         sort_to_news: bool = True,
         return_s2t: bool = True,
         return_object: bool = True,
+        object_filter: list = [],
+        s2t_query: str = None,
+        s2t_fusion: str = "rrf",
+        s2t_weight: float = 0.3,
+        caption_query: str = None,
+        caption_fusion: str = "rrf",
+        caption_weight: float = 0.3,
+        coarse_to_fine: bool = False,
+        shot_k: int = None,
+        diversity: float = 0.0,
+        max_per_video: int = None,
+        hnsw_ef: int = None,
+        rescore: bool = None,
+        oversampling: float = None,
+        exclude_ids: list = [],
     ):
 
-        must_field = []
+        params = search_params(self.index_profile, hnsw_ef, rescore, oversampling)
+        must_field = self._object_filter_conditions(object_filter)
+
+        if coarse_to_fine and (s2t_filter not in (None, "") or object_filter):
+            # shot points carry no transcript / object payload: restricting to
+            # the shot_k best shots first would leave the keyframe filters a
+            # few frames to match, so these searches run single-stage
+            logger.info("coarse_to_fine ignored: s2t_filter / object_filter set")
+            coarse_to_fine = False
+
+        if coarse_to_fine:
+            # rank keyframes only inside the best shots of the shot collection
+            must_field.append(
+                models.HasIdCondition(
+                    has_id=self._shot_frame_ids(
+                        query,
+                        shot_k or int(k),
+                        video_filter,
+                        frame_class_filter,
+                        skip_frames,
+                        params,
+                    )
+                )
+            )
 
         if video_filter not in ("", None, []):
             video_filter = video_filter.split(",")
@@ -331,13 +993,7 @@ class QDRANT:
                 )
             must_field.append(models.Filter(should=should_field))
 
-        if s2t_filter not in (None, ""):
-            must_field.append(
-                models.FieldCondition(
-                    key="s2t",
-                    match=models.MatchText(text=s2t_filter),
-                )
-            )
+        must_field.extend(self._s2t_filter_conditions(s2t_filter))
 
         mustnot_field = []
         if frame_class_filter:
@@ -347,26 +1003,44 @@ class QDRANT:
                     match=models.MatchValue(value=0),
                 ),
             )
-        idCondition = set()
-        for frame in skip_frames:
-            video_name = frame["video_name"]
-            frame_name = frame["frame_name"]
-            related_start_frame = frame["related_start_frame"]
-            related_end_frame = frame["related_end_frame"]
+        mustnot_field.extend(self._skip_conditions(skip_frames))
+        if exclude_ids:
+            mustnot_field.append(models.HasIdCondition(has_id=list(exclude_ids)))
+        FILTER_RESULTS = models.Filter(must=must_field, must_not=mustnot_field)
 
-            idCondition |= set(
-                self._get_frames(video_name, related_start_frame, related_end_frame)
+        diversify = diversity > 0 or bool(max_per_video)
+        candidate_k = int(k) * self.DIVERSITY_CANDIDATE_FACTOR if diversify else int(k)
+
+        lexical_queries = []
+        if s2t_query not in (None, ""):
+            lexical_queries.append(
+                ("s2t", self.s2t_index, s2t_query, s2t_fusion, s2t_weight)
+            )
+        if caption_query not in (None, ""):
+            lexical_queries.append(
+                ("caption", self.caption_index, caption_query, caption_fusion, caption_weight)
             )
-        mustnot_field.append(models.HasIdCondition(has_id=list(idCondition)))
-        FILTER_RESULTS = models.Filter(must=must_field, must_not=mustnot_field)
 
-        SEARCH_RESULTS = self.client.query_points(
-            collection_name=self.collection_name,
-            query=query,
-            query_filter=FILTER_RESULTS,
-            timeout=self.timeout,
-            limit=int(k),
-        ).points
+        if lexical_queries:
+            SEARCH_RESULTS = self._hybrid_search(
+                query,
+                FILTER_RESULTS,
+                candidate_k,
+                lexical_queries,
+                params=params,
+            )
+        else:
+            SEARCH_RESULTS = self.client.query_points(
+                collection_name=self.collection_name,
+                query=query,
+                query_filter=FILTER_RESULTS,
+                search_params=params,
+                timeout=self.timeout,
+                limit=candidate_k,
+            ).points
+
+        if diversify:
+            SEARCH_RESULTS = self._diversify(SEARCH_RESULTS, k, diversity, max_per_video)
 
         return_result = self._format_search_results(
             SEARCH_RESULTS, return_s2t=return_s2t, return_object=return_object
@@ -389,6 +1063,154 @@ class QDRANT:
 
         return return_result
 
+    def _hybrid_search(
+        self,
+        query: List[float],
+        query_filter: models.Filter,
+        k: int,
+        lexical_queries: list,
+        params: models.SearchParams = None,
+    ):
+        """
+        Dense + lexical search. lexical_queries holds one (payload field,
+        BM25 index, text, fusion, weight) per lexical signal: "s2t" against
+        the transcript index, "caption" against the offline VLM caption index.
+        Candidates are the top dense hits plus the top BM25 hits of every
+        index (dense-scored through a HasIdCondition, so every filter still
+        applies). Each signal is then fused in turn into the running score
+        with fuse_scores. A signal without an index only re-scores the
+        candidates, by term overlap with their payload field.
+        """
+        limit = int(k) * self.HYBRID_CANDIDATE_FACTOR
+        points = {
+            point.id: point
+            for point in self.client.query_points(
+                collection_name=self.collection_name,
+                query=query,
+                query_filter=query_filter,
+                search_params=params,
+                timeout=self.timeout,
+                limit=limit,
+            ).points
+        }
+
+        lexical_top = []
+        for _, text_index, text, _, _ in lexical_queries:
+            if text_index is None:
+                lexical_top.append({})
+                continue
+            lexical_ids, lexical_scores = text_index.score(text, limit=limit)
+            lexical_top.append(dict(zip(lexical_ids.tolist(), lexical_scores.tolist())))
+
+        missing = {
+            point_id for lexical in lexical_top for point_id in lexical if point_id not in points
+        }
+        if missing:
+            lexical_filter = models.Filter(
+                must=list(query_filter.must or [])
+                + [models.HasIdCondition(has_id=sorted(missing))],
+                must_not=query_filter.must_not,
+            )
+            for point in self.client.query_points(
+                collection_name=self.collection_name,
+                query=query,
+                query_filter=lexical_filter,
+                search_params=params,
+                timeout=self.timeout,
+                limit=len(missing),
+            ).points:
+                points[point.id] = point
+
+        fused = {point_id: point.score for point_id, point in points.items()}
+        for (field, text_index, text, fusion, weight), lexical in zip(
+            lexical_queries, lexical_top
+        ):
+            if text_index is not None:
+                rest = [point_id for point_id in points if point_id not in lexical]
+                lexical_ids, lexical_scores = text_index.score(text, ids=rest)
+                lexical.update(zip(lexical_ids.tolist(), lexical_scores.tolist()))
+                # lexical hits rejected by the other filters are dropped
+                lexical = {i: score for i, score in lexical.items() if i in points}
+            else:
+                terms = caption_terms if field == "caption" else transcript_terms
+                lexical = {
+                    point_id: term_overlap(point.payload.get(field) or [], text, terms)
+                    for point_id, point in points.items()
+                }
+            fused = fuse_scores(fused, lexical, method=fusion, weight=weight)
+
+        SEARCH_RESULTS = []
+        for point_id in sorted(fused, key=fused.get, reverse=True)[: int(k)]:
+            point = points[point_id]
+            point.score = fused[point_id]
+            SEARCH_RESULTS.append(point)
+        return SEARCH_RESULTS
+
+    def point_id_of(self, video_name: str, frame_name):
+        """Point id of an ingested keyframe, None if (video, frame) is not one."""
+        frame_video = self.frame_names.get(str(video_name).replace(".mp4", ""))
+        if frame_video is None:
+            return None
+        return frame_video.get(int(frame_name))
+
+    def search_by_point(self, point_id: int, **search_kwargs):
+        """
+        search() with the stored vector of a point as query: "find similar"
+        on a known keyframe without decoding or encoding any image.
+        """
+        vectors = self.get_vectors([point_id])
+        if point_id not in vectors:
+            raise KeyError(f"Point {point_id} not found in {self.collection_name}")
+        return self.search(query=vectors[point_id], **search_kwargs)
+
+    def get_vectors(self, ids: List[int]):
+        """Stored vectors of point ids, {id: np.ndarray}; unknown ids are left out."""
+        if not ids:
+            return {}
+        records = self.client.retrieve(
+            collection_name=self.collection_name,
+            ids=list(ids),
+            with_vectors=True,
+            with_payload=False,
+        )
+        return {
+            record.id: np.asarray(record.vector, dtype=np.float32) for record in records
+        }
+
+    def _diversify(
+        self,
+        SEARCH_RESULTS: list,
+        k: int,
+        diversity: float = 0.0,
+        max_per_video: int = None,
+    ):
+        """
+        Keep k of the candidate points by maximal marginal relevance over
+        their stored vectors (fetched for the candidates only), with at most
+        max_per_video keyframes per video.
+        """
+        if not SEARCH_RESULTS:
+            return SEARCH_RESULTS
+        ids = [point.id for point in SEARCH_RESULTS]
+        records = self.client.retrieve(
+            collection_name=self.collection_name,
+            ids=ids,
+            with_vectors=True,
+            with_payload=False,
+        )
+        vector_of = {record.id: record.vector for record in records}
+        SEARCH_RESULTS = [point for point in SEARCH_RESULTS if point.id in vector_of]
+
+        selected = mmr_select(
+            np.asarray([vector_of[point.id] for point in SEARCH_RESULTS], dtype=np.float32),
+            [point.score for point in SEARCH_RESULTS],
+            k,
+            diversity=diversity,
+            groups=[point.payload["video_name"] for point in SEARCH_RESULTS],
+            max_per_group=max_per_video,
+        )
+        return [SEARCH_RESULTS[idx] for idx in selected]
+
     def deleteDatabase(self):
         self.client.delete_collection(collection_name=self.collection_name)
 
@@ -410,9 +1232,14 @@ class QDRANT:
         skip_frames: list = [],
         return_s2t: bool = True,
         return_object: bool = True,
+        object_filter: list = [],
+        hnsw_ef: int = None,
+        rescore: bool = None,
+        oversampling: float = None,
     ):
 
-        must_field = []
+        params = search_params(self.index_profile, hnsw_ef, rescore, oversampling)
+        must_field = self._object_filter_conditions(object_filter)
 
         if video_filter not in ("", None, []):
             video_filter = video_filter.split(",")
@@ -426,13 +1253,7 @@ class QDRANT:
                 )
             must_field.append(models.Filter(should=should_field))
 
-        if s2t_filter not in (None, ""):
-            must_field.append(
-                models.FieldCondition(
-                    key="s2t",
-                    match=models.MatchText(text=s2t_filter),
-                )
-            )
+        must_field.extend(self._s2t_filter_conditions(s2t_filter))
 
         mustnot_field = []
         if frame_class_filter:
@@ -442,23 +1263,14 @@ class QDRANT:
                     match=models.MatchValue(value=0),
                 ),
             )
-        idCondition = set()
-        for frame in skip_frames:
-            video_name = frame["video_name"]
-            frame_name = frame["frame_name"]
-            related_start_frame = frame["related_start_frame"]
-            related_end_frame = frame["related_end_frame"]
-
-            idCondition |= set(
-                self._get_frames(video_name, related_start_frame, related_end_frame)
-            )
-        mustnot_field.append(models.HasIdCondition(has_id=list(idCondition)))
+        mustnot_field.extend(self._skip_conditions(skip_frames))
 
         FILTER_RESULTS = models.Filter(must=must_field, must_not=mustnot_field)
         SEARCH_RESULTS = self.client.query_points(
             collection_name=self.collection_name,
             query=queryList[0],
             query_filter=FILTER_RESULTS,
+            search_params=params,
             timeout=self.timeout,
             limit=int(k) * len(queryList),
         ).points
@@ -497,6 +1309,7 @@ class QDRANT:
                 collection_name=self.collection_name,
                 query=query,
                 query_filter=FILTER_RESULTS,
+                search_params=params,
                 limit=int(k) * (len(queryList) - query_idx),
                 timeout=self.timeout,
             ).points
@@ -7,17 +7,23 @@ from typing import List, Optional, Union
 import time
 
 import numpy as np
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, File, Form, HTTPException, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 
 from engine.vector_database.qdrant_database import QDRANT
 from engine.CLIPFeatureModel.metaclip_model import METACLIP
 from schema.api import APIResponse
-from schema.vector_v2 import QdrantRequest, RetrievalRequest
+from schema.vector_v2 import (
+    FeedbackRequest,
+    PointSearchRequest,
+    QdrantRequest,
+    RetrievalRequest,
+)
 from utils.logger import get_logger
-from utils.vector_database_util import preprocessing_text, preprocessing_image
-from utils.metadata_util import bytes_to_pil_image
+from utils.vector_database_util import preprocessing_text, preprocessing_image, rocchio
+from utils.image_io import decode_image
+from utils.search_cache import SearchCache, page_of
 from configs.app import AppConfig
 from configs.METACLIP_configs import METACLIPConfig
 
@@ -37,6 +43,11 @@ class METACLIPHandler:
         logger.info("Initialized GeneralHandler with QDRANT and METACLIP model")
         self.qdrant = qdrant_database
         self.model = model
+        self.search_cache = SearchCache(
+            ttl_seconds=AppConfig().SEARCH_CACHE_TTL,
+            max_entries=AppConfig().SEARCH_CACHE_MAX_ENTRIES,
+            max_items=AppConfig().SEARCH_CACHE_MAX_ITEMS,
+        )
 
     async def ping_handler(self) -> APIResponse:
         logger.info("ping_handler invoked")
@@ -61,7 +72,11 @@ class METACLIPHandler:
             OBJECT_PATH=AppConfig().OBJECT_PATH,
             FPS_PATH=AppConfig().FPS_PATH,
             SHOT_PATH=AppConfig().SHOT_PATH,
+            S2T_INDEX_PATH=AppConfig().S2T_INDEX_PATH,
+            index_profile=AppConfig().QDRANT_INDEX_PROFILE,
         )
+        if AppConfig().CAPTION_PATH:
+            self._add_captions()
         dummy_query = (
             np.load(METACLIPConfig().METACLIP_DUMMY_VECTOR_PATH)
             .reshape(1, -1)
@@ -77,11 +92,29 @@ class METACLIPHandler:
             data={f"Time taken: {time.time()-st}"},
         )
 
+    def setup_captions_handler(self) -> APIResponse:
+        """(Re)attach the offline VLM captions without re-ingesting the vectors."""
+        logger.info("Setting up captions")
+        st = time.time()
+        captioned = self._add_captions()
+        return APIResponse(
+            status=HTTPStatus.OK.value,
+            message="Success",
+            data={f"Captioned keyframes: {captioned}, time taken: {time.time()-st}"},
+        )
+
+    def _add_captions(self) -> int:
+        return self.qdrant.addCaptions(
+            CAPTION_PATH=AppConfig().CAPTION_PATH,
+            SHOT_DIR=AppConfig().CAPTION_SHOT_DIR,
+            CAPTION_INDEX_PATH=AppConfig().CAPTION_INDEX_PATH,
+        )
+
     async def scroll_handler(self, req: QdrantRequest) -> APIResponse:
         logger.info(
             f"scroll called with k={req.k}, video_filter={req.video_filter}, s2t_filter = {req.s2t_filter}, time_in={req.time_in}, time_out={req.time_out}"
         )
-        result = self.qdrant.scroll_video(
+        result, next_page_offset = self.qdrant.scroll_video_page(
             k=req.k,
             s2t_filter=req.s2t_filter,
             video_filter=req.video_filter,
@@ -91,11 +124,20 @@ class METACLIPHandler:
             return_object=req.return_object,
             frame_class_filter=req.frame_class_filter,
             skip_frames=req.skip_frames,
+            object_filter=[f.model_dump() for f in req.object_filter],
+            offset=req.next_page_offset,
         )
         logger.info("Scroll video retrieval completed")
-        return APIResponse(status=HTTPStatus.OK.value, message="Success", data=result)
+        return APIResponse(
+            status=HTTPStatus.OK.value,
+            message="Success",
+            data=result,
+            next_page_offset=next_page_offset,
+        )
 
     async def text_search_handler(self, req: RetrievalRequest) -> APIResponse:
+        if req.cursor:
+            return self._cached_page_response(req)
 
         logger.info(f"text_search called with text={req.text}, k={req.k}")
         if not req.text:
@@ -106,20 +148,14 @@ class METACLIPHandler:
             )
         feat = preprocessing_text(self.model, req.text)
         logger.info("Text feature extracted for search")
-        result = self.qdrant.search(
-            query=feat,
-            k=req.k,
-            video_filter=req.video_filter,
-            s2t_filter=req.s2t_filter,
-            return_s2t=req.return_s2t,
-            return_object=req.return_object,
-            frame_class_filter=req.frame_class_filter,
-            skip_frames=req.skip_frames,
-        )
+        result = self.qdrant.search(query=feat, **self._search_kwargs(req))
         logger.info(f"Text search completed with query {str(req.text)}")
-        return APIResponse(status=HTTPStatus.OK.value, message="Success", data=result)
+        return self._page_response(req, result)
 
     async def image_search_handler(self, req: RetrievalRequest) -> APIResponse:
+        if req.cursor:
+            return self._cached_page_response(req)
+
         logger.info(f"image_search called with image_data, k={req.k}")
         if not req.image_data:
             logger.error("Missing image_data for search")
@@ -128,24 +164,110 @@ class METACLIPHandler:
                 detail="Missing image_data for search",
             )
 
-        image_data = base64.b64decode(req.image_data)
-        image_data = bytes_to_pil_image(image_data)
-        feat = preprocessing_image(self.model, image_data)
-        logger.info("Image feature extracted for search")
+        image = decode_image(
+            base64.b64decode(req.image_data),
+            min_side=METACLIPConfig().METACLIP_IMAGE_SIZE,
+        )
+        return self._image_search(req, image)
+
+    async def image_upload_search_handler(
+        self, image: UploadFile = File(...), query: str = Form("{}")
+    ) -> APIResponse:
+        """
+        image_search with the image sent as a multipart file and the other
+        RetrievalRequest fields as a JSON form field, no base64 round trip.
+        """
+        try:
+            req = RetrievalRequest.model_validate_json(query)
+        except ValidationError as e:
+            raise HTTPException(
+                status_code=HTTPStatus.UNPROCESSABLE_ENTITY.value, detail=str(e)
+            )
+        if req.cursor:
+            return self._cached_page_response(req)
+
+        logger.info(f"image_upload_search called with {image.filename}, k={req.k}")
+        try:
+            image_data = decode_image(
+                await image.read(), min_side=METACLIPConfig().METACLIP_IMAGE_SIZE
+            )
+        except Exception as e:
+            logger.exception(f"Image decoding failed: {e}")
+            raise HTTPException(
+                status_code=HTTPStatus.BAD_REQUEST.value,
+                detail=f"Image decoding failed: {e}",
+            )
+        return self._image_search(req, image_data)
+
+    async def search_by_point_handler(self, req: PointSearchRequest) -> APIResponse:
+        if req.cursor:
+            return self._cached_page_response(req)
+
+        logger.info(
+            f"search_by_point called with point_id={req.point_id}, video_name={req.video_name}, frame_name={req.frame_name}, k={req.k}"
+        )
+        point_id = req.point_id
+        if point_id is None and req.video_name and req.frame_name:
+            point_id = self.qdrant.point_id_of(req.video_name, req.frame_name)
+        if point_id is None:
+            logger.error("search_by_point: not a known keyframe")
+            raise HTTPException(
+                status_code=HTTPStatus.NOT_FOUND.value,
+                detail="Not a known keyframe, give point_id or video_name and frame_name",
+            )
+        try:
+            result = self.qdrant.search_by_point(point_id, **self._search_kwargs(req))
+        except KeyError as e:
+            logger.error(str(e))
+            raise HTTPException(status_code=HTTPStatus.NOT_FOUND.value, detail=str(e))
+        logger.info(f"Search by point {point_id} completed")
+        return self._page_response(req, result)
+
+    async def feedback_search_handler(self, req: FeedbackRequest) -> APIResponse:
+        if req.cursor:
+            return self._cached_page_response(req)
+
+        logger.info(
+            f"feedback_search called with positive_ids={req.positive_ids}, negative_ids={req.negative_ids}, text={req.text}, k={req.k}"
+        )
+        if not req.positive_ids and not req.text:
+            logger.error("Missing positive_ids or text for feedback search")
+            raise HTTPException(
+                status_code=HTTPStatus.BAD_REQUEST.value,
+                detail="Missing positive_ids or text for feedback search",
+            )
+        # stored vectors only: no model forward pass unless a text is given
+        vectors = self.qdrant.get_vectors(req.positive_ids + req.negative_ids)
+        unknown = [i for i in req.positive_ids + req.negative_ids if i not in vectors]
+        if unknown:
+            logger.error(f"Unknown point ids for feedback search: {unknown}")
+            raise HTTPException(
+                status_code=HTTPStatus.NOT_FOUND.value,
+                detail=f"Unknown point ids: {unknown}",
+            )
+        feat = rocchio(
+            [vectors[i] for i in req.positive_ids],
+            [vectors[i] for i in req.negative_ids],
+            query=preprocessing_text(self.model, req.text) if req.text else None,
+            alpha=req.alpha,
+            beta=req.beta,
+            gamma=req.gamma,
+        )
+        logger.info("Feedback query vector computed")
         result = self.qdrant.search(
             query=feat,
-            k=req.k,
-            video_filter=req.video_filter,
-            s2t_filter=req.s2t_filter,
-            return_s2t=req.return_s2t,
-            return_object=req.return_object,
-            frame_class_filter=req.frame_class_filter,
-            skip_frames=req.skip_frames,
+            **self._search_kwargs(req),
+            exclude_ids=req.positive_ids + req.negative_ids
+            if req.exclude_feedback
+            else [],
         )
-        logger.info("Image search completed")
-        return APIResponse(status=HTTPStatus.OK.value, message="Success", data=result)
+        logger.info("Feedback search completed")
+        return self._page_response(req, result)
 
     async def temporal_search_handler(self, req: RetrievalRequest) -> APIResponse:
+        if req.cursor:
+            return self._cached_page_response(req)
+
         logger.info(f"temporal_search called with text={req.text}, k={req.k}")
         if not req.text:
             logger.error("Missing text for temporal search")
@@ -162,7 +284,21 @@ class METACLIPHandler:
         # logger.info(f"FEATS[0] Type: {type(feats[0])}")
 
         result = self.qdrant.search_temporal(
-            queryList=feats,
+            queryList=feats, **self._filter_kwargs(req)
+        )
+        logger.info(f"Temporal search completed with query {str(segments)}")
+        return self._page_response(req, result)
+
+    def _image_search(self, req: RetrievalRequest, image) -> APIResponse:
+        feat = preprocessing_image(self.model, image)
+        logger.info("Image feature extracted for search")
+        result = self.qdrant.search(query=feat, **self._search_kwargs(req))
+        logger.info("Image search completed")
+        return self._page_response(req, result)
+
+    def _filter_kwargs(self, req: RetrievalRequest) -> dict:
+        """Keyword arguments of QDRANT.search / search_temporal taken from the request."""
+        return dict(
             k=req.k,
             video_filter=req.video_filter,
             s2t_filter=req.s2t_filter,
@@ -170,6 +306,56 @@ class METACLIPHandler:
             return_object=req.return_object,
             frame_class_filter=req.frame_class_filter,
             skip_frames=req.skip_frames,
+            object_filter=[f.model_dump() for f in req.object_filter],
+            hnsw_ef=req.hnsw_ef,
+            rescore=req.rescore,
+            oversampling=req.oversampling,
+        )
+
+    def _search_kwargs(self, req: RetrievalRequest) -> dict:
+        """_filter_kwargs plus the fusion, coarse-to-fine and diversity options of QDRANT.search."""
+        return dict(
+            self._filter_kwargs(req),
+            s2t_query=req.s2t_query,
+            s2t_fusion=req.s2t_fusion,
+            s2t_weight=req.s2t_weight,
+            caption_query=req.caption_query,
+            caption_fusion=req.caption_fusion,
+            caption_weight=req.caption_weight,
+            coarse_to_fine=req.coarse_to_fine,
+            shot_k=req.shot_k,
+            diversity=req.diversity,
+            max_per_video=req.max_per_video,
+        )
+
+    def _page_response(self, req: RetrievalRequest, result: list) -> APIResponse:
+        # without page_size the whole result is returned and nothing is cached
+        if req.page_size is None:
+            return APIResponse(status=HTTPStatus.OK.value, message="Success", data=result)
+        cursor = self.search_cache.put(result)
+        page, next_page_offset = page_of(result, req.offset, req.page_size)
+        return APIResponse(
+            status=HTTPStatus.OK.value,
+            message="Success",
+            data=page,
+            cursor=cursor,
+            next_page_offset=next_page_offset,
+        )
+
+    def _cached_page_response(self, req: RetrievalRequest) -> APIResponse:
+        result = self.search_cache.get(req.cursor)
+        if result is None:
+            logger.error(f"Unknown or expired cursor {req.cursor}")
+            raise HTTPException(
+                status_code=HTTPStatus.GONE.value,
+                detail="Cursor expired or unknown, run the search again",
+            )
+        page, next_page_offset = page_of(result, req.offset, req.page_size)
+        logger.info(f"Served page at offset {req.offset} from cursor {req.cursor}")
+        return APIResponse(
+            status=HTTPStatus.OK.value,
+            message="Success",
+            data=page,
+            cursor=req.cursor,
+            next_page_offset=next_page_offset,
         )
-        logger.info(f"Temporal search completed with query {str(segments)}")
-        return APIResponse(status=HTTPStatus.OK.value, message="Success", data=result)
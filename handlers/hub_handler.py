@@ -1,9 +1,10 @@
 import base64
 import logging
 import os
+import re
 from http import HTTPStatus
-from io import BytesIO
 from typing import List, Optional, Union
+from urllib.parse import unquote
 import time
 from flask import json
 import ujson
@@ -11,7 +12,6 @@ import gzip
 import requests
 import pillow_avif
 
-from PIL import Image
 import numpy as np
 from fastapi import FastAPI, Depends, HTTPException, Path, Request, Response
 from fastapi import File, Form, UploadFile, Body
@@ -24,8 +24,9 @@ from pydantic import BaseModel
 
 from schema.api import APIResponse
 from schema.hub import ImageQuery, ScrollQuery
-from schema.rerank import VideoMetadata, DetectedObject
+from schema.rerank import VideoMetadata, DetectedObject, ColorSimilarityRequest
 from utils.logger import get_logger
+from utils.image_io import decode_image, encode_jpeg
 from utils.metadata_util import (
     pil_image_to_bytes,
     get_batch,
@@ -45,10 +46,58 @@ from configs.submission import SubmissionConfig
 
 SPLIT_NAME = os.getenv("SPLIT_NAME", "autoshot")
 SPLIT_NAME_LOW_RES = os.getenv("SPLIT_NAME_LOW_RES", "low_res_autoshot")
+
+# <batch>/frames/<split>/Keyframes_Lxx/keyframes/Lxx_Vyyy/00123.jpg, as a local
+# path, a /send_img URL or a low-res thumbnail of it
+KEYFRAME_PATH_PATTERN = re.compile(
+    r"(?:^|/)frames/[^/]+/Keyframes_[^/]+/keyframes/"
+    r"(?P<video>[^/?#]+)/(?P<frame>\d+)\.[A-Za-z0-9]+(?:[?#].*)?$"
+)
+
+
+def known_keyframe(image_path: str):
+    """(video_name, frame_name) if image_path points at a keyframe, else None."""
+    if image_path.startswith("data:"):
+        return None
+    match = KEYFRAME_PATH_PATTERN.search(unquote(image_path))
+    if match is None:
+        return None
+    return match.group("video"), match.group("frame")
+
+
 timeout = HubConfig().REQUEST_TIMEOUT
 
 logger = get_logger()
 
+
+async def load_query_image(
+    image_path: Optional[str], image: Optional[UploadFile], min_side: int
+) -> bytes:
+    """
+    JPEG bytes of a query image (multipart upload, data: URI, URL or local
+    path), decoded in draft mode and downscaled to the model input size.
+    """
+    try:
+        if image is not None:
+            data = await image.read()
+        elif not image_path:
+            raise ValueError("image_path or image must be given")
+        elif image_path.startswith("data:image/"):
+            header, data = image_path.split(",", 1)
+            data = base64.b64decode(data)
+        elif image_path.startswith(("http://", "https://")):
+            async with httpx.AsyncClient(timeout=timeout) as client:
+                response = await client.get(image_path)
+                response.raise_for_status()
+            data = response.content
+        else:
+            with open(image_path, "rb") as f:
+                data = f.read()
+        return encode_jpeg(decode_image(data, min_side=min_side))
+    except Exception as e:
+        logger.exception(f"Image loading failed: {e}")
+        raise HTTPException(status_code=400, detail=f"Image loading failed: {e}")
+
 class HubHandler:
     def __init__(self) -> None:
         pass
@@ -92,7 +141,9 @@ class HubHandler:
         return RedirectResponse(url=target, status_code=307)
 
     async def rerank_color(
-        self, video_metadata_list: List[VideoMetadata]
+        self,
+        video_metadata_list: List[VideoMetadata],
+        target_color: Optional[str] = None,
     ) -> APIResponse:
         # Convert Pydantic models to dictionaries
         video_metadata_dicts = [item.model_dump() for item in video_metadata_list]
@@ -101,7 +152,11 @@ class HubHandler:
 
         # Send the list directly without wrapping in an object
         async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.post(url, json=video_metadata_dicts)
+            response = await client.post(
+                url,
+                json=video_metadata_dicts,
+                params={"target_color": target_color} if target_color else None,
+            )
 
         if response.status_code != 200:
             raise HTTPException(
@@ -118,7 +173,9 @@ class HubHandler:
         )
 
     async def rerank_color_handler(
-        self, video_metadata_list: str = Form(...)
+        self,
+        video_metadata_list: str = Form(...),
+        target_color: Optional[str] = Form(None),
     ) -> APIResponse:
         try:
             # Parse the JSON string from form data
@@ -134,7 +191,53 @@ class HubHandler:
                 status_code=400, detail=f"Invalid video_metadata_list format: {str(e)}"
             )
 
-        return await self.rerank_color(video_metadata_objs)
+        return await self.rerank_color(video_metadata_objs, target_color)
+
+    async def rerank_color_similarity(self, req: ColorSimilarityRequest) -> APIResponse:
+        url = f"http://{RerankConfig().RERANK_HOST}:{RerankConfig().RERANK_PORT}/rerank/rerank_color_similarity"
+
+        async with httpx.AsyncClient(timeout=timeout) as client:
+            response = await client.post(url, json=req.model_dump())
+
+        if response.status_code != 200:
+            raise HTTPException(
+                status_code=response.status_code,
+                detail=f"Rerank color similarity error: {response.text}",
+            )
+
+        return APIResponse(
+            status=HTTPStatus.OK.value,
+            message="Running (Healthy)",
+            data=ujson.loads(response.text),
+        )
+
+    async def rerank_color_similarity_handler(
+        self,
+        video_metadata_list: str = Form(...),
+        palette: str = Form("[]"),
+        palette_weights: Optional[str] = Form(None),
+        reference: Optional[str] = Form(None),
+        method: str = Form("intersection"),
+        weight: float = Form(0.5),
+        min_similarity: Optional[float] = Form(None),
+    ) -> APIResponse:
+        try:
+            req = ColorSimilarityRequest(
+                videos=ujson.loads(video_metadata_list),
+                palette=ujson.loads(palette),
+                palette_weights=ujson.loads(palette_weights) if palette_weights else None,
+                reference=ujson.loads(reference) if reference else None,
+                method=method,
+                weight=weight,
+                min_similarity=min_similarity,
+            )
+        except Exception as e:
+            logger.error(f"Error parsing color similarity request: {e}")
+            raise HTTPException(
+                status_code=400, detail=f"Invalid color similarity request: {str(e)}"
+            )
+
+        return await self.rerank_color_similarity(req)
 
     async def translate_handler(
         self,
@@ -322,9 +425,24 @@ class HubHandler:
         return_object: bool = Form(True),
         frame_class_filter: bool = Form(True),
         skip_frames: Optional[str] = Form("[]"),
+        object_filter: Optional[str] = Form("[]"),
+        cursor: Optional[str] = Form(None),
+        offset: int = Form(0),
+        page_size: Optional[int] = Form(None),
+        s2t_query: Optional[str] = Form(None),
+        s2t_fusion: str = Form("rrf"),
+        s2t_weight: float = Form(0.3),
+        caption_query: Optional[str] = Form(None),
+        caption_fusion: str = Form("rrf"),
+        caption_weight: float = Form(0.3),
+        coarse_to_fine: bool = Form(False),
+        shot_k: Optional[int] = Form(None),
+        diversity: float = Form(0.0),
+        max_per_video: Optional[int] = Form(None),
     ) -> APIResponse:
 
         skip_frames_list = json.loads(skip_frames)
+        object_filter_list = json.loads(object_filter)
 
         # prepare url + json to send to SIGLIP service
         url = f"http://{SIGLIPV2Config().SIGLIP_V2_HOST}:{SIGLIPV2Config().SIGLIP_V2_PORT}/siglip_v2/text_search"
@@ -338,6 +456,20 @@ class HubHandler:
             "return_object": return_object,
             "frame_class_filter": frame_class_filter,
             "skip_frames": skip_frames_list if skip_frames_list else [],
+            "object_filter": object_filter_list if object_filter_list else [],
+            "cursor": cursor,
+            "offset": int(offset),
+            "page_size": page_size,
+            "s2t_query": s2t_query,
+            "s2t_fusion": s2t_fusion,
+            "s2t_weight": s2t_weight,
+            "caption_query": caption_query,
+            "caption_fusion": caption_fusion,
+            "caption_weight": caption_weight,
+            "coarse_to_fine": coarse_to_fine,
+            "shot_k": shot_k,
+            "diversity": diversity,
+            "max_per_video": max_per_video,
         }
 
         async with httpx.AsyncClient(timeout=timeout) as client:
@@ -352,8 +484,10 @@ class HubHandler:
         json_data = ujson.loads(response.text)
 
         # Process/Normalize the response data b4 sending to client (easier for frontend to keep track and use)
+        # position in the whole result, not in this page
+        first_index = int(offset) if page_size else 0
         for idx, record in enumerate(json_data["data"]):
-            record["index"] = idx
+            record["index"] = first_index + idx
             record["video_path"] = get_video_path(
                 batch=record["idx_folder"], video_name=record["video_name"]
             )
@@ -378,12 +512,24 @@ class HubHandler:
             data=json_data,
         )
 
-    async def siglip_v2_image_query(self, query: ImageQuery) -> APIResponse:
+    async def siglip_v2_image_query(
+        self, query: ImageQuery, image_bytes: Optional[bytes] = None
+    ) -> APIResponse:
 
-        url = f"http://{SIGLIPV2Config().SIGLIP_V2_HOST}:{SIGLIPV2Config().SIGLIP_V2_PORT}/siglip_v2/image_search"
+        # known keyframes are searched by their stored vector, no image encoding,
+        # other images are uploaded as binary multipart at model resolution
+        if query.video_name:
+            endpoint = "search_by_point"
+        elif image_bytes is not None:
+            endpoint = "image_upload_search"
+        else:
+            endpoint = "image_search"
+        url = f"http://{SIGLIPV2Config().SIGLIP_V2_HOST}:{SIGLIPV2Config().SIGLIP_V2_PORT}/siglip_v2/{endpoint}"
 
         json = {
             "image_data": query.image_data,
+            "video_name": query.video_name,
+            "frame_name": query.frame_name,
             "k": int(query.k),
             "video_filter": None
             if query.video_filter is None
@@ -393,10 +539,31 @@ class HubHandler:
             "return_object": query.return_object,
             "frame_class_filter": query.frame_class_filter,
             "skip_frames": query.skip_frames if query.skip_frames else [],
+            "object_filter": query.object_filter if query.object_filter else [],
+            "cursor": query.cursor,
+            "offset": int(query.offset),
+            "page_size": query.page_size,
+            "s2t_query": query.s2t_query,
+            "s2t_fusion": query.s2t_fusion,
+            "s2t_weight": query.s2t_weight,
+            "caption_query": query.caption_query,
+            "caption_fusion": query.caption_fusion,
+            "caption_weight": query.caption_weight,
+            "coarse_to_fine": query.coarse_to_fine,
+            "shot_k": query.shot_k,
+            "diversity": query.diversity,
+            "max_per_video": query.max_per_video,
         }
 
         async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.post(url, json=json)
+            if image_bytes is None:
+                response = await client.post(url, json=json)
+            else:
+                response = await client.post(
+                    url,
+                    files={"image": ("query.jpg", image_bytes, "image/jpeg")},
+                    data={"query": ujson.dumps(json)},
+                )
 
         if response.status_code != 200:
             raise HTTPException(
@@ -406,8 +573,10 @@ class HubHandler:
 
         json_data = ujson.loads(response.text)
 
+        # position in the whole result, not in this page
+        first_index = query.offset if query.page_size else 0
         for idx, record in enumerate(json_data["data"]):
-            record["index"] = idx
+            record["index"] = first_index + idx
             record["video_path"] = get_video_path(
                 batch=record["idx_folder"], video_name=record["video_name"]
             )
@@ -432,7 +601,8 @@ class HubHandler:
 
     async def siglip_v2_image_query_handler(
         self,
-        image_path: str = Form(...),
+        image_path: Optional[str] = Form(None),
+        image: Optional[UploadFile] = File(None),
         k: int = Form(100),
         video_filter: Optional[str] = Form(None),
         s2t_filter: Optional[str] = Form(None),
@@ -440,49 +610,66 @@ class HubHandler:
         return_object: bool = Form(True),
         frame_class_filter: bool = Form(True),
         skip_frames: Optional[str] = Form("[]"),
+        object_filter: Optional[str] = Form("[]"),
+        cursor: Optional[str] = Form(None),
+        offset: int = Form(0),
+        page_size: Optional[int] = Form(None),
+        s2t_query: Optional[str] = Form(None),
+        s2t_fusion: str = Form("rrf"),
+        s2t_weight: float = Form(0.3),
+        caption_query: Optional[str] = Form(None),
+        caption_fusion: str = Form("rrf"),
+        caption_weight: float = Form(0.3),
+        coarse_to_fine: bool = Form(False),
+        shot_k: Optional[int] = Form(None),
+        diversity: float = Form(0.0),
+        max_per_video: Optional[int] = Form(None),
     ) -> APIResponse:
 
         skip_frames_list = json.loads(skip_frames)
+        object_filter_list = json.loads(object_filter)
+
+        query_args = dict(
+            k=k,
+            video_filter=video_filter,
+            s2t_filter=s2t_filter,
+            return_s2t=return_s2t,
+            return_object=return_object,
+            frame_class_filter=frame_class_filter,
+            skip_frames=skip_frames_list,
+            object_filter=object_filter_list,
+            cursor=cursor,
+            offset=offset,
+            page_size=page_size,
+            s2t_query=s2t_query,
+            s2t_fusion=s2t_fusion,
+            s2t_weight=s2t_weight,
+            caption_query=caption_query,
+            caption_fusion=caption_fusion,
+            caption_weight=caption_weight,
+            coarse_to_fine=coarse_to_fine,
+            shot_k=shot_k,
+            diversity=diversity,
+            max_per_video=max_per_video,
+        )
 
-        try:
-            if image_path.startswith("data:image/"):
-                # Extract base64 data
-                header, data = image_path.split(",", 1)
-                image_bytes = base64.b64decode(data)
-                img = Image.open(BytesIO(image_bytes))
-
-            elif image_path.startswith(("http://", "https://")):
-                async with httpx.AsyncClient(timeout=timeout) as client:
-                    response = await client.get(image_path)
-                    response.raise_for_status()
-                img = Image.open(BytesIO(response.content))
-
-            else:
-                img = Image.open(image_path)
-
-            # Convert to RGB and encode
-            if img.mode != "RGB":
-                img = img.convert("RGB")
-
-            buffered = BytesIO()
-            img.save(buffered, format="JPEG")
-            image_data = base64.b64encode(buffered.getvalue()).decode("utf-8")
-
-        except Exception as e:
-            logger.exception(f"Image loading failed: {e}")
-            raise HTTPException(status_code=400, detail=f"Image loading failed: {e}")
+        # a keyframe of the collection is searched by its stored vector
+        keyframe = known_keyframe(image_path) if image_path else None
+        if keyframe is not None:
+            try:
+                return await self.siglip_v2_image_query(
+                    ImageQuery(video_name=keyframe[0], frame_name=keyframe[1], **query_args)
+                )
+            except HTTPException as e:
+                if e.status_code != HTTPStatus.NOT_FOUND:
+                    raise
+                logger.warning(f"{image_path} is not an indexed keyframe, encoding it")
 
+        image_bytes = await load_query_image(
+            image_path, image, SIGLIPV2Config().SIGLIP_V2_IMAGE_SIZE
+        )
         return await self.siglip_v2_image_query(
-            ImageQuery(
-                image_data=image_data,
-                k=k,
-                video_filter=video_filter,
-                s2t_filter=s2t_filter,
-                return_s2t=return_s2t,
-                return_object=return_object,
-                frame_class_filter=frame_class_filter,
-                skip_frames=skip_frames_list,
-            )
+            ImageQuery(**query_args), image_bytes=image_bytes
         )
 
     async def siglip_v2_temporal_query_handler(
@@ -495,9 +682,14 @@ class HubHandler:
         return_object: bool = Form(True),
         frame_class_filter: bool = Form(True),
         skip_frames: Optional[str] = Form("[]"),
+        object_filter: Optional[str] = Form("[]"),
+        cursor: Optional[str] = Form(None),
+        offset: int = Form(0),
+        page_size: Optional[int] = Form(None),
     ) -> APIResponse:
 
         skip_frames_list = json.loads(skip_frames)
+        object_filter_list = json.loads(object_filter)
 
         url = f"http://{SIGLIPV2Config().SIGLIP_V2_HOST}:{SIGLIPV2Config().SIGLIP_V2_PORT}/siglip_v2/temporal_search"
 
@@ -510,6 +702,10 @@ class HubHandler:
             "return_object": return_object,
             "frame_class_filter": frame_class_filter,
             "skip_frames": skip_frames_list if skip_frames_list else [],
+            "object_filter": object_filter_list if object_filter_list else [],
+            "cursor": cursor,
+            "offset": int(offset),
+            "page_size": page_size,
         }
 
         async with httpx.AsyncClient(timeout=timeout) as client:
@@ -526,8 +722,10 @@ class HubHandler:
         # Check if data is list of list of dicts
         if json_data["data"] and isinstance(json_data["data"][0], dict):
             # temporal mode: list[dict]
+            # position in the whole result, not in this page
+            first_index = int(offset) if page_size else 0
             for idx, record in enumerate(json_data["data"]):
-                record["index"] = idx
+                record["index"] = first_index + idx
                 record["video_path"] = get_video_path(
                     batch=record["idx_folder"], video_name=record["video_name"]
                 )
@@ -582,6 +780,8 @@ class HubHandler:
             "return_object": query.return_object,
             "frame_class_filter": query.frame_class_filter,
             "skip_frames": query.skip_frames if query.skip_frames else [],
+            "object_filter": query.object_filter if query.object_filter else [],
+            "next_page_offset": query.next_page_offset,
         }
 
         async with httpx.AsyncClient(timeout=timeout) as client:
@@ -595,8 +795,10 @@ class HubHandler:
 
         json_data = ujson.loads(response.text)
 
+        # position in the whole result, not in this page
+        first_index = query.index_offset
         for idx, record in enumerate(json_data["data"]):
-            record["index"] = idx
+            record["index"] = first_index + idx
             record["video_path"] = get_video_path(
                 batch=record["idx_folder"], video_name=record["video_name"]
             )
@@ -630,9 +832,13 @@ class HubHandler:
         return_object: bool = Form(True),
         frame_class_filter: bool = Form(True),
         skip_frames: Optional[str] = Form("[]"),
+        object_filter: Optional[str] = Form("[]"),
+        next_page_offset: Optional[int] = Form(None),
+        index_offset: int = Form(0),
     ) -> APIResponse:
 
         skip_frames_list = json.loads(skip_frames)
+        object_filter_list = json.loads(object_filter)
 
         try:
             time_in = convert_time_to_frame(video_filter, time_in) if time_in else None
@@ -662,6 +868,9 @@ class HubHandler:
                 return_object=return_object,
                 frame_class_filter=frame_class_filter,
                 skip_frames=skip_frames_list,
+                object_filter=object_filter_list,
+                next_page_offset=next_page_offset,
+                index_offset=index_offset,
             )
         )
 
@@ -683,9 +892,24 @@ class HubHandler:
         skip_frames: Optional[str] = Form(
             '[{"video_name": "L27_V015", "frame_name": "05643", "related_start_frame": "0", "related_end_frame": "50000"}]'
         ),
+        object_filter: Optional[str] = Form("[]"),
+        cursor: Optional[str] = Form(None),
+        offset: int = Form(0),
+        page_size: Optional[int] = Form(None),
+        s2t_query: Optional[str] = Form(None),
+        s2t_fusion: str = Form("rrf"),
+        s2t_weight: float = Form(0.3),
+        caption_query: Optional[str] = Form(None),
+        caption_fusion: str = Form("rrf"),
+        caption_weight: float = Form(0.3),
+        coarse_to_fine: bool = Form(False),
+        shot_k: Optional[int] = Form(None),
+        diversity: float = Form(0.0),
+        max_per_video: Optional[int] = Form(None),
     ) -> APIResponse:
 
         skip_frames_list = json.loads(skip_frames)
+        object_filter_list = json.loads(object_filter)
 
         url = f"http://{METACLIPConfig().METACLIP_HOST}:{METACLIPConfig().METACLIP_PORT}/metaclip/text_search"
 
@@ -698,6 +922,20 @@ class HubHandler:
             "return_object": return_object,
             "frame_class_filter": frame_class_filter,
             "skip_frames": skip_frames_list if skip_frames_list else [],
+            "object_filter": object_filter_list if object_filter_list else [],
+            "cursor": cursor,
+            "offset": int(offset),
+            "page_size": page_size,
+            "s2t_query": s2t_query,
+            "s2t_fusion": s2t_fusion,
+            "s2t_weight": s2t_weight,
+            "caption_query": caption_query,
+            "caption_fusion": caption_fusion,
+            "caption_weight": caption_weight,
+            "coarse_to_fine": coarse_to_fine,
+            "shot_k": shot_k,
+            "diversity": diversity,
+            "max_per_video": max_per_video,
         }
 
         async with httpx.AsyncClient(timeout=timeout) as client:
@@ -712,8 +950,10 @@ class HubHandler:
         json_data = ujson.loads(response.text)
 
         # Process/Normalize the response data b4 sending to client (easier for frontend to keep track and use)
+        # position in the whole result, not in this page
+        first_index = int(offset) if page_size else 0
         for idx, record in enumerate(json_data["data"]):
-            record["index"] = idx
+            record["index"] = first_index + idx
             record["video_path"] = get_video_path(
                 batch=record["idx_folder"], video_name=record["video_name"]
             )
@@ -738,12 +978,24 @@ class HubHandler:
             data=json_data,
         )
 
-    async def metaclip_image_query(self, query: ImageQuery) -> APIResponse:
+    async def metaclip_image_query(
+        self, query: ImageQuery, image_bytes: Optional[bytes] = None
+    ) -> APIResponse:
 
-        url = f"http://{METACLIPConfig().METACLIP_HOST}:{METACLIPConfig().METACLIP_PORT}/metaclip/image_search"
+        # known keyframes are searched by their stored vector, no image encoding,
+        # other images are uploaded as binary multipart at model resolution
+        if query.video_name:
+            endpoint = "search_by_point"
+        elif image_bytes is not None:
+            endpoint = "image_upload_search"
+        else:
+            endpoint = "image_search"
+        url = f"http://{METACLIPConfig().METACLIP_HOST}:{METACLIPConfig().METACLIP_PORT}/metaclip/{endpoint}"
 
         json = {
             "image_data": query.image_data,
+            "video_name": query.video_name,
+            "frame_name": query.frame_name,
             "k": int(query.k),
             "video_filter": None
             if query.video_filter is None
@@ -753,10 +1005,31 @@ class HubHandler:
             "return_object": query.return_object,
             "frame_class_filter": query.frame_class_filter,
             "skip_frames": query.skip_frames if query.skip_frames else [],
+            "object_filter": query.object_filter if query.object_filter else [],
+            "cursor": query.cursor,
+            "offset": int(query.offset),
+            "page_size": query.page_size,
+            "s2t_query": query.s2t_query,
+            "s2t_fusion": query.s2t_fusion,
+            "s2t_weight": query.s2t_weight,
+            "caption_query": query.caption_query,
+            "caption_fusion": query.caption_fusion,
+            "caption_weight": query.caption_weight,
+            "coarse_to_fine": query.coarse_to_fine,
+            "shot_k": query.shot_k,
+            "diversity": query.diversity,
+            "max_per_video": query.max_per_video,
         }
 
         async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.post(url, json=json)
+            if image_bytes is None:
+                response = await client.post(url, json=json)
+            else:
+                response = await client.post(
+                    url,
+                    files={"image": ("query.jpg", image_bytes, "image/jpeg")},
+                    data={"query": ujson.dumps(json)},
+                )
 
         if response.status_code != 200:
             raise HTTPException(
@@ -766,8 +1039,10 @@ class HubHandler:
 
         json_data = ujson.loads(response.text)
 
+        # position in the whole result, not in this page
+        first_index = query.offset if query.page_size else 0
         for idx, record in enumerate(json_data["data"]):
-            record["index"] = idx
+            record["index"] = first_index + idx
             record["video_path"] = get_video_path(
                 batch=record["idx_folder"], video_name=record["video_name"]
             )
@@ -792,7 +1067,8 @@ class HubHandler:
 
     async def metaclip_image_query_handler(
         self,
-        image_path: str = Form(...),
+        image_path: Optional[str] = Form(None),
+        image: Optional[UploadFile] = File(None),
         k: int = Form(100),
         video_filter: Optional[str] = Form(None),
         s2t_filter: Optional[str] = Form(None),
@@ -800,49 +1076,66 @@ class HubHandler:
         return_object: bool = Form(True),
         frame_class_filter: bool = Form(True),
         skip_frames: Optional[str] = Form("[]"),
+        object_filter: Optional[str] = Form("[]"),
+        cursor: Optional[str] = Form(None),
+        offset: int = Form(0),
+        page_size: Optional[int] = Form(None),
+        s2t_query: Optional[str] = Form(None),
+        s2t_fusion: str = Form("rrf"),
+        s2t_weight: float = Form(0.3),
+        caption_query: Optional[str] = Form(None),
+        caption_fusion: str = Form("rrf"),
+        caption_weight: float = Form(0.3),
+        coarse_to_fine: bool = Form(False),
+        shot_k: Optional[int] = Form(None),
+        diversity: float = Form(0.0),
+        max_per_video: Optional[int] = Form(None),
     ) -> APIResponse:
 
         skip_frames_list = json.loads(skip_frames)
+        object_filter_list = json.loads(object_filter)
+
+        query_args = dict(
+            k=k,
+            video_filter=video_filter,
+            s2t_filter=s2t_filter,
+            return_s2t=return_s2t,
+            return_object=return_object,
+            frame_class_filter=frame_class_filter,
+            skip_frames=skip_frames_list,
+            object_filter=object_filter_list,
+            cursor=cursor,
+            offset=offset,
+            page_size=page_size,
+            s2t_query=s2t_query,
+            s2t_fusion=s2t_fusion,
+            s2t_weight=s2t_weight,
+            caption_query=caption_query,
+            caption_fusion=caption_fusion,
+            caption_weight=caption_weight,
+            coarse_to_fine=coarse_to_fine,
+            shot_k=shot_k,
+            diversity=diversity,
+            max_per_video=max_per_video,
+        )
 
-        try:
-            if image_path.startswith("data:image/"):
-                # Extract base64 data
-                header, data = image_path.split(",", 1)
-                image_bytes = base64.b64decode(data)
-                img = Image.open(BytesIO(image_bytes))
-
-            elif image_path.startswith(("http://", "https://")):
-                async with httpx.AsyncClient(timeout=timeout) as client:
-                    response = await client.get(image_path)
-                    response.raise_for_status()
-                img = Image.open(BytesIO(response.content))
-
-            else:
-                img = Image.open(image_path)
-
-            # Convert to RGB and encode
-            if img.mode != "RGB":
-                img = img.convert("RGB")
-
-            buffered = BytesIO()
-            img.save(buffered, format="JPEG")
-            image_data = base64.b64encode(buffered.getvalue()).decode("utf-8")
-
-        except Exception as e:
-            logger.exception(f"Image loading failed: {e}")
-            raise HTTPException(status_code=400, detail=f"Image loading failed: {e}")
+        # a keyframe of the collection is searched by its stored vector
+        keyframe = known_keyframe(image_path) if image_path else None
+        if keyframe is not None:
+            try:
+                return await self.metaclip_image_query(
+                    ImageQuery(video_name=keyframe[0], frame_name=keyframe[1], **query_args)
+                )
+            except HTTPException as e:
+                if e.status_code != HTTPStatus.NOT_FOUND:
+                    raise
+                logger.warning(f"{image_path} is not an indexed keyframe, encoding it")
 
+        image_bytes = await load_query_image(
+            image_path, image, METACLIPConfig().METACLIP_IMAGE_SIZE
+        )
         return await self.metaclip_image_query(
-            ImageQuery(
-                image_data=image_data,
-                k=k,
-                video_filter=video_filter,
-                s2t_filter=s2t_filter,
-                return_s2t=return_s2t,
-                return_object=return_object,
-                frame_class_filter=frame_class_filter,
-                skip_frames=skip_frames_list,
-            )
+            ImageQuery(**query_args), image_bytes=image_bytes
         )
 
     async def metaclip_temporal_query_handler(
@@ -856,9 +1149,14 @@ class HubHandler:
         return_object: bool = Form(True),
         frame_class_filter: bool = Form(True),
         skip_frames: Optional[str] = Form("[]"),
+        object_filter: Optional[str] = Form("[]"),
+        cursor: Optional[str] = Form(None),
+        offset: int = Form(0),
+        page_size: Optional[int] = Form(None),
     ) -> APIResponse:
 
         skip_frames_list = json.loads(skip_frames)
+        object_filter_list = json.loads(object_filter)
 
         url = f"http://{METACLIPConfig().METACLIP_HOST}:{METACLIPConfig().METACLIP_PORT}/metaclip/temporal_search"
 
@@ -871,6 +1169,10 @@ class HubHandler:
             "return_object": return_object,
             "frame_class_filter": frame_class_filter,
             "skip_frames": skip_frames_list if skip_frames_list else [],
+            "object_filter": object_filter_list if object_filter_list else [],
+            "cursor": cursor,
+            "offset": int(offset),
+            "page_size": page_size,
         }
 
         async with httpx.AsyncClient(timeout=timeout) as client:
@@ -887,8 +1189,10 @@ class HubHandler:
         # Check if data is list of list of dicts
         if json_data["data"] and isinstance(json_data["data"][0], dict):
             # temporal mode: list[dict]
+            # position in the whole result, not in this page
+            first_index = int(offset) if page_size else 0
             for idx, record in enumerate(json_data["data"]):
-                record["index"] = idx
+                record["index"] = first_index + idx
                 record["video_path"] = get_video_path(
                     batch=record["idx_folder"], video_name=record["video_name"]
                 )
@@ -943,6 +1247,8 @@ class HubHandler:
             "return_object": query.return_object,
             "frame_class_filter": query.frame_class_filter,
             "skip_frames": query.skip_frames if query.skip_frames else [],
+            "object_filter": query.object_filter if query.object_filter else [],
+            "next_page_offset": query.next_page_offset,
         }
 
         async with httpx.AsyncClient(timeout=timeout) as client:
@@ -956,8 +1262,10 @@ class HubHandler:
 
         json_data = ujson.loads(response.text)
 
+        # position in the whole result, not in this page
+        first_index = query.index_offset
         for idx, record in enumerate(json_data["data"]):
-            record["index"] = idx
+            record["index"] = first_index + idx
             record["video_path"] = get_video_path(
                 batch=record["idx_folder"], video_name=record["video_name"]
             )
@@ -991,9 +1299,13 @@ class HubHandler:
         return_object=Form(True),
         frame_class_filter: bool = Form(True),
         skip_frames: Optional[str] = Form("[]"),
+        object_filter: Optional[str] = Form("[]"),
+        next_page_offset: Optional[int] = Form(None),
+        index_offset: int = Form(0),
     ) -> APIResponse:
 
         skip_frames_list = json.loads(skip_frames)
+        object_filter_list = json.loads(object_filter)
 
         try:
             time_in = convert_time_to_frame(video_filter, time_in) if time_in else None
@@ -1023,6 +1335,9 @@ class HubHandler:
                 return_object=return_object,
                 frame_class_filter=frame_class_filter,
                 skip_frames=skip_frames_list,
+                object_filter=object_filter_list,
+                next_page_offset=next_page_offset,
+                index_offset=index_offset,
             )
         )
 
@@ -1044,9 +1359,24 @@ class HubHandler:
         skip_frames: Optional[str] = Form(
             '[{"video_name": "L27_V015", "frame_name": "05643", "related_start_frame": "0", "related_end_frame": "50000"}]'
         ),
+        object_filter: Optional[str] = Form("[]"),
+        cursor: Optional[str] = Form(None),
+        offset: int = Form(0),
+        page_size: Optional[int] = Form(None),
+        s2t_query: Optional[str] = Form(None),
+        s2t_fusion: str = Form("rrf"),
+        s2t_weight: float = Form(0.3),
+        caption_query: Optional[str] = Form(None),
+        caption_fusion: str = Form("rrf"),
+        caption_weight: float = Form(0.3),
+        coarse_to_fine: bool = Form(False),
+        shot_k: Optional[int] = Form(None),
+        diversity: float = Form(0.0),
+        max_per_video: Optional[int] = Form(None),
     ) -> APIResponse:
 
         skip_frames_list = json.loads(skip_frames)
+        object_filter_list = json.loads(object_filter)
 
         url = f"http://{METACLIPV2Config().METACLIP_V2_HOST}:{METACLIPV2Config().METACLIP_V2_PORT}/metaclip_v2/text_search"
 
@@ -1059,6 +1389,20 @@ class HubHandler:
             "return_object": return_object,
             "frame_class_filter": frame_class_filter,
             "skip_frames": skip_frames_list if skip_frames_list else [],
+            "object_filter": object_filter_list if object_filter_list else [],
+            "cursor": cursor,
+            "offset": int(offset),
+            "page_size": page_size,
+            "s2t_query": s2t_query,
+            "s2t_fusion": s2t_fusion,
+            "s2t_weight": s2t_weight,
+            "caption_query": caption_query,
+            "caption_fusion": caption_fusion,
+            "caption_weight": caption_weight,
+            "coarse_to_fine": coarse_to_fine,
+            "shot_k": shot_k,
+            "diversity": diversity,
+            "max_per_video": max_per_video,
         }
 
         async with httpx.AsyncClient(timeout=timeout) as client:
@@ -1073,8 +1417,10 @@ class HubHandler:
         json_data = ujson.loads(response.text)
 
         # Process/Normalize the response data b4 sending to client (easier for frontend to keep track and use)
+        # position in the whole result, not in this page
+        first_index = int(offset) if page_size else 0
         for idx, record in enumerate(json_data["data"]):
-            record["index"] = idx
+            record["index"] = first_index + idx
             record["video_path"] = get_video_path(
                 batch=record["idx_folder"], video_name=record["video_name"]
             )
@@ -1099,12 +1445,24 @@ class HubHandler:
             data=json_data,
         )
 
-    async def metaclip_v2_image_query(self, query: ImageQuery) -> APIResponse:
+    async def metaclip_v2_image_query(
+        self, query: ImageQuery, image_bytes: Optional[bytes] = None
+    ) -> APIResponse:
 
-        url = f"http://{METACLIPV2Config().METACLIP_V2_HOST}:{METACLIPV2Config().METACLIP_V2_PORT}/metaclip_v2/image_search"
+        # known keyframes are searched by their stored vector, no image encoding,
+        # other images are uploaded as binary multipart at model resolution
+        if query.video_name:
+            endpoint = "search_by_point"
+        elif image_bytes is not None:
+            endpoint = "image_upload_search"
+        else:
+            endpoint = "image_search"
+        url = f"http://{METACLIPV2Config().METACLIP_V2_HOST}:{METACLIPV2Config().METACLIP_V2_PORT}/metaclip_v2/{endpoint}"
 
         json = {
             "image_data": query.image_data,
+            "video_name": query.video_name,
+            "frame_name": query.frame_name,
             "k": int(query.k),
             "video_filter": None
             if query.video_filter is None
@@ -1114,10 +1472,31 @@ class HubHandler:
             "return_object": query.return_object,
             "frame_class_filter": query.frame_class_filter,
             "skip_frames": query.skip_frames if query.skip_frames else [],
+            "object_filter": query.object_filter if query.object_filter else [],
+            "cursor": query.cursor,
+            "offset": int(query.offset),
+            "page_size": query.page_size,
+            "s2t_query": query.s2t_query,
+            "s2t_fusion": query.s2t_fusion,
+            "s2t_weight": query.s2t_weight,
+            "caption_query": query.caption_query,
+            "caption_fusion": query.caption_fusion,
+            "caption_weight": query.caption_weight,
+            "coarse_to_fine": query.coarse_to_fine,
+            "shot_k": query.shot_k,
+            "diversity": query.diversity,
+            "max_per_video": query.max_per_video,
         }
 
         async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.post(url, json=json)
+            if image_bytes is None:
+                response = await client.post(url, json=json)
+            else:
+                response = await client.post(
+                    url,
+                    files={"image": ("query.jpg", image_bytes, "image/jpeg")},
+                    data={"query": ujson.dumps(json)},
+                )
 
         if response.status_code != 200:
             raise HTTPException(
@@ -1127,8 +1506,10 @@ class HubHandler:
 
         json_data = ujson.loads(response.text)
 
+        # position in the whole result, not in this page
+        first_index = query.offset if query.page_size else 0
         for idx, record in enumerate(json_data["data"]):
-            record["index"] = idx
+            record["index"] = first_index + idx
             record["video_path"] = get_video_path(
                 batch=record["idx_folder"], video_name=record["video_name"]
             )
@@ -1153,7 +1534,8 @@ class HubHandler:
 
     async def metaclip_v2_image_query_handler(
         self,
-        image_path: str = Form(...),
+        image_path: Optional[str] = Form(None),
+        image: Optional[UploadFile] = File(None),
         k: int = Form(100),
         video_filter: Optional[str] = Form(None),
         s2t_filter: Optional[str] = Form(None),
@@ -1161,49 +1543,66 @@ class HubHandler:
         return_object: bool = Form(True),
         frame_class_filter: bool = Form(True),
         skip_frames: Optional[str] = Form("[]"),
+        object_filter: Optional[str] = Form("[]"),
+        cursor: Optional[str] = Form(None),
+        offset: int = Form(0),
+        page_size: Optional[int] = Form(None),
+        s2t_query: Optional[str] = Form(None),
+        s2t_fusion: str = Form("rrf"),
+        s2t_weight: float = Form(0.3),
+        caption_query: Optional[str] = Form(None),
+        caption_fusion: str = Form("rrf"),
+        caption_weight: float = Form(0.3),
+        coarse_to_fine: bool = Form(False),
+        shot_k: Optional[int] = Form(None),
+        diversity: float = Form(0.0),
+        max_per_video: Optional[int] = Form(None),
     ) -> APIResponse:
 
         skip_frames_list = json.loads(skip_frames)
+        object_filter_list = json.loads(object_filter)
+
+        query_args = dict(
+            k=k,
+            video_filter=video_filter,
+            s2t_filter=s2t_filter,
+            return_s2t=return_s2t,
+            return_object=return_object,
+            frame_class_filter=frame_class_filter,
+            skip_frames=skip_frames_list,
+            object_filter=object_filter_list,
+            cursor=cursor,
+            offset=offset,
+            page_size=page_size,
+            s2t_query=s2t_query,
+            s2t_fusion=s2t_fusion,
+            s2t_weight=s2t_weight,
+            caption_query=caption_query,
+            caption_fusion=caption_fusion,
+            caption_weight=caption_weight,
+            coarse_to_fine=coarse_to_fine,
+            shot_k=shot_k,
+            diversity=diversity,
+            max_per_video=max_per_video,
+        )
 
-        try:
-            if image_path.startswith("data:image/"):
-                # Extract base64 data
-                header, data = image_path.split(",", 1)
-                image_bytes = base64.b64decode(data)
-                img = Image.open(BytesIO(image_bytes))
-
-            elif image_path.startswith(("http://", "https://")):
-                async with httpx.AsyncClient(timeout=timeout) as client:
-                    response = await client.get(image_path)
-                    response.raise_for_status()
-                img = Image.open(BytesIO(response.content))
-
-            else:
-                img = Image.open(image_path)
-
-            # Convert to RGB and encode
-            if img.mode != "RGB":
-                img = img.convert("RGB")
-
-            buffered = BytesIO()
-            img.save(buffered, format="JPEG")
-            image_data = base64.b64encode(buffered.getvalue()).decode("utf-8")
-
-        except Exception as e:
-            logger.exception(f"Image loading failed: {e}")
-            raise HTTPException(status_code=400, detail=f"Image loading failed: {e}")
+        # a keyframe of the collection is searched by its stored vector
+        keyframe = known_keyframe(image_path) if image_path else None
+        if keyframe is not None:
+            try:
+                return await self.metaclip_v2_image_query(
+                    ImageQuery(video_name=keyframe[0], frame_name=keyframe[1], **query_args)
+                )
+            except HTTPException as e:
+                if e.status_code != HTTPStatus.NOT_FOUND:
+                    raise
+                logger.warning(f"{image_path} is not an indexed keyframe, encoding it")
 
+        image_bytes = await load_query_image(
+            image_path, image, METACLIPV2Config().METACLIP_V2_IMAGE_SIZE
+        )
         return await self.metaclip_v2_image_query(
-            ImageQuery(
-                image_data=image_data,
-                k=k,
-                video_filter=video_filter,
-                s2t_filter=s2t_filter,
-                return_s2t=return_s2t,
-                return_object=return_object,
-                frame_class_filter=frame_class_filter,
-                skip_frames=skip_frames_list,
-            )
+            ImageQuery(**query_args), image_bytes=image_bytes
         )
 
     async def metaclip_v2_temporal_query_handler(
@@ -1217,9 +1616,14 @@ class HubHandler:
         return_object: bool = Form(True),
         frame_class_filter: bool = Form(True),
         skip_frames: Optional[str] = Form("[]"),
+        object_filter: Optional[str] = Form("[]"),
+        cursor: Optional[str] = Form(None),
+        offset: int = Form(0),
+        page_size: Optional[int] = Form(None),
     ) -> APIResponse:
 
         skip_frames_list = json.loads(skip_frames)
+        object_filter_list = json.loads(object_filter)
 
         url = f"http://{METACLIPV2Config().METACLIP_V2_HOST}:{METACLIPV2Config().METACLIP_V2_PORT}/metaclip_v2/temporal_search"
 
@@ -1232,6 +1636,10 @@ class HubHandler:
             "return_object": return_object,
             "frame_class_filter": frame_class_filter,
             "skip_frames": skip_frames_list if skip_frames_list else [],
+            "object_filter": object_filter_list if object_filter_list else [],
+            "cursor": cursor,
+            "offset": int(offset),
+            "page_size": page_size,
         }
 
         async with httpx.AsyncClient(timeout=timeout) as client:
@@ -1248,8 +1656,10 @@ class HubHandler:
         # Check if data is list of list of dicts
         if json_data["data"] and isinstance(json_data["data"][0], dict):
             # temporal mode: list[dict]
+            # position in the whole result, not in this page
+            first_index = int(offset) if page_size else 0
             for idx, record in enumerate(json_data["data"]):
-                record["index"] = idx
+                record["index"] = first_index + idx
                 record["video_path"] = get_video_path(
                     batch=record["idx_folder"], video_name=record["video_name"]
                 )
@@ -1304,6 +1714,8 @@ class HubHandler:
             "return_object": query.return_object,
             "frame_class_filter": query.frame_class_filter,
             "skip_frames": query.skip_frames if query.skip_frames else [],
+            "object_filter": query.object_filter if query.object_filter else [],
+            "next_page_offset": query.next_page_offset,
         }
 
         async with httpx.AsyncClient(timeout=timeout) as client:
@@ -1317,8 +1729,10 @@ class HubHandler:
 
         json_data = ujson.loads(response.text)
 
+        # position in the whole result, not in this page
+        first_index = query.index_offset
         for idx, record in enumerate(json_data["data"]):
-            record["index"] = idx
+            record["index"] = first_index + idx
             record["video_path"] = get_video_path(
                 batch=record["idx_folder"], video_name=record["video_name"]
             )
@@ -1352,9 +1766,13 @@ class HubHandler:
         return_object=Form(True),
         frame_class_filter: bool = Form(True),
         skip_frames: Optional[str] = Form("[]"),
+        object_filter: Optional[str] = Form("[]"),
+        next_page_offset: Optional[int] = Form(None),
+        index_offset: int = Form(0),
     ) -> APIResponse:
 
         skip_frames_list = json.loads(skip_frames)
+        object_filter_list = json.loads(object_filter)
 
         try:
             time_in = convert_time_to_frame(video_filter, time_in) if time_in else None
@@ -1384,5 +1802,8 @@ class HubHandler:
                 return_object=return_object,
                 frame_class_filter=frame_class_filter,
                 skip_frames=skip_frames_list,
+                object_filter=object_filter_list,
+                next_page_offset=next_page_offset,
+                index_offset=index_offset,
             )
         )
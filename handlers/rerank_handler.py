@@ -5,20 +5,26 @@ from http import HTTPStatus
 from io import BytesIO
 from typing import List, Optional, Union
 import time
-import ujson
-import math
-import colorsys
 
 import numpy as np
 from fastapi import FastAPI, Depends, HTTPException, Path
-from fastapi import File, Form, UploadFile, Body
+from fastapi import File, Form, UploadFile, Body, Query
 from fastapi.responses import FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 
 from pathlib import Path
 from schema.api import APIResponse
-from schema.rerank import VideoMetadata
+from schema.rerank import ColorSimilarityRequest, VideoMetadata
+from utils.color_table import (
+    TABLE_DIR,
+    ColorTable,
+    color_distance,
+    histogram_similarity,
+    load_color_json,
+    palette_histogram,
+    step_keys,
+)
 from utils.logger import get_logger
 
 from configs.rerank import RerankConfig
@@ -31,6 +37,7 @@ class RerankHandler:
         paths = RerankConfig().RERANK_COLOR_PATH
         logger.info(f"Initializing RerankHandler with config paths: {paths}")
         self.color_dict_path = paths
+        self.color_tables = self._load_color_tables()
 
     async def ping_handler(self) -> APIResponse:
         logger.info("ping_handler invoked")
@@ -40,116 +47,216 @@ class RerankHandler:
             data="ping",
         )
 
-    def _step(self, r: float, g: float, b: float, repetitions: int = 1):
+    def _load_color_tables(self):
+        """Colour table of every batch that has one, keyed by idx_folder."""
+        tables = {}
+        for idx_folder, color_path in enumerate(self.color_dict_path):
+            table_dir = os.path.join(color_path, TABLE_DIR)
+            if os.path.isdir(table_dir):
+                tables[idx_folder] = ColorTable(table_dir)
+                logger.info(f"Loaded color table {table_dir} ({len(tables[idx_folder])} frames)")
+            else:
+                logger.warning(f"Color table {table_dir} not found, reading color JSONs")
+        return tables
+
+    def _color_json_path(self, vm: VideoMetadata) -> Path:
+        base_dir = Path(self.color_dict_path[int(vm.idx_folder)])
+        return (
+            base_dir
+            / f"Keyframes_L{vm.video_name[1:3]}"
+            / f"keyframes/{vm.video_name[:-4]}"
+            / f"{int(vm.keyframe_id):05d}.json"
+        )
+
+    @staticmethod
+    def _parse_color(target_color: str) -> np.ndarray:
+        """RGB of "#rrggbb" or "r,g,b"."""
         try:
-            # compute luminance and HSV ordering key
-            lum = math.sqrt(0.241 * r + 0.691 * g + 0.068 * b)
-            h, s, v = colorsys.rgb_to_hsv(r / 255.0, g / 255.0, b / 255.0)
-            result = (
-                int(h * repetitions),
-                int(lum * repetitions),
-                int(v * repetitions),
-            )
-            logger.debug(
-                f"_step computed: rgb=({r}, {g}, {b}), repetitions={repetitions} => {result}"
+            value = target_color.strip()
+            if value.startswith("#"):
+                rgb = [int(value[i : i + 2], 16) for i in (1, 3, 5)]
+                if len(value) != 7:
+                    raise ValueError
+            else:
+                rgb = [float(channel) for channel in value.split(",")]
+            if len(rgb) != 3 or not all(0 <= channel <= 255 for channel in rgb):
+                raise ValueError
+        except ValueError:
+            raise HTTPException(
+                status_code=HTTPStatus.BAD_REQUEST,
+                detail=f"Invalid target_color '{target_color}', expected '#rrggbb' or 'r,g,b'",
             )
-            return result
-        except Exception as e:
-            logger.error(f"Error in _step calculation: {e}")
-            raise
+        return np.asarray(rgb, dtype=np.float32)
 
-    async def color_rerank(self, videos: List[VideoMetadata]) -> APIResponse:
-        logger.info(f"Starting color_rerank for {len(videos)} videos")
-        keyed: List[tuple] = []
-        for vm in videos:
-            logger.debug(
-                f"Processing video: {vm.video_name} (folder idx: {vm.idx_folder}, keyframe id: {vm.keyframe_id})"
-            )
-            base_dir = Path(self.color_dict_path[int(vm.idx_folder)])
-            json_path = (
-                base_dir
-                / f"Keyframes_L{vm.video_name[1:3]}"
-                / f"keyframes/{vm.video_name[:-4]}"
-                / f"{int(vm.keyframe_id):05d}.json"
+    def _gather(self, videos: List, column: str):
+        """
+        Rows of a colour table column for every (idx_folder, video_name,
+        keyframe_id) item: one searchsorted gather per table. Returns the
+        values (zeros where missing) and the missing mask.
+        """
+        values, missing = None, np.ones(len(videos), dtype=bool)
+        folders = np.asarray([int(vm.idx_folder) for vm in videos], dtype=np.int64)
+        for idx_folder in np.unique(folders):
+            table = self.color_tables.get(int(idx_folder))
+            if table is None or getattr(table, column) is None:
+                continue
+            data = getattr(table, column)
+            if values is None:
+                values = np.zeros((len(videos),) + data.shape[1:], dtype=data.dtype)
+            sel = np.flatnonzero(folders == idx_folder)
+            rows = table.rows(
+                [videos[i].video_name[:-4] for i in sel],
+                [int(videos[i].keyframe_id) for i in sel],
             )
+            hit = rows >= 0
+            values[sel[hit]] = data[rows[hit]]
+            missing[sel[hit]] = False
+        return values, missing
+
+    def _dominant_colors(self, videos: List[VideoMetadata]):
+        """
+        (rgb, step) arrays of the results from the colour tables, per-frame
+        JSONs only for frames no table covers.
+        """
+        rgb, missing = self._gather(videos, "rgb")
+        step, _ = self._gather(videos, "step")
+        if rgb is None:
+            rgb = np.zeros((len(videos), 3), dtype=np.float32)
+            step = np.zeros((len(videos), 3), dtype=np.int32)
+
+        for i in np.flatnonzero(missing):
+            json_path = self._color_json_path(videos[i])
             if not json_path.exists():
                 logger.error(f"Color JSON not found at path: {json_path}")
                 raise HTTPException(
                     status_code=HTTPStatus.NOT_FOUND,
                     detail=f"Color JSON not found: {json_path}",
                 )
-
             try:
-                with open(json_path, "r") as f:
-                    color_data = ujson.load(f)
-                logger.debug(f"Loaded color JSON: {json_path}")
+                rgb[i] = load_color_json(str(json_path))
             except Exception as e:
                 logger.error(f"Failed to load JSON from {json_path}: {e}")
                 raise HTTPException(
                     status_code=HTTPStatus.INTERNAL_SERVER_ERROR,
                     detail=f"Failed to load color data: {e}",
                 )
+            step[i] = step_keys(rgb[i])[0]
+        if missing.any():
+            logger.debug(f"{int(missing.sum())} colors read from JSON files")
+        return rgb, step
 
-                # Normalize to list of color entries (each with "rgb")
-            if isinstance(color_data, list):
-                colors = color_data
-            elif isinstance(color_data, dict) and "rgb" in color_data:
-                colors = [color_data]
-            else:
-                colors = []
+    async def color_rerank(
+        self, videos: List[VideoMetadata], target_color: Optional[str] = None
+    ) -> APIResponse:
+        logger.info(f"Starting color_rerank for {len(videos)} videos")
+        if not videos:
+            return APIResponse(
+                status=HTTPStatus.OK.value, message="No videos to sort", data=[]
+            )
 
-            if not colors:
-                logger.warning(f"No colors found in data for {json_path}")
+        target = self._parse_color(target_color) if target_color else None
+        rgb, step = self._dominant_colors(videos)
+        scores = np.asarray([float(vm.score) for vm in videos], dtype=np.float64)
 
-            # Sort by computed key
-            try:
-                colors.sort(
-                    key=lambda c: self._step(*c.get("rgb", (0, 0, 0)), repetitions=8)
-                )
-                logger.debug(f"Sorted colors for {vm.video_name}")
-            except Exception as e:
-                logger.error(f"Error sorting colors: {e}")
-                raise
+        if target is not None:
+            # closest dominant colour first, higher score first on ties
+            order = np.lexsort((-scores, color_distance(rgb, target)))
+            message = f"Videos sorted by distance to color {target_color}"
+        else:
+            # sort by the (hue, luminance, value) step key, then cycle so that
+            # the highest score video is first
+            order = np.lexsort((step[:, 2], step[:, 1], step[:, 0]))
+            order = np.roll(order, -int(np.argmax(scores[order])))
+            message = "Videos sorted by dominant color and cycled by top score"
+        logger.info(message)
 
-            dominant_rgb = (
-                tuple(colors[0].get("rgb", (0, 0, 0))) if colors else (0, 0, 0)
-            )
-            logger.debug(f"Dominant RGB for {vm.video_name}: {dominant_rgb}")
+        cycled = [videos[i] for i in order]
+        for idx, record in enumerate(cycled):
+            record.index = idx
 
-            video_key = self._step(*dominant_rgb, repetitions=8)
-            keyed.append((vm, video_key))
-            logger.debug(f"Video key for {vm.video_name}: {video_key}")
+        return APIResponse(
+            status=HTTPStatus.OK.value,
+            message=message,
+            data=cycled,
+        )
 
-        # Sort videos by their color-derived key
-        keyed.sort(key=lambda pair: pair[1])
-        sorted_videos = [pair[0] for pair in keyed]
-        logger.info("Videos sorted by dominant color key")
+    async def color_rerank_handler(
+        self,
+        videos: List[VideoMetadata] = Body(...),
+        target_color: Optional[str] = Query(None),
+    ) -> APIResponse:
+        logger.info("color_rerank_handler invoked")
+        return await self.color_rerank(videos, target_color)
 
-        # Find index of video with highest score
-        try:
-            max_idx = max(
-                range(len(sorted_videos)), key=lambda i: float(sorted_videos[i].score)
+    async def color_similarity_rerank(self, req: ColorSimilarityRequest) -> APIResponse:
+        """
+        Rerank by colour histogram similarity to a palette or a reference
+        frame, blended with the min-max normalised retrieval score.
+        """
+        videos = req.videos
+        logger.info(f"Starting color_similarity_rerank for {len(videos)} videos")
+        if req.reference is not None:
+            reference_hist, reference_missing = self._gather([req.reference], "hist")
+            if reference_hist is None or reference_missing[0]:
+                raise HTTPException(
+                    status_code=HTTPStatus.NOT_FOUND,
+                    detail=f"No color histogram for reference frame "
+                    f"{req.reference.video_name} {req.reference.keyframe_id}",
+                )
+            query = reference_hist[0]
+        elif req.palette:
+            if any(len(color) != 3 for color in req.palette) or (
+                req.palette_weights is not None
+                and len(req.palette_weights) != len(req.palette)
+            ):
+                raise HTTPException(
+                    status_code=HTTPStatus.BAD_REQUEST,
+                    detail="palette must be RGB triples, palette_weights one weight per color",
+                )
+            query = palette_histogram(req.palette, req.palette_weights)
+        else:
+            raise HTTPException(
+                status_code=HTTPStatus.BAD_REQUEST,
+                detail="Either palette or reference must be given",
+            )
+        if not videos:
+            return APIResponse(
+                status=HTTPStatus.OK.value, message="No videos to sort", data=[]
             )
-            logger.debug(f"Highest score video at sorted index: {max_idx}")
-        except Exception as e:
-            logger.error(f"Failed to determine max score index: {e}")
-            raise
 
-        # Cycle so that highest score video is first
-        cycled = sorted_videos[max_idx:] + sorted_videos[:max_idx]
-        logger.info("Cycled videos so that top score video is first")
+        hists, missing = self._gather(videos, "hist")
+        if hists is None:
+            raise HTTPException(
+                status_code=HTTPStatus.NOT_FOUND,
+                detail="No color histograms for these results, rebuild the color tables",
+            )
+        similarity = histogram_similarity(hists, query, req.method)
+        # frames without a histogram never match the colour query
+        similarity[missing] = 0.0
+        if missing.any():
+            logger.warning(f"{int(missing.sum())} results have no color histogram")
 
-        for idx, record in enumerate(cycled):
+        scores = np.asarray([float(vm.score) for vm in videos], dtype=np.float32)
+        span = float(scores.max() - scores.min())
+        relevance = (scores - scores.min()) / span if span else np.ones_like(scores)
+        blended = (1.0 - req.weight) * relevance + req.weight * similarity
+
+        order = np.argsort(-blended, kind="stable")
+        if req.min_similarity is not None:
+            order = order[similarity[order] >= req.min_similarity]
+
+        ranked = [videos[i] for i in order]
+        for idx, record in enumerate(ranked):
             record.index = idx
 
         return APIResponse(
             status=HTTPStatus.OK.value,
-            message="Videos sorted by dominant color and cycled by top score",
-            data=cycled,
+            message=f"Videos reranked by color {req.method} similarity",
+            data=ranked,
         )
 
-    async def color_rerank_handler(
-        self, videos: List[VideoMetadata] = Body(...)
+    async def color_similarity_rerank_handler(
+        self, req: ColorSimilarityRequest = Body(...)
     ) -> APIResponse:
-        logger.info("color_rerank_handler invoked")
-        return await self.color_rerank(videos)
+        logger.info("color_similarity_rerank_handler invoked")
+        return await self.color_similarity_rerank(req)
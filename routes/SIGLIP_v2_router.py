@@ -37,6 +37,11 @@ def setup_router(handler: SIGLIPV2Handler) -> APIRouter:
         "/setup_database", endpoint=handler.setup_database_handler, methods=["GET"]
     )
 
+    # Attach the offline VLM captions (payload + caption index)
+    siglip_router.add_api_route(
+        "/setup_captions", endpoint=handler.setup_captions_handler, methods=["GET"]
+    )
+
     # # Preprocess text to feature
     # siglip_router.add_api_route(
     #     "/preprocess",
@@ -65,6 +70,27 @@ def setup_router(handler: SIGLIPV2Handler) -> APIRouter:
         methods=["POST"],
     )
 
+    # Image-based vector search, image as a multipart upload
+    siglip_router.add_api_route(
+        "/image_upload_search",
+        endpoint=handler.image_upload_search_handler,
+        methods=["POST"],
+    )
+
+    # Similar frames of a known keyframe, from its stored vector
+    siglip_router.add_api_route(
+        "/search_by_point",
+        endpoint=handler.search_by_point_handler,
+        methods=["POST"],
+    )
+
+    # Relevance feedback on stored vectors (Rocchio)
+    siglip_router.add_api_route(
+        "/feedback_search",
+        endpoint=handler.feedback_search_handler,
+        methods=["POST"],
+    )
+
     # Temporal (multi-segment) text search
     siglip_router.add_api_route(
         "/temporal_search",
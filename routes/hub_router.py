@@ -121,6 +121,13 @@ def setup_router(handler: HubHandler) -> APIRouter:
         "/rerank_color", endpoint=handler.rerank_color_handler, methods=["POST"]
     )
 
+    # Rerank by color histogram similarity to a palette or a reference frame.
+    hub_router.add_api_route(
+        "/rerank_color_similarity",
+        endpoint=handler.rerank_color_similarity_handler,
+        methods=["POST"],
+    )
+
     hub_router.add_api_route(
         "/send_img/{full_path:path}",
         endpoint=handler.send_img_handler,
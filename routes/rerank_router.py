@@ -37,6 +37,12 @@ def setup_router(handler: RerankHandler) -> APIRouter:
         "/rerank_color", endpoint=handler.color_rerank_handler, methods=["POST"]
     )
 
+    rerank_router.add_api_route(
+        "/rerank_color_similarity",
+        endpoint=handler.color_similarity_rerank_handler,
+        methods=["POST"],
+    )
+
     logger.info("Rerank router setup successfully")
 
     logger.info("adding routers...")
@@ -7,3 +7,6 @@ class APIResponse(BaseModel):
     status: int
     message: str
     data: Optional[Any] = None
+    # pagination: cursor of a cached result list, offset of the next page
+    cursor: Optional[str] = None
+    next_page_offset: Optional[int] = None
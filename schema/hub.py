@@ -15,7 +15,10 @@ from pydantic import BaseModel, ConfigDict, Field
 
 
 class ImageQuery(BaseModel):
-    image_data: str  # base64
+    image_data: Optional[str] = None  # base64
+    # a known keyframe, searched by its stored vector instead of image_data
+    video_name: Optional[str] = None
+    frame_name: Optional[str] = None
     k: int = 100
     video_filter: Optional[str] = None
     s2t_filter: Optional[str] = None
@@ -25,6 +28,20 @@ class ImageQuery(BaseModel):
     return_object: bool = True
     frame_class_filter: bool = True
     skip_frames: List[Dict[str, str]] = Field(default_factory=list)
+    object_filter: List[Dict[str, Any]] = Field(default_factory=list)
+    s2t_query: Optional[str] = None
+    s2t_fusion: Literal["rrf", "weighted"] = "rrf"
+    s2t_weight: float = 0.3
+    caption_query: Optional[str] = None
+    caption_fusion: Literal["rrf", "weighted"] = "rrf"
+    caption_weight: float = 0.3
+    coarse_to_fine: bool = False
+    shot_k: Optional[int] = None
+    diversity: float = 0.0
+    max_per_video: Optional[int] = None
+    cursor: Optional[str] = None
+    offset: int = 0
+    page_size: Optional[int] = None
 
 
 #     # model_config = ConfigDict(arbitrary_types_allowed=True)
@@ -54,3 +71,7 @@ class ScrollQuery(BaseModel):
     return_object: bool = True
     frame_class_filter: bool = True
     skip_frames: List[Dict[str, str]] = Field(default_factory=list)
+    object_filter: List[Dict[str, Any]] = Field(default_factory=list)
+    next_page_offset: Optional[int] = None
+    # records already received from earlier pages: "index" of the first record
+    index_offset: int = 0
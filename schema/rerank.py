@@ -1,5 +1,5 @@
-from typing import List
-from pydantic import BaseModel, ConfigDict
+from typing import List, Literal, Optional
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class DetectedObject(BaseModel):
@@ -22,3 +22,21 @@ class VideoMetadata(BaseModel):
     frame_path: str
 
     model_config = ConfigDict(arbitrary_types_allowed=True)
+
+
+class FrameRef(BaseModel):
+    idx_folder: str
+    video_name: str
+    keyframe_id: str
+
+
+class ColorSimilarityRequest(BaseModel):
+    videos: List[VideoMetadata]
+    # query: a palette of RGB colours (optionally weighted) or a reference frame
+    palette: List[List[float]] = Field(default_factory=list)
+    palette_weights: Optional[List[float]] = None
+    reference: Optional[FrameRef] = None
+    method: Literal["intersection", "chi2"] = "intersection"
+    # 0: retrieval score only, 1: colour similarity only
+    weight: float = Field(0.5, ge=0, le=1)
+    min_similarity: Optional[float] = Field(None, ge=0, le=1)
@@ -2,6 +2,17 @@ from typing import Any, Optional, List, Literal, Union, Dict
 from pydantic import BaseModel, ConfigDict, Field
 
 
+class ObjectFilter(BaseModel):
+    label: str
+    min_count: int = 1
+    min_conf: Optional[float] = None
+    # fraction of the frame covered by one detection
+    min_area: Optional[float] = None
+    max_area: Optional[float] = None
+    # normalised [x1, y1, x2, y2], the detection centre must fall inside
+    region: Optional[List[float]] = None
+
+
 class QdrantRequest(BaseModel):
     k: int
     feat: Optional[Union[List[float], List[List[float]]]] = None
@@ -13,6 +24,9 @@ class QdrantRequest(BaseModel):
     return_object: bool = True
     frame_class_filter: bool = True
     skip_frames: List[Dict[str, str]] = Field(default_factory=list)
+    object_filter: List[ObjectFilter] = Field(default_factory=list)
+    # Qdrant scroll offset returned as next_page_offset by the previous page
+    next_page_offset: Optional[int] = None
 
 
 class RetrievalRequest(BaseModel):
@@ -25,4 +39,48 @@ class RetrievalRequest(BaseModel):
     return_object: bool = True
     frame_class_filter: bool = True
     skip_frames: List[Dict[str, str]] = Field(default_factory=list)
+    object_filter: List[ObjectFilter] = Field(default_factory=list)
+    # hybrid search: transcript text fused with the dense score
+    s2t_query: Optional[str] = None
+    s2t_fusion: Literal["rrf", "weighted"] = "rrf"
+    s2t_weight: float = Field(0.3, ge=0.0, le=1.0)
+    # caption search: offline VLM shot captions fused with the dense score
+    caption_query: Optional[str] = None
+    caption_fusion: Literal["rrf", "weighted"] = "rrf"
+    caption_weight: float = Field(0.3, ge=0.0, le=1.0)
+    # search the shot collection first, then keyframes of the top shot_k shots
+    # (single-stage search when s2t_filter or object_filter is set)
+    coarse_to_fine: bool = False
+    shot_k: Optional[int] = None
+    # MMR trade-off (0 = pure relevance) and cap of keyframes per video
+    diversity: float = Field(0.0, ge=0.0, le=1.0)
+    max_per_video: Optional[int] = Field(None, ge=1)
+    # pagination: with page_size the full result is cached under a cursor,
+    # later pages pass that cursor and an offset instead of searching again
+    cursor: Optional[str] = None
+    offset: int = Field(0, ge=0)
+    page_size: Optional[int] = Field(None, ge=1)
+    # search-time index parameters (None: defaults of the index profile)
+    hnsw_ef: Optional[int] = Field(None, ge=1)
+    rescore: Optional[bool] = None
+    oversampling: Optional[float] = Field(None, ge=1.0)
     # model_config = ConfigDict(arbitrary_types_allowed=True)
+
+
+class FeedbackRequest(RetrievalRequest):
+    # relevance feedback on stored vectors: point ids of good / bad results
+    positive_ids: List[int] = Field(default_factory=list)
+    negative_ids: List[int] = Field(default_factory=list)
+    # Rocchio weights of the text query (if any), positives and negatives
+    alpha: float = Field(1.0, ge=0.0)
+    beta: float = Field(0.75, ge=0.0)
+    gamma: float = Field(0.15, ge=0.0)
+    # leave the feedback points themselves out of the results
+    exclude_feedback: bool = True
+
+
+class PointSearchRequest(RetrievalRequest):
+    # a known keyframe: its point id, or its video and frame names
+    point_id: Optional[int] = None
+    video_name: Optional[str] = None
+    frame_name: Optional[str] = None
@@ -19,6 +19,7 @@ else:
     raise RuntimeError("Could not find 'SIU_Pumpking' in the path hierarchy.")
 
 from configs.METACLIP_configs import METACLIPConfig
+from configs.app import AppConfig
 from handlers.METACLIP_handler import METACLIPHandler
 from routes.METACLIP_router import setup_router
 from utils.logger import get_logger
@@ -32,7 +33,12 @@ logger = get_logger()
 
 # Engine
 model = METACLIP()
-qdrant = QDRANT(METACLIPConfig().METACLIP_DATABASE_NAME)
+qdrant = QDRANT(
+    METACLIPConfig().METACLIP_DATABASE_NAME,
+    s2t_index_path=AppConfig().S2T_INDEX_PATH,
+    caption_index_path=AppConfig().CAPTION_INDEX_PATH,
+    index_profile=AppConfig().QDRANT_INDEX_PROFILE,
+)
 
 app = setup_app()
 
@@ -4,9 +4,9 @@
 
 import os
 
-os.environ[
-    "TRANSFORMERS_CACHE"
-] = "/workspace/competitions/AIC_2025/SIU_Pumpking/data/weights"
+os.environ.setdefault(
+    "TRANSFORMERS_CACHE", "/workspace/competitions/AIC_2025/SIU_Pumpking/data/weights"
+)
 import numpy as np
 from tqdm import tqdm
 
@@ -23,84 +23,60 @@ else:
     raise RuntimeError("Could not find 'SIU_Pumpking' in the path hierarchy.")
 
 from engine.CLIPFeatureModel.siglip_model import SIGLIP
-
-os.environ["CUDA_DEVICE_ORDER"] = "PCI_BUS_ID"  # see issue #152
-os.environ["CUDA_VISIBLE_DEVICES"] = "2"
-
-
-model = SIGLIP()
-
-KEY_FRAME_PATH = "/dataset/KLTN/0/frames/autoshot/"
-FEATURE_PATH = "/dataset/KLTN/0/features/siglip/"
-
-
-def batch_0():
-    print("Starting")
-    for i in range(1, 13):
-        video_list_path = f"{KEY_FRAME_PATH}Keyframes_L{i:02d}/keyframes/"
-        print(video_list_path)
-        for video_name in os.listdir(video_list_path):
-            frame_list = video_list_path + video_name + "/"
-            video_feature = []
-            print(video_name)
-            for frame_name in tqdm(sorted(os.listdir(frame_list))):
-                if ".csv" in frame_name:
-                    continue
-                frame_path = frame_list + "/" + frame_name
-                frame_feature = model.get_image_features(frame_path)  #############
-                video_feature.append(frame_feature)
-            video_feature = np.array(video_feature)
-            np.save(FEATURE_PATH + video_name + ".npy", video_feature)
-
-
-batch_0()
-
-KEY_FRAME_PATH = "/dataset/KLTN/1/frames/autoshot/"
-FEATURE_PATH = "/dataset/KLTN/1/features/siglip/"
-
-
-def batch_1():
+from utils.feature_store import save_features
+
+
+def extract_video_features(model, frame_list, feature_file, dtype="float16"):
+    """
+    Encode every keyframe of one video folder (sorted by name) and save the
+    stacked features as a single npy file of dtype (float32, float16, or int8
+    with a per-vector scale sidecar, see utils/feature_store.py).
+    """
+    video_feature = []
+    for frame_name in tqdm(sorted(os.listdir(frame_list))):
+        if ".csv" in frame_name:
+            continue
+        frame_path = os.path.join(frame_list, frame_name)
+        frame_feature = model.get_image_features(frame_path)  #############
+        video_feature.append(frame_feature)
+    save_features(feature_file, np.array(video_feature), dtype)
+
+
+def batch_extract(model, key_frame_path, feature_path, lesson_range):
     print("Starting")
-    for i in range(13, 25):
-        video_list_path = f"{KEY_FRAME_PATH}Keyframes_L{i:02d}/keyframes/"
+    for i in lesson_range:
+        video_list_path = f"{key_frame_path}Keyframes_L{i:02d}/keyframes/"
         print(video_list_path)
         for video_name in os.listdir(video_list_path):
-            frame_list = video_list_path + video_name + "/"
-            video_feature = []
             print(video_name)
-            for frame_name in tqdm(sorted(os.listdir(frame_list))):
-                if ".csv" in frame_name:
-                    continue
-                frame_path = frame_list + "/" + frame_name
-                frame_feature = model.get_image_features(frame_path)  #############
-                video_feature.append(frame_feature)
-            video_feature = np.array(video_feature)
-            np.save(FEATURE_PATH + video_name + ".npy", video_feature)
-
-
-batch_1()
-
-KEY_FRAME_PATH = "/dataset/KLTN/2/frames/autoshot/"
-FEATURE_PATH = "/dataset/KLTN/2/features/siglip/"
-
-
-def batch_2():
-    print("Starting")
-    for i in range(25, 31):
-        video_list_path = f"{KEY_FRAME_PATH}Keyframes_L{i:02d}/keyframes/"
-        print(video_list_path)
-        for video_name in os.listdir(video_list_path):
-            frame_list = video_list_path + video_name + "/"
-            video_feature = []
-            print(video_name)
-            for frame_name in tqdm(sorted(os.listdir(frame_list))):
-                if ".csv" in frame_name:
-                    continue
-                frame_path = frame_list + "/" + frame_name
-                frame_feature = model.get_image_features(frame_path)  #############
-                video_feature.append(frame_feature)
-            video_feature = np.array(video_feature)
-            np.save(FEATURE_PATH + video_name + ".npy", video_feature)
-
-
-batch_2()
+            extract_video_features(
+                model,
+                video_list_path + video_name + "/",
+                feature_path + video_name + ".npy",
+            )
+
+
+if __name__ == "__main__":
+    os.environ["CUDA_DEVICE_ORDER"] = "PCI_BUS_ID"  # see issue #152
+    os.environ["CUDA_VISIBLE_DEVICES"] = "2"
+
+    model = SIGLIP()
+
+    batch_extract(
+        model,
+        "/dataset/KLTN/0/frames/autoshot/",
+        "/dataset/KLTN/0/features/siglip/",
+        range(1, 13),
+    )
+    batch_extract(
+        model,
+        "/dataset/KLTN/1/frames/autoshot/",
+        "/dataset/KLTN/1/features/siglip/",
+        range(13, 25),
+    )
+    batch_extract(
+        model,
+        "/dataset/KLTN/2/frames/autoshot/",
+        "/dataset/KLTN/2/features/siglip/",
+        range(25, 31),
+    )
@@ -1,8 +1,11 @@
 import os
 import json
+import tempfile
 from pathlib import Path
+from typing import Dict, List, Optional
 from transformers import AutoImageProcessor, DeformableDetrForObjectDetection
 import torch
+from torch.utils.data import DataLoader, Dataset
 from PIL import Image
 from tqdm import tqdm
 
@@ -17,6 +20,37 @@ def setup_environment(gpu_id: str = "0", cache_dir: str = None):
         os.environ["TRANSFORMERS_CACHE"] = cache_dir
 
 
+class FrameDataset(Dataset):
+    """
+    Keyframes to detect, as (video_name, frame_name, path) triples. Images are
+    decoded inside the DataLoader workers.
+    """
+
+    def __init__(self, frames: List[tuple]):
+        self.frames = frames
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, index):
+        video_name, frame_name, path = self.frames[index]
+        image = Image.open(path).convert("RGB")
+        return video_name, frame_name, image
+
+
+class DetrCollate:
+    """Run the image processor (resize / normalise / pad) in the loader workers."""
+
+    def __init__(self, processor):
+        self.processor = processor
+
+    def __call__(self, batch):
+        video_names, frame_names, images = zip(*batch)
+        inputs = self.processor(images=list(images), return_tensors="pt")
+        sizes = torch.tensor([image.size[::-1] for image in images])  # (height, width)
+        return list(video_names), list(frame_names), inputs, sizes
+
+
 class DeticHuggingFace:
     def __init__(
         self,
@@ -29,7 +63,36 @@ class DeticHuggingFace:
             model_name, use_fast=use_fast
         )
         self.model = DeformableDetrForObjectDetection.from_pretrained(model_name)
-        self.model.to(self.device)
+        self.model.to(self.device).eval()
+
+    def _to_detections(self, results) -> List[Dict]:
+        detections = []
+        for score, label, box in zip(
+            results["scores"].tolist(),
+            results["labels"].tolist(),
+            results["boxes"].tolist(),
+        ):
+            detections.append(
+                {
+                    "bbox": [round(x, 2) for x in box],
+                    "label": self.model.config.id2label[label],
+                    "score": round(score, 3),
+                }
+            )
+        return detections
+
+    @torch.inference_mode()
+    def predict_inputs(self, inputs, target_sizes, threshold: float = 0.5):
+        """
+        Run detection on an already processed batch and return one list of
+        detections per image.
+        """
+        inputs = inputs.to(self.device)
+        outputs = self.model(**inputs)
+        results = self.processor.post_process_object_detection(
+            outputs, target_sizes=target_sizes, threshold=threshold
+        )
+        return [self._to_detections(result) for result in results]
 
     def predict(self, image_path: str, threshold: float = 0.5):
         """
@@ -37,26 +100,93 @@ class DeticHuggingFace:
         Each detection is a dict with keys: bbox, label, score.
         """
         image = Image.open(image_path).convert("RGB")
-        inputs = self.processor(images=image, return_tensors="pt").to(self.device)
-        outputs = self.model(**inputs)
-
+        inputs = self.processor(images=image, return_tensors="pt")
         target_sizes = torch.tensor([image.size[::-1]])  # (height, width)
-        results = self.processor.post_process_object_detection(
-            outputs, target_sizes=target_sizes, threshold=threshold
-        )[0]
+        return self.predict_inputs(inputs, target_sizes, threshold)[0]
 
-        detections = []
-        for score, label, box in zip(
-            results["scores"], results["labels"], results["boxes"]
+
+def _write_json_atomic(data, out_file: Path):
+    out_file.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=out_file.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, out_file)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def stream_detect(
+    detic: DeticHuggingFace,
+    frames: List[tuple],
+    output_file_of,
+    threshold: float = 0.5,
+    batch_size: int = 16,
+    num_workers: int = 4,
+):
+    """
+    Detect objects over `frames` ((video_name, frame_name, path) triples,
+    grouped by video) in batches, and write each video's
+    { frame_name: [detections] } to output_file_of(video_name) as soon as its
+    last frame is done, so only one video's results are held in memory.
+    """
+    remaining = {}
+    for video_name, _, _ in frames:
+        remaining[video_name] = remaining.get(video_name, 0) + 1
+
+    loader = DataLoader(
+        FrameDataset(frames),
+        batch_size=batch_size,
+        num_workers=num_workers,
+        collate_fn=DetrCollate(detic.processor),
+        pin_memory=detic.device != "cpu",
+    )
+
+    pending: Dict[str, Dict[str, List]] = {}
+    for video_names, frame_names, inputs, sizes in tqdm(
+        loader, desc="Processing frames", unit="batch"
+    ):
+        batch_detections = detic.predict_inputs(inputs, sizes, threshold=threshold)
+        for video_name, frame_name, detections in zip(
+            video_names, frame_names, batch_detections
         ):
-            detections.append(
-                {
-                    "bbox": [round(x, 2) for x in box.tolist()],
-                    "label": self.model.config.id2label[label.item()],
-                    "score": round(score.item(), 3),
-                }
-            )
-        return detections
+            pending.setdefault(video_name, {})[frame_name] = detections
+            remaining[video_name] -= 1
+            if remaining[video_name] == 0:
+                out_file = Path(output_file_of(video_name))
+                _write_json_atomic(pending.pop(video_name), out_file)
+                print(f"Saved detections for '{video_name}' -> {out_file}")
+
+
+def detect_video(
+    detic: DeticHuggingFace,
+    frame_dir: Path,
+    output_file: Path,
+    threshold: float = 0.5,
+    batch_size: int = 16,
+    num_workers: int = 4,
+):
+    """
+    Detect objects in every .jpg frame of a single video folder and write
+    { frame_name: [detections] } to output_file.
+    """
+    video_name = Path(frame_dir).name
+    frames = [
+        (video_name, img_path.stem, str(img_path))
+        for img_path in sorted(Path(frame_dir).glob("*.jpg"))
+    ]
+    if not frames:
+        _write_json_atomic({}, Path(output_file))
+        return
+    stream_detect(
+        detic,
+        frames,
+        lambda _: output_file,
+        threshold=threshold,
+        batch_size=batch_size,
+        num_workers=num_workers,
+    )
 
 
 def batch_detect(
@@ -65,88 +195,63 @@ def batch_detect(
     threshold: float = 0.5,
     gpu_id: str = "0",
     cache_dir: str = None,
+    batch_size: int = 16,
+    num_workers: int = 4,
+    detic: Optional[DeticHuggingFace] = None,
 ):
     """
     Walk through input_dir, detect objects in each .jpg frame, and
     save results grouped by video name into JSON files under output_dir.
+    Videos that already have a JSON file in output_dir are skipped.
     """
     setup_environment(gpu_id, cache_dir)
-    detic = DeticHuggingFace()
+    detic = detic or DeticHuggingFace()
 
-    # Find all JPEG images recursively
-    image_paths = list(input_dir.rglob("*.jpg"))
+    # Find all JPEG images recursively, grouped by video
+    image_paths = sorted(input_dir.rglob("*.jpg"), key=lambda p: (p.parent.name, p.name))
     if not image_paths:
         print(f"No .jpg images found in {input_dir}")
         return
 
-    # Accumulate detections: video_name -> { frame_name: [detections] }
-    all_results = {}
-    # Progress bar over images
-    for img_path in tqdm(image_paths, desc="Processing frames", unit="frame"):
-        video_name = img_path.parent.name  # e.g., L01_V001
-        frame_name = img_path.stem  # e.g., 00000
-
-        detections = detic.predict(str(img_path), threshold=threshold)
-
-        if video_name not in all_results:
-            all_results[video_name] = {}
-        all_results[video_name][frame_name] = detections
-
-    # Ensure output directory exists
-    output_dir.mkdir(parents=True, exist_ok=True)
-
-    # Write JSON per video with progress bar
-    for video_name, frames in tqdm(
-        all_results.items(), desc="Writing JSON", unit="video"
-    ):
-        out_file = output_dir / f"{video_name}.json"
-        with open(out_file, "w") as f:
-            json.dump(frames, f, indent=2)
-        print(f"Saved detections for '{video_name}' -> {out_file}")
-
-
-if __name__ == "__main__":
-    # === CONFIGURE YOUR PARAMETERS BELOW ===
-    input_dir = Path("/dataset/KLTN/0")
-    output_dir = Path("/dataset/KLTN/0/object_detection")
-    threshold = 0.3
-    gpu_id = "2"
-    cache_dir = "/workspace/competitions/AIC_2025/SIU_Pumpking/data/weights"
+    done = {p.stem for p in output_dir.glob("*.json")} if output_dir.exists() else set()
+    frames = [
+        (img_path.parent.name, img_path.stem, str(img_path))  # e.g. L01_V001, 00000
+        for img_path in image_paths
+        if img_path.parent.name not in done
+    ]
+    print(f"{len(done)} videos already done, {len(frames)} frames left")
+    if not frames:
+        return
 
-    batch_detect(
-        input_dir=input_dir,
-        output_dir=output_dir,
+    stream_detect(
+        detic,
+        frames,
+        lambda video_name: output_dir / f"{video_name}.json",
         threshold=threshold,
-        gpu_id=gpu_id,
-        cache_dir=cache_dir,
+        batch_size=batch_size,
+        num_workers=num_workers,
     )
 
-    # === CONFIGURE YOUR PARAMETERS BELOW ===
-    input_dir = Path("/dataset/KLTN/1")
-    output_dir = Path("/dataset/KLTN/1/object_detection")
-    threshold = 0.3
-    gpu_id = "2"
-    cache_dir = "/workspace/competitions/AIC_2025/SIU_Pumpking/data/weights"
-
-    batch_detect(
-        input_dir=input_dir,
-        output_dir=output_dir,
-        threshold=threshold,
-        gpu_id=gpu_id,
-        cache_dir=cache_dir,
-    )
 
+if __name__ == "__main__":
     # === CONFIGURE YOUR PARAMETERS BELOW ===
-    input_dir = Path("/dataset/KLTN/2")
-    output_dir = Path("/dataset/KLTN/2/object_detection")
     threshold = 0.3
     gpu_id = "2"
     cache_dir = "/workspace/competitions/AIC_2025/SIU_Pumpking/data/weights"
+    batch_size = 16
+    num_workers = 8
 
-    batch_detect(
-        input_dir=input_dir,
-        output_dir=output_dir,
-        threshold=threshold,
-        gpu_id=gpu_id,
-        cache_dir=cache_dir,
-    )
+    setup_environment(gpu_id, cache_dir)
+    detic = DeticHuggingFace()
+
+    for batch in ["0", "1", "2"]:
+        batch_detect(
+            input_dir=Path(f"/dataset/KLTN/{batch}"),
+            output_dir=Path(f"/dataset/KLTN/{batch}/object_detection"),
+            threshold=threshold,
+            gpu_id=gpu_id,
+            cache_dir=cache_dir,
+            batch_size=batch_size,
+            num_workers=num_workers,
+            detic=detic,
+        )
@@ -1,6 +1,11 @@
 import os
+import time
+import shutil
+import argparse
+import tempfile
 import pathlib
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 from PIL import Image
 import pillow_avif
 from tqdm import tqdm  # Import tqdm
@@ -11,26 +16,188 @@ dataset_2 = "/dataset/KLTN/2/frames/autoshot/"
 # dataset_test = "/dataset/AIC2024/pumkin_dataset/2/frames/autoshot/"
 # low_res_path = "/dataset/AIC2023/pumkin_dataset/0/frames/low_res/"
 
+# Pillow format name and extension of the optional fallback thumbnail
+FALLBACK_FORMATS = {"webp": ("WEBP", ".webp"), "jpeg": ("JPEG", ".jpg")}
 
-def compress_image_folder(high_res_path):
-    images = list(Path(high_res_path).glob("**/*.jpg"))
-    for image in tqdm(images, desc=f"Compressing {high_res_path}"):
-        if not image.is_file():
-            continue
-        image = str(image)
-        picture = Image.open(image)
-        low_res_folder = Path(image.replace("autoshot", "low_res_autoshot")).parents[0]
-        low_res_folder.mkdir(parents=True, exist_ok=True)
-        low_res_image = str(image).replace("autoshot", "low_res_autoshot")
-        picture.save(
-            str(low_res_image).replace(".jpg", ".avif"),
-            "AVIF",
-            optimize=True,
-            quality=10,
+
+def _is_up_to_date(source, target):
+    return os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(
+        source
+    )
+
+
+def _atomic_save(picture, target, format, **kwargs):
+    """Encode into a temp file next to target and rename it into place."""
+    target = Path(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(
+        dir=target.parent, prefix=f".{target.stem}.", suffix=target.suffix
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            picture.save(f, format, **kwargs)
+        os.replace(tmp_path, target)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def compress_image(
+    image_path,
+    low_res_image_path,
+    quality=10,
+    max_edge=None,
+    fallback_format=None,
+    fallback_quality=60,
+    force=False,
+):
+    """
+    Write the AVIF thumbnail of one keyframe (and optionally a WebP / JPEG
+    fallback next to it). Outputs newer than the source are left alone.
+    Returns True if anything was encoded.
+    """
+    targets = [(str(low_res_image_path), "AVIF", {"optimize": True, "quality": quality})]
+    if fallback_format:
+        pil_format, extension = FALLBACK_FORMATS[fallback_format]
+        targets.append(
+            (
+                os.path.splitext(str(low_res_image_path))[0] + extension,
+                pil_format,
+                {"quality": fallback_quality},
+            )
         )
+    if not force:
+        targets = [t for t in targets if not _is_up_to_date(image_path, t[0])]
+    if not targets:
+        return False
+
+    with Image.open(image_path) as picture:
+        if max_edge:
+            # Let the JPEG decoder downscale (DCT scaling) before resampling
+            picture.draft("RGB", (max_edge, max_edge))
+            picture = picture.convert("RGB")
+            picture.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+        else:
+            picture = picture.convert("RGB")
+        for target, pil_format, kwargs in targets:
+            _atomic_save(picture, target, pil_format, **kwargs)
+    return True
+
+
+def _compress_job(job):
+    image_path, low_res_image_path, kwargs = job
+    return compress_image(image_path, low_res_image_path, **kwargs)
+
 
+def low_res_path_of(image, high_res_path, low_res_path=None):
+    """Map .../autoshot/<rel>.jpg to .../low_res_autoshot/<rel>.avif."""
+    if low_res_path is None:
+        return str(image).replace("autoshot", "low_res_autoshot").replace(".jpg", ".avif")
+    relative = Path(image).relative_to(high_res_path)
+    return str(Path(low_res_path) / relative.with_suffix(".avif"))
 
-compress_image_folder(dataset_0)
-compress_image_folder(dataset_1)
-compress_image_folder(dataset_2)
-# compress_image_folder(dataset_test)
+
+def compress_image_folder(
+    high_res_path,
+    low_res_path=None,
+    workers=None,
+    quality=10,
+    max_edge=None,
+    fallback_format=None,
+    force=False,
+):
+    """
+    Build the AVIF thumbnails of every .jpg under high_res_path with a pool of
+    `workers` processes (default: every core). Returns
+    {"images", "encoded", "seconds", "images_per_second"}.
+    """
+    images = sorted(str(image) for image in Path(high_res_path).glob("**/*.jpg"))
+    kwargs = {
+        "quality": quality,
+        "max_edge": max_edge,
+        "fallback_format": fallback_format,
+        "force": force,
+    }
+    jobs = [
+        (image, low_res_path_of(image, high_res_path, low_res_path), kwargs)
+        for image in images
+    ]
+    workers = workers or os.cpu_count() or 1
+
+    start = time.perf_counter()
+    encoded = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunksize = max(1, min(64, len(jobs) // (workers * 4) or 1))
+        for done in tqdm(
+            executor.map(_compress_job, jobs, chunksize=chunksize),
+            total=len(jobs),
+            desc=f"Compressing {high_res_path}",
+        ):
+            encoded += int(done)
+    seconds = time.perf_counter() - start
+    return {
+        "images": len(jobs),
+        "encoded": encoded,
+        "seconds": round(seconds, 3),
+        "images_per_second": round(encoded / seconds, 2) if seconds else 0.0,
+    }
+
+
+def benchmark(high_res_path, worker_counts=None, limit=500, **kwargs):
+    """
+    Encode the first `limit` keyframes of high_res_path into a scratch folder
+    with 1, 4 and all cores and report images/second for each.
+    """
+    cpu_count = os.cpu_count() or 1
+    worker_counts = worker_counts or sorted({1, min(4, cpu_count), cpu_count})
+    images = sorted(Path(high_res_path).glob("**/*.jpg"))[:limit]
+
+    results = {}
+    with tempfile.TemporaryDirectory() as scratch:
+        sample_dir = Path(scratch) / "sample"
+        for index, image in enumerate(images):
+            sample = sample_dir / f"{index:06d}.jpg"
+            sample.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy(image, sample)
+        for workers in worker_counts:
+            output_dir = Path(scratch) / f"out_{workers}"
+            results[workers] = compress_image_folder(
+                sample_dir, output_dir, workers=workers, force=True, **kwargs
+            )
+            print(
+                f"workers={workers}: {results[workers]['images_per_second']} images/s"
+            )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build low-res AVIF keyframes")
+    parser.add_argument("paths", nargs="*", default=[dataset_0, dataset_1, dataset_2])
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--quality", type=int, default=10)
+    parser.add_argument("--max-edge", type=int, default=None)
+    parser.add_argument("--fallback", choices=list(FALLBACK_FORMATS), default=None)
+    parser.add_argument("--force", action="store_true")
+    parser.add_argument("--benchmark", action="store_true")
+    args = parser.parse_args()
+
+    for path in args.paths:
+        if args.benchmark:
+            benchmark(
+                path,
+                quality=args.quality,
+                max_edge=args.max_edge,
+                fallback_format=args.fallback,
+            )
+            continue
+        print(
+            compress_image_folder(
+                path,
+                workers=args.workers,
+                quality=args.quality,
+                max_edge=args.max_edge,
+                fallback_format=args.fallback,
+                force=args.force,
+            )
+        )
+    # compress_image_folder(dataset_test)
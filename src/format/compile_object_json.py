@@ -6,8 +6,24 @@ import glob
 from collections import defaultdict
 from tqdm import tqdm
 
+from pathlib import Path
+import sys
 
-def aggregate_detections(root_dir, save_every=100, output_file="total_json.json"):
+current_path = Path(__file__).resolve()
+for parent in current_path.parents:
+    if parent.name == "SIU_Pumpking":
+        #print(f"Adding {parent} to sys.path")
+        sys.path.append(str(parent))
+        break
+else:
+    raise RuntimeError("Could not find 'SIU_Pumpking' in the path hierarchy.")
+
+from utils.object_store import ObjectStoreWriter
+
+
+def aggregate_detections(
+    root_dir, save_every=100, output_file="total_json.json", json_files=None
+):
     """
     Traverse all object_detection JSON files under root_dir, collect detections by label,
     and periodically save aggregated results sorted by confidence.
@@ -16,13 +32,16 @@ def aggregate_detections(root_dir, save_every=100, output_file="total_json.json"
         root_dir (str): Base dataset directory (e.g., '/dataset/KLTN').
         save_every (int): Number of files to process before each intermediate save.
         output_file (str): Path for the final aggregated JSON output.
+        json_files (list, optional): Explicit list of per-video JSON files; when
+            given, root_dir is not scanned.
     """
     # Container for all detections, keyed by label
     detections = defaultdict(list)
 
     # Pattern matching all JSON files under */object_detection
-    pattern = os.path.join(root_dir, "*", "object_detection", "*.json")
-    json_files = glob.glob(pattern)
+    if json_files is None:
+        pattern = os.path.join(root_dir, "*", "object_detection", "*.json")
+        json_files = glob.glob(pattern)
 
     # Iterate with progress bar
     for idx, json_path in enumerate(tqdm(json_files, desc="Processing JSON files")):
@@ -61,6 +80,35 @@ def aggregate_detections(root_dir, save_every=100, output_file="total_json.json"
     save_aggregated(detections, output_file)
 
 
+def compile_object_store(root_dir, output_dir, json_files=None):
+    """
+    Stream every per-video object_detection JSON under root_dir into a
+    columnar object store (see utils/object_store.py) at output_dir. Only one
+    video's detections are held in memory at a time.
+
+    Args:
+        root_dir (str): Base dataset directory (e.g., '/dataset/KLTN').
+        output_dir (str): Directory of the object store to (re)build.
+        json_files (list, optional): Explicit list of per-video JSON files; when
+            given, root_dir is not scanned.
+    """
+    if json_files is None:
+        pattern = os.path.join(root_dir, "*", "object_detection", "*.json")
+        json_files = glob.glob(pattern)
+
+    with ObjectStoreWriter(output_dir) as writer:
+        for json_path in tqdm(sorted(json_files), desc="Building object store"):
+            try:
+                writer.add_json(json_path)
+            except Exception as e:
+                print(f"Warning: could not load {json_path}: {e}")
+
+    print(
+        f"Saved object store to {output_dir} ({writer.rows} detections, "
+        f"{len(writer.videos)} videos, {len(writer.labels)} labels)"
+    )
+
+
 def save_aggregated(detections, output_file):
     """
     Sort entries for each label by descending confidence and serialize to JSON.
@@ -81,6 +129,10 @@ def save_aggregated(detections, output_file):
 
 if __name__ == "__main__":
     ROOT_DIR = "/dataset/AIC2024/pumkin_dataset/Vinh"
-    OUTPUT_FILE = os.path.join(ROOT_DIR, "total_json.json")
-    # You can adjust save_every as needed (e.g., 500, 1000, 2000)
-    aggregate_detections(ROOT_DIR, save_every=1000, output_file=OUTPUT_FILE)
+    OUTPUT_DIR = os.path.join(ROOT_DIR, "object_store")
+    # OBJECT_PATH can point to this directory instead of total_json.json
+    compile_object_store(ROOT_DIR, OUTPUT_DIR)
+
+    # Legacy label-keyed JSON, only needed by older tooling
+    # OUTPUT_FILE = os.path.join(ROOT_DIR, "total_json.json")
+    # aggregate_detections(ROOT_DIR, save_every=1000, output_file=OUTPUT_FILE)
@@ -16,9 +16,6 @@ for parent in current_path.parents:
 else:
     raise RuntimeError("Could not find 'SIU_Pumpking' in the path hierarchy.")
 
-os.environ["CUDA_DEVICE_ORDER"] = "PCI_BUS_ID"  # see issue #152
-os.environ["CUDA_VISIBLE_DEVICES"] = "2"
-
 from engine.shot_boundary_detection.Shot_Detection.shot_detecion_selector import (
     ShotDetection,
 )
@@ -28,10 +25,8 @@ from engine.shot_boundary_detection.Shot_Detection.io_setup import (
     CutKeyFrameLoader,
 )
 
-model = ShotDetection("autoshot")
-
 
-def split_video_into_frame(input_dir, output_folder):
+def split_video_into_frame(model, input_dir, output_folder):
 
     all_video_paths = setup_video_path(input_dir)
 
@@ -47,14 +42,43 @@ def split_video_into_frame(input_dir, output_folder):
     keyframe_handler.extract_keyframes(all_video_paths)
 
 
-split_video_into_frame(
-    "/dataset/AIC2024/original_dataset/0/videos", "/dataset/KLTN/0/frames/autoshot"
-)
+def split_single_video(model, video_id, video_path, scene_json_dir, keyframe_dir):
+    """
+    Detect the shots of a single video and extract its keyframes straight into
+    keyframe_dir with zero-padded names (00000.jpg), the layout expected by
+    the rest of the pipeline, so no renaming pass is needed afterwards.
+    """
+    prediction_scenes = model.run_model(video_path_dict={video_id: video_path})
 
-split_video_into_frame(
-    "/dataset/AIC2024/original_dataset/1/videos", "/dataset/KLTN/1/frames/autoshot"
-)
+    os.makedirs(scene_json_dir, exist_ok=True)
+    json_handling = SceneJsonLoader(prediction_scenes, scene_json_dir)
+    json_handling.save_results()
 
-split_video_into_frame(
-    "/dataset/AIC2024/original_dataset/2/videos", "/dataset/KLTN/2/frames/autoshot"
-)
+    keyframe_handler = CutKeyFrameLoader(
+        scene_json_dir, keyframe_dir, frame_name_format="{:05d}.jpg"
+    )
+    keyframe_handler.process_video(
+        video_id, video_path, os.path.join(scene_json_dir, video_id), keyframe_dir
+    )
+
+
+if __name__ == "__main__":
+    os.environ["CUDA_DEVICE_ORDER"] = "PCI_BUS_ID"  # see issue #152
+    os.environ["CUDA_VISIBLE_DEVICES"] = "2"
+
+    model = ShotDetection("autoshot")
+
+    split_video_into_frame(
+        model,
+        "/dataset/AIC2024/original_dataset/0/videos", "/dataset/KLTN/0/frames/autoshot"
+    )
+
+    split_video_into_frame(
+        model,
+        "/dataset/AIC2024/original_dataset/1/videos", "/dataset/KLTN/1/frames/autoshot"
+    )
+
+    split_video_into_frame(
+        model,
+        "/dataset/AIC2024/original_dataset/2/videos", "/dataset/KLTN/2/frames/autoshot"
+    )
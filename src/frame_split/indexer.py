@@ -60,26 +60,42 @@ def indexing(dataset_path, output_file, entire=True, entire_folder=None):
             ujson.dump(index_dict, outfile, indent=4)
 
 
-# indexing(dataset_test_path,
-#          output_file="/workspace/competitions/AIC_2024/SIU_Pumpkin/base_2023/SIU_Pumpkin/utils/feature_extraction/index_test/index_test.json")
-
-indexing(
-    dataset_0_autoshot_path,
-    output_file="/dataset/KLTN/0/index/index_autoshot_0.json",
-    entire=False,
-    entire_folder="/dataset/KLTN/0/index",
-)
-
-indexing(
-    dataset_1_autoshot_path,
-    output_file="/dataset/KLTN/1/index/index_autoshot_1.json",
-    entire=False,
-    entire_folder="/dataset/KLTN/1/index",
-)
-
-indexing(
-    dataset_2_autoshot_path,
-    output_file="/dataset/KLTN/2/index/index_autoshot_2.json",
-    entire=False,
-    entire_folder="/dataset/KLTN/2/index",
-)
+def index_video(video_folder, output_file):
+    """
+    Write the {frame: position} index of a single keyframe folder, the same
+    per-video json produced by indexing(..., entire=False).
+    """
+    list_image = sorted(
+        str(pathlib.PurePath(image).stem) for image in Path(video_folder).glob("*.jpg")
+    )
+    save_dict = OrderedDict()
+    for position, item in enumerate(list_image):
+        save_dict[int(item)] = position
+    with open(output_file, "w") as outfile:
+        ujson.dump(save_dict, outfile, indent=4)
+
+
+if __name__ == "__main__":
+    # indexing(dataset_test_path,
+    #          output_file="/workspace/competitions/AIC_2024/SIU_Pumpkin/base_2023/SIU_Pumpkin/utils/feature_extraction/index_test/index_test.json")
+
+    indexing(
+        dataset_0_autoshot_path,
+        output_file="/dataset/KLTN/0/index/index_autoshot_0.json",
+        entire=False,
+        entire_folder="/dataset/KLTN/0/index",
+    )
+
+    indexing(
+        dataset_1_autoshot_path,
+        output_file="/dataset/KLTN/1/index/index_autoshot_1.json",
+        entire=False,
+        entire_folder="/dataset/KLTN/1/index",
+    )
+
+    indexing(
+        dataset_2_autoshot_path,
+        output_file="/dataset/KLTN/2/index/index_autoshot_2.json",
+        entire=False,
+        entire_folder="/dataset/KLTN/2/index",
+    )
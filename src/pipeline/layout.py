@@ -0,0 +1,98 @@
+import os
+from pathlib import Path
+from typing import Dict
+
+
+class BatchLayout:
+    """
+    On-disk layout of one dataset batch, mirroring the folders the offline
+    scripts have always written to:
+
+        <output_root>/frames/<split>/Keyframes_Lxx/keyframes/Lxx_Vyyy/00000.jpg
+        <output_root>/frames/low_res_<split>/Keyframes_Lxx/keyframes/Lxx_Vyyy/00000.avif
+        <output_root>/frames/<split>/SceneJson/Lxx_Vyyy.json
+        <output_root>/index/Lxx_Vyyy.json
+        <output_root>/features/siglip/Lxx_Vyyy.npy
+        <output_root>/features/siglip_shard/
+        <output_root>/object_detection/Lxx_Vyyy.json
+        <output_root>/object_store/
+        <output_root>/speech_to_text/Lxx_Vyyy.json
+    """
+
+    def __init__(self, video_root: str, output_root: str, split_name: str = "autoshot"):
+        self.video_root = os.path.abspath(video_root)
+        self.output_root = os.path.abspath(output_root)
+        self.split_name = split_name
+        self.video_paths: Dict[str, str] = {}
+
+    def discover(self) -> Dict[str, str]:
+        """Find every .mp4 under video_root and remember {video_id: video_path}."""
+        self.video_paths = {
+            file.stem: str(file)
+            for file in sorted(Path(self.video_root).glob("**/*.mp4"))
+            if file.is_file()
+        }
+        return self.video_paths
+
+    def video_path(self, video: str) -> str:
+        if video in self.video_paths:
+            return self.video_paths[video]
+        group = video.split("_")[0]
+        return os.path.join(self.video_root, f"Videos_{group}", "video", f"{video}.mp4")
+
+    def scene_json_dir(self) -> str:
+        return os.path.join(self.output_root, "frames", self.split_name, "SceneJson")
+
+    def keyframe_dir(self, video: str) -> str:
+        group = video.split("_")[0]
+        return os.path.join(
+            self.output_root,
+            "frames",
+            self.split_name,
+            f"Keyframes_{group}",
+            "keyframes",
+            video,
+        )
+
+    def low_res_dir(self, video: str) -> str:
+        group = video.split("_")[0]
+        return os.path.join(
+            self.output_root,
+            "frames",
+            f"low_res_{self.split_name}",
+            f"Keyframes_{group}",
+            "keyframes",
+            video,
+        )
+
+    def index_file(self, video: str) -> str:
+        return os.path.join(self.output_root, "index", f"{video}.json")
+
+    def feature_file(self, video: str) -> str:
+        return os.path.join(self.output_root, "features", "siglip", f"{video}.npy")
+
+    def feature_shard_dir(self) -> str:
+        return os.path.join(self.output_root, "features", "siglip_shard")
+
+    def object_file(self, video: str) -> str:
+        return os.path.join(self.output_root, "object_detection", f"{video}.json")
+
+    def object_store_dir(self) -> str:
+        return os.path.join(self.output_root, "object_store")
+
+    def transcript_dir(self) -> str:
+        return os.path.join(self.output_root, "speech_to_text")
+
+    def transcript_file(self, video: str) -> str:
+        return os.path.join(self.transcript_dir(), f"{video}.json")
+
+    def aligned_transcript_file(self, video: str) -> str:
+        return os.path.join(self.transcript_dir(), "segmented", f"{video}.json")
+
+    def transcript_total_file(self) -> str:
+        return os.path.join(
+            self.transcript_dir(), "transcript_all_autoshot_segmented.json"
+        )
+
+    def fps_file(self) -> str:
+        return os.path.join(self.output_root, "fps", "video_fps.json")
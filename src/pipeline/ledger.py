@@ -0,0 +1,91 @@
+import os
+import hashlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import ujson
+
+
+def _iter_files(path: str) -> Iterable[str]:
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                yield os.path.join(root, name)
+    elif os.path.exists(path):
+        yield path
+
+
+def fingerprint(paths: Iterable[str], params: Optional[Dict] = None) -> str:
+    """
+    Digest of a task's inputs: every input file (directories are walked) is
+    folded in as (path, size, mtime_ns) together with the stage parameters,
+    so editing a source file, adding a keyframe or changing a threshold all
+    change the digest. Missing inputs are folded in as such.
+    """
+    digest = hashlib.sha1()
+    digest.update(ujson.dumps(params or {}, sort_keys=True).encode("utf-8"))
+    for path in sorted(paths):
+        if not os.path.exists(path):
+            digest.update(f"{path}\0missing\n".encode("utf-8"))
+            continue
+        for file in _iter_files(path):
+            stat = os.stat(file)
+            digest.update(
+                f"{file}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode("utf-8")
+            )
+    return digest.hexdigest()
+
+
+class IngestLedger:
+    """
+    Append-only JSONL ledger of completed pipeline tasks. Each line records
+    the (stage, key) of a task, the fingerprint of its inputs and the outputs
+    it produced; the last line for a (stage, key) wins. A task is up to date
+    when its current input fingerprint matches the ledger and all recorded
+    outputs still exist.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[Tuple[str, str], Dict] = {}
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.isfile(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = ujson.loads(line)
+                except ValueError:
+                    # A line cut short by an interrupted run
+                    continue
+                self.entries[(entry["stage"], entry["key"])] = entry
+
+    def compact(self) -> None:
+        """Rewrite the ledger keeping only the latest entry per task."""
+        if not self.entries:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in self.entries.values():
+                f.write(ujson.dumps(entry) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def is_fresh(self, stage: str, key: str, digest: str) -> bool:
+        entry = self.entries.get((stage, key))
+        if entry is None or entry["digest"] != digest:
+            return False
+        return all(os.path.exists(path) for path in entry["outputs"])
+
+    def record(self, stage: str, key: str, digest: str, outputs: List[str]) -> None:
+        entry = {"stage": stage, "key": key, "digest": digest, "outputs": outputs}
+        self.entries[(stage, key)] = entry
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(ujson.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
@@ -0,0 +1,123 @@
+"""
+Ingest one dataset batch end to end:
+
+    python src/pipeline/run_ingest.py \
+        --video-root /dataset/AIC2024/original_dataset/0/videos \
+        --output-root /dataset/KLTN/0
+
+Defaults come from configs/ingest.py (INGEST_* environment variables).
+Re-running the same command resumes: tasks whose inputs did not change since
+they last succeeded are skipped.
+"""
+
+import os
+import argparse
+import ast
+
+from pathlib import Path
+import sys
+
+current_path = Path(__file__).resolve()
+for parent in current_path.parents:
+    if parent.name == "SIU_Pumpking":
+        #print(f"Adding {parent} to sys.path")
+        sys.path.append(str(parent))
+        break
+else:
+    raise RuntimeError("Could not find 'SIU_Pumpking' in the path hierarchy.")
+
+from configs.ingest import IngestConfig
+from src.pipeline.layout import BatchLayout
+from src.pipeline.ledger import IngestLedger
+from src.pipeline.runner import IngestRunner
+from src.pipeline.stages import STAGES
+from utils.logger import get_logger
+
+logger = get_logger()
+
+
+def parse_args(config: IngestConfig):
+    parser = argparse.ArgumentParser(description="SIU_Pumpking batch ingestion")
+    parser.add_argument("--video-root", default=config.INGEST_VIDEO_ROOT)
+    parser.add_argument("--output-root", default=config.INGEST_OUTPUT_ROOT)
+    parser.add_argument("--split-name", default=config.INGEST_SPLIT_NAME)
+    parser.add_argument(
+        "--stages",
+        default=",".join(config.INGEST_STAGES or list(STAGES)),
+        help=f"comma separated subset of {','.join(STAGES)}",
+    )
+    parser.add_argument(
+        "--videos",
+        default="",
+        help="comma separated video ids (default: all); batch stages still "
+        "compile the outputs of every video of the batch",
+    )
+    parser.add_argument(
+        "--workers",
+        default="{}",
+        help="per-stage pool sizes as a python dict, e.g. \"{'thumbnails': 16}\"",
+    )
+    parser.add_argument("--force", action="store_true", help="ignore the ledger")
+    parser.add_argument(
+        "--dry-run", action="store_true", help="only report what would run"
+    )
+    return parser.parse_args()
+
+
+def main():
+    config = IngestConfig()
+    args = parse_args(config)
+
+    for name, value in [("--video-root", args.video_root), ("--output-root", args.output_root)]:
+        if not value:
+            raise ValueError(f"{name} must be given (or set in the environment)")
+    if not os.path.isdir(args.video_root):
+        raise NotADirectoryError(f"video root '{args.video_root}' does not exist")
+    os.makedirs(args.output_root, exist_ok=True)
+
+    layout = BatchLayout(args.video_root, args.output_root, args.split_name)
+    videos = list(layout.discover())
+    if args.videos:
+        selected = set(args.videos.split(","))
+        videos = [video for video in videos if video in selected]
+
+    workers = dict(config.INGEST_WORKERS)
+    workers.update(ast.literal_eval(args.workers))
+
+    ledger = IngestLedger(os.path.join(args.output_root, config.INGEST_LEDGER_NAME))
+    ledger.compact()
+
+    runner = IngestRunner(
+        layout,
+        ledger,
+        stage_names=[name for name in args.stages.split(",") if name],
+        workers=workers,
+        devices=config.INGEST_DEVICES,
+        params={
+            "object_threshold": config.INGEST_OBJECT_THRESHOLD,
+            "object_batch_size": config.INGEST_OBJECT_BATCH_SIZE,
+            "object_loader_workers": config.INGEST_OBJECT_LOADER_WORKERS,
+            "speech_batch_size": config.INGEST_SPEECH_BATCH_SIZE,
+            "speech_beam_width": config.INGEST_SPEECH_BEAM_WIDTH,
+            "speech_decode_workers": config.INGEST_SPEECH_DECODE_WORKERS,
+            "feature_dtype": config.INGEST_FEATURE_DTYPE,
+            "avif_quality": config.INGEST_AVIF_QUALITY,
+            "thumbnail_max_edge": config.INGEST_THUMBNAIL_MAX_EDGE,
+            "thumbnail_fallback": config.INGEST_THUMBNAIL_FALLBACK,
+        },
+        cache_dir=config.TRANSFORMERS_CACHE,
+        force=args.force,
+    )
+
+    if args.dry_run:
+        for name, counts in runner.plan(videos).items():
+            logger.info(f"{name}: {counts['todo']} to run, {counts['fresh']} up to date")
+        return
+
+    stats = runner.run(videos)
+    if stats["failed"] or stats["blocked"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
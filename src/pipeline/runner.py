@@ -0,0 +1,186 @@
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+
+from pathlib import Path
+import sys
+
+current_path = Path(__file__).resolve()
+for parent in current_path.parents:
+    if parent.name == "SIU_Pumpking":
+        #print(f"Adding {parent} to sys.path")
+        sys.path.append(str(parent))
+        break
+else:
+    raise RuntimeError("Could not find 'SIU_Pumpking' in the path hierarchy.")
+
+from src.pipeline.layout import BatchLayout
+from src.pipeline.ledger import IngestLedger, fingerprint
+from src.pipeline.stages import BATCH, BATCH_KEY, STAGES, VIDEO, init_worker, run_task
+from utils.logger import get_logger
+
+logger = get_logger()
+
+Task = Tuple[str, str]
+
+
+class IngestRunner:
+    """
+    Schedule the ingestion DAG over a batch of videos.
+
+    Every stage owns its own process pool, so tasks of different stages run
+    at the same time (AVIF encoding of one video overlaps feature extraction
+    of another). A task is submitted as soon as its own dependencies are done;
+    before submitting, its input fingerprint is checked against the ledger and
+    the task is skipped when nothing changed. A failing task only blocks its
+    downstream tasks for the same video.
+    """
+
+    def __init__(
+        self,
+        layout: BatchLayout,
+        ledger: IngestLedger,
+        stage_names: List[str],
+        workers: Dict[str, int],
+        devices: Dict[str, str],
+        params: Dict,
+        cache_dir: Optional[str] = None,
+        force: bool = False,
+    ):
+        unknown = [name for name in stage_names if name not in STAGES]
+        if unknown:
+            raise ValueError(f"Unknown stages {unknown}, expected some of {list(STAGES)}")
+        # Keep registry (topological) order whatever order the caller used
+        self.stage_names = [name for name in STAGES if name in stage_names]
+        self.layout = layout
+        self.ledger = ledger
+        self.workers = workers
+        self.devices = devices
+        self.params = params
+        self.cache_dir = cache_dir
+        self.force = force
+
+    def _tasks(self, videos: List[str]) -> List[Task]:
+        tasks = []
+        for name in self.stage_names:
+            if STAGES[name].kind == VIDEO:
+                tasks.extend((name, video) for video in videos)
+            else:
+                tasks.append((name, BATCH_KEY))
+        return tasks
+
+    def _dep_tasks(self, task: Task, videos: List[str]) -> List[Task]:
+        """Upstream tasks of `task`, restricted to the stages being run."""
+        name, key = task
+        tasks = []
+        for dep in STAGES[name].deps:
+            if dep not in self.stage_names:
+                continue
+            if STAGES[dep].kind == BATCH:
+                tasks.append((dep, BATCH_KEY))
+            elif STAGES[name].kind == BATCH:
+                tasks.extend((dep, video) for video in videos)
+            else:
+                tasks.append((dep, key))
+        return tasks
+
+    def _digest(self, task: Task) -> str:
+        name, key = task
+        stage = STAGES[name]
+        params = {
+            "stage": name,
+            "version": stage.version,
+            "params": {key: self.params.get(key) for key in stage.params},
+        }
+        return fingerprint(stage.inputs(self.layout, key), params)
+
+    def _executor(self, name: str) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers.get(name, 1),
+            # spawn so that CUDA is initialised cleanly in every worker
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+            initargs=(
+                name,
+                self.devices.get(name) if STAGES[name].gpu else None,
+                self.cache_dir,
+                self.params,
+            ),
+        )
+
+    def plan(self, videos: List[str]) -> Dict[str, Dict[str, int]]:
+        """Count, per stage, how many tasks are up to date without running anything."""
+        summary = {}
+        for task in self._tasks(videos):
+            counts = summary.setdefault(task[0], {"fresh": 0, "todo": 0})
+            fresh = not self.force and self.ledger.is_fresh(
+                task[0], task[1], self._digest(task)
+            )
+            counts["fresh" if fresh else "todo"] += 1
+        return summary
+
+    def run(self, videos: List[str]) -> Dict[str, int]:
+        pending = self._tasks(videos)
+        dep_tasks = {task: self._dep_tasks(task, videos) for task in pending}
+        done, failed = set(), set()
+        running: Dict[Future, Tuple[Task, str]] = {}
+        executors: Dict[str, ProcessPoolExecutor] = {}
+        stats = {"done": 0, "skipped": 0, "failed": 0, "blocked": 0}
+
+        logger.info(
+            f"Ingesting {len(videos)} videos with stages {self.stage_names} "
+            f"({len(pending)} tasks)"
+        )
+        try:
+            while pending or running:
+                still_pending = []
+                for task in pending:
+                    deps = dep_tasks[task]
+                    if any(dep in failed for dep in deps):
+                        failed.add(task)
+                        stats["blocked"] += 1
+                        logger.warning(f"Skipping {task}: an upstream task failed")
+                        continue
+                    if not all(dep in done for dep in deps):
+                        still_pending.append(task)
+                        continue
+
+                    digest = self._digest(task)
+                    if not self.force and self.ledger.is_fresh(task[0], task[1], digest):
+                        done.add(task)
+                        stats["skipped"] += 1
+                        continue
+
+                    if task[0] not in executors:
+                        executors[task[0]] = self._executor(task[0])
+                    future = executors[task[0]].submit(
+                        run_task, task[0], self.layout, task[1], self.params
+                    )
+                    running[future] = (task, digest)
+                pending = still_pending
+
+                if not running:
+                    if pending:
+                        logger.error(f"{len(pending)} tasks can never become ready")
+                    break
+
+                finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    task, digest = running.pop(future)
+                    try:
+                        outputs = future.result()
+                    except Exception as e:
+                        failed.add(task)
+                        stats["failed"] += 1
+                        logger.exception(f"Task {task} failed: {e}")
+                        continue
+                    self.ledger.record(task[0], task[1], digest, outputs)
+                    done.add(task)
+                    stats["done"] += 1
+                    logger.info(f"Finished {task}")
+        finally:
+            for executor in executors.values():
+                executor.shutdown(wait=True, cancel_futures=True)
+
+        logger.info(f"Ingestion finished: {stats}")
+        return stats
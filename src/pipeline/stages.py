@@ -0,0 +1,380 @@
+import os
+import json
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from pathlib import Path
+import sys
+
+current_path = Path(__file__).resolve()
+for parent in current_path.parents:
+    if parent.name == "SIU_Pumpking":
+        #print(f"Adding {parent} to sys.path")
+        sys.path.append(str(parent))
+        break
+else:
+    raise RuntimeError("Could not find 'SIU_Pumpking' in the path hierarchy.")
+
+from src.pipeline.layout import BatchLayout
+
+# Heavy model imports stay inside the loaders / runners below so that the
+# scheduler process never touches CUDA and each worker only imports what its
+# stage needs.
+
+VIDEO = "video"
+BATCH = "batch"
+BATCH_KEY = "*"
+
+
+class Stage:
+    """
+    One node of the ingestion DAG.
+
+    kind == VIDEO stages run once per video, kind == BATCH stages run once
+    per batch after every video task of their dependencies has finished.
+    `load` (optional) builds the model once per worker process, `run`
+    executes a task with it. `inputs`/`outputs` return the paths used for the
+    ledger fingerprint and the completion check; `params` lists the runner
+    params the stage reads, the only ones that go into its fingerprint.
+
+    BATCH stages compile batch-wide artifacts, so they always read the
+    outputs of every video of the layout, not only the videos being run:
+    outputs already on disk for the other videos are kept in the compile.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        kind: str,
+        deps: List[str],
+        inputs: Callable[[BatchLayout, str], List[str]],
+        outputs: Callable[[BatchLayout, str], List[str]],
+        run: Callable[[Any, BatchLayout, str, Dict], None],
+        load: Optional[Callable[[Dict], Any]] = None,
+        params: Optional[List[str]] = None,
+        gpu: bool = False,
+        version: int = 1,
+    ):
+        self.name = name
+        self.kind = kind
+        self.deps = deps
+        self.inputs = inputs
+        self.outputs = outputs
+        self.run = run
+        self.load = load
+        self.params = params or []
+        self.gpu = gpu
+        self.version = version
+
+
+# ---------------------------------------------------------------- shots ----
+def _load_shots(params):
+    from engine.shot_boundary_detection.Shot_Detection.shot_detecion_selector import (
+        ShotDetection,
+    )
+
+    return ShotDetection("autoshot")
+
+
+def _run_shots(model, layout, video, params):
+    from src.frame_split.autoshot import split_single_video
+
+    split_single_video(
+        model,
+        video,
+        layout.video_path(video),
+        layout.scene_json_dir(),
+        layout.keyframe_dir(video),
+    )
+
+
+# ----------------------------------------------------------- thumbnails ----
+def _run_thumbnails(model, layout, video, params):
+    from src.format.avif_compress import compress_image
+
+    low_res_dir = layout.low_res_dir(video)
+    os.makedirs(low_res_dir, exist_ok=True)
+    for image in sorted(Path(layout.keyframe_dir(video)).glob("*.jpg")):
+        compress_image(
+            str(image),
+            os.path.join(low_res_dir, image.stem + ".avif"),
+            quality=params["avif_quality"],
+            max_edge=params["thumbnail_max_edge"] or None,
+            fallback_format=params["thumbnail_fallback"] or None,
+        )
+
+
+# ---------------------------------------------------------------- index ----
+def _run_index(model, layout, video, params):
+    from src.frame_split.indexer import index_video
+
+    os.makedirs(os.path.dirname(layout.index_file(video)), exist_ok=True)
+    index_video(layout.keyframe_dir(video), layout.index_file(video))
+
+
+# ------------------------------------------------------------- features ----
+def _load_features(params):
+    from engine.CLIPFeatureModel.siglip_model import SIGLIP
+
+    return SIGLIP()
+
+
+def _run_features(model, layout, video, params):
+    from src.feature_extraction.clip_feature_extract import extract_video_features
+
+    os.makedirs(os.path.dirname(layout.feature_file(video)), exist_ok=True)
+    extract_video_features(
+        model,
+        layout.keyframe_dir(video),
+        layout.feature_file(video),
+        dtype=params["feature_dtype"],
+    )
+
+
+def _run_features_shard(model, layout, key, params):
+    from utils.feature_store import build_feature_shard
+
+    build_feature_shard(
+        [
+            layout.feature_file(video)
+            for video in layout.video_paths
+            if os.path.isfile(layout.feature_file(video))
+        ],
+        layout.feature_shard_dir(),
+        dtype=params["feature_dtype"],
+    )
+
+
+# -------------------------------------------------------------- objects ----
+def _load_objects(params):
+    from src.feature_extraction.detic_object_extract import DeticHuggingFace
+
+    return DeticHuggingFace()
+
+
+def _run_objects(model, layout, video, params):
+    from src.feature_extraction.detic_object_extract import detect_video
+
+    detect_video(
+        model,
+        layout.keyframe_dir(video),
+        layout.object_file(video),
+        threshold=params["object_threshold"],
+        batch_size=params["object_batch_size"],
+        num_workers=params["object_loader_workers"],
+    )
+
+
+# --------------------------------------------------------------- speech ----
+def _load_speech(params):
+    from engine.speech_to_text.SpeechToText import SpeechToText
+
+    return SpeechToText(
+        beam_width=params["speech_beam_width"],
+        batch_size=params["speech_batch_size"],
+        decode_workers=params["speech_decode_workers"],
+    )
+
+
+def _run_speech(model, layout, video, params):
+    from engine.speech_to_text.speech_extraction import transcribe_video
+
+    transcribe_video(model, layout.video_path(video), layout.transcript_dir() + "/")
+
+
+def _load_speech_align(params):
+    from engine.speech_to_text.speech_frame_matching import PhoBERT
+
+    return PhoBERT()
+
+
+def _run_speech_align(model, layout, video, params):
+    from engine.speech_to_text.speech_frame_matching import align_video
+    from src.format.get_fps import get_fps
+
+    video_dict = align_video(
+        model.segmenter,
+        layout.transcript_file(video),
+        layout.keyframe_dir(video),
+        get_fps(layout.video_path(video)),
+    )
+    output_file = layout.aligned_transcript_file(video)
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    with open(output_file, "w", encoding="utf-8-sig") as outfile:
+        json.dump(video_dict, outfile, indent=4, ensure_ascii=False)
+
+
+# --------------------------------------------------------- batch stages ----
+def _run_fps(model, layout, key, params):
+    from src.format.get_fps import get_fps
+
+    total_dict = OrderedDict(
+        (video, get_fps(path)) for video, path in sorted(layout.video_paths.items())
+    )
+    os.makedirs(os.path.dirname(layout.fps_file()), exist_ok=True)
+    with open(layout.fps_file(), "w", encoding="utf-8-sig") as json_save:
+        json.dump(total_dict, json_save, indent=4, ensure_ascii=False)
+
+
+def _run_objects_compile(model, layout, key, params):
+    from src.format.compile_object_json import compile_object_store
+
+    json_files = [layout.object_file(video) for video in sorted(layout.video_paths)]
+    compile_object_store(
+        layout.output_root,
+        layout.object_store_dir(),
+        json_files=[path for path in json_files if os.path.isfile(path)],
+    )
+
+
+def _run_speech_compile(model, layout, key, params):
+    total_dict = OrderedDict()
+    for video in sorted(layout.video_paths):
+        aligned_file = layout.aligned_transcript_file(video)
+        if not os.path.isfile(aligned_file):
+            continue
+        with open(aligned_file, "r", encoding="utf-8-sig") as f:
+            total_dict[video + ".mp4"] = json.load(f)
+    with open(layout.transcript_total_file(), "w", encoding="utf-8-sig") as outfile:
+        json.dump(total_dict, outfile, indent=4, ensure_ascii=False)
+
+
+STAGES: Dict[str, Stage] = OrderedDict(
+    (stage.name, stage)
+    for stage in [
+        Stage(
+            "shots",
+            VIDEO,
+            deps=[],
+            inputs=lambda layout, video: [layout.video_path(video)],
+            outputs=lambda layout, video: [layout.keyframe_dir(video)],
+            run=_run_shots,
+            load=_load_shots,
+            gpu=True,
+        ),
+        Stage(
+            "thumbnails",
+            VIDEO,
+            deps=["shots"],
+            inputs=lambda layout, video: [layout.keyframe_dir(video)],
+            outputs=lambda layout, video: [layout.low_res_dir(video)],
+            run=_run_thumbnails,
+            params=["avif_quality", "thumbnail_max_edge", "thumbnail_fallback"],
+        ),
+        Stage(
+            "index",
+            VIDEO,
+            deps=["shots"],
+            inputs=lambda layout, video: [layout.keyframe_dir(video)],
+            outputs=lambda layout, video: [layout.index_file(video)],
+            run=_run_index,
+        ),
+        Stage(
+            "features",
+            VIDEO,
+            deps=["shots"],
+            inputs=lambda layout, video: [layout.keyframe_dir(video)],
+            outputs=lambda layout, video: [layout.feature_file(video)],
+            run=_run_features,
+            load=_load_features,
+            params=["feature_dtype"],
+            gpu=True,
+        ),
+        Stage(
+            "objects",
+            VIDEO,
+            deps=["shots"],
+            inputs=lambda layout, video: [layout.keyframe_dir(video)],
+            outputs=lambda layout, video: [layout.object_file(video)],
+            run=_run_objects,
+            load=_load_objects,
+            params=["object_threshold", "object_batch_size", "object_loader_workers"],
+            gpu=True,
+        ),
+        Stage(
+            "speech",
+            VIDEO,
+            deps=[],
+            inputs=lambda layout, video: [layout.video_path(video)],
+            outputs=lambda layout, video: [layout.transcript_file(video)],
+            run=_run_speech,
+            load=_load_speech,
+            params=["speech_beam_width", "speech_batch_size", "speech_decode_workers"],
+            gpu=True,
+        ),
+        Stage(
+            "speech_align",
+            VIDEO,
+            deps=["shots", "speech"],
+            inputs=lambda layout, video: [
+                layout.transcript_file(video),
+                layout.keyframe_dir(video),
+            ],
+            outputs=lambda layout, video: [layout.aligned_transcript_file(video)],
+            run=_run_speech_align,
+            load=_load_speech_align,
+        ),
+        Stage(
+            "fps",
+            BATCH,
+            deps=[],
+            inputs=lambda layout, key: sorted(layout.video_paths.values()),
+            outputs=lambda layout, key: [layout.fps_file()],
+            run=_run_fps,
+        ),
+        Stage(
+            "objects_compile",
+            BATCH,
+            deps=["objects"],
+            inputs=lambda layout, key: [
+                layout.object_file(video) for video in layout.video_paths
+            ],
+            outputs=lambda layout, key: [layout.object_store_dir()],
+            run=_run_objects_compile,
+        ),
+        Stage(
+            "features_shard",
+            BATCH,
+            deps=["features"],
+            inputs=lambda layout, key: [
+                layout.feature_file(video) for video in layout.video_paths
+            ],
+            outputs=lambda layout, key: [layout.feature_shard_dir()],
+            run=_run_features_shard,
+            params=["feature_dtype"],
+        ),
+        Stage(
+            "speech_compile",
+            BATCH,
+            deps=["speech_align"],
+            inputs=lambda layout, key: [
+                layout.aligned_transcript_file(video) for video in layout.video_paths
+            ],
+            outputs=lambda layout, key: [layout.transcript_total_file()],
+            run=_run_speech_compile,
+        ),
+    ]
+)
+
+
+# ------------------------------------------------------ worker process ----
+_WORKER_MODEL = None
+
+
+def init_worker(stage_name: str, device: Optional[str], cache_dir: str, params: Dict):
+    """Process pool initializer: pin the GPU and load the stage model once."""
+    global _WORKER_MODEL
+    os.environ["CUDA_DEVICE_ORDER"] = "PCI_BUS_ID"
+    if device is not None:
+        os.environ["CUDA_VISIBLE_DEVICES"] = str(device)
+    if cache_dir:
+        os.environ["TRANSFORMERS_CACHE"] = cache_dir
+    stage = STAGES[stage_name]
+    _WORKER_MODEL = stage.load(params) if stage.load else None
+
+
+def run_task(stage_name: str, layout: BatchLayout, key: str, params: Dict) -> List[str]:
+    """Execute one task inside a worker and return the outputs it produced."""
+    stage = STAGES[stage_name]
+    stage.run(_WORKER_MODEL, layout, key, params)
+    return stage.outputs(layout, key)
@@ -155,7 +155,9 @@ export function initSearchHandler() {
                 const imageUrlInput = document.getElementById('image-url');
 
                 if (imagePreview.src.startsWith('data:')) {
-                    fd.set('image_path', imagePreview.src);
+                    // send pasted / uploaded images as binary, not a base64 form field
+                    const blob = await (await fetch(imagePreview.src)).blob();
+                    fd.set('image', blob, 'query');
                 } else if (imageUrlInput.value) {
                     fd.set('image_path', imageUrlInput.value);
                 } else {
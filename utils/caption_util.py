@@ -0,0 +1,107 @@
+import os
+import ujson
+from typing import Dict, Iterator, List, Optional
+
+from pathlib import Path
+import sys
+
+current_path = Path(__file__).resolve()
+for parent in current_path.parents:
+    if parent.name == "SIU_Pumpking":
+        #print(f"Adding {parent} to sys.path")
+        sys.path.append(str(parent))
+        break
+else:
+    raise RuntimeError("Could not find 'SIU_Pumpking' in the path hierarchy.")
+
+from utils.logger import get_logger
+
+logger = get_logger()
+
+
+def caption_text(result: dict) -> str:
+    """
+    Searchable caption of one shot result of the VLM pipeline: its news
+    title and the description (with the on-screen text) of every event.
+    """
+    parts = []
+    title = result.get("title")
+    if title and not title.startswith("Lỗi:"):
+        parts.append(title.strip())
+    for event in result.get("localized_events") or []:
+        if isinstance(event, dict) and event.get("description"):
+            parts.append(str(event["description"]).strip())
+    return "\n".join(parts)
+
+
+def _read_results(path: str) -> List[dict]:
+    """results.jsonl of engine/VLMs/src/pipeline.py, or its exported JSON list."""
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            results = []
+            for line in f:
+                try:
+                    record = ujson.loads(line)
+                except ValueError:
+                    continue  # torn last line of an interrupted run
+                results.append(record["value"] if "value" in record else record)
+            return results
+        return ujson.load(f)
+
+
+def _shot_frame_range(shot_dir: str, video: str, shot_index: int, cache: Dict) -> Optional[tuple]:
+    """(first, last) frame of a shot from its shot JSON, for results written without them."""
+    if video not in cache:
+        shot_path = os.path.join(shot_dir, f"{video}.json")
+        try:
+            with open(shot_path, "r", encoding="utf-8") as f:
+                cache[video] = ujson.load(f)
+        except (OSError, ValueError):
+            cache[video] = None
+    shots = cache[video]
+    if not shots or shot_index >= len(shots):
+        return None
+    try:
+        frames = [int(Path(p).stem) for p in shots[shot_index].get("frames") or []]
+    except ValueError:
+        return None
+    return (min(frames), max(frames)) if frames else None
+
+
+def read_shot_captions(
+    CAPTION_PATH: List[str], SHOT_DIR: Optional[str] = None
+) -> Iterator[dict]:
+    """
+    {"video", "start_frame", "end_frame", "caption"} of every captioned shot
+    in the VLM pipeline results. Results without a frame range get it from
+    <SHOT_DIR>/<video>.json when SHOT_DIR is given, otherwise are skipped.
+    Later files win for a shot captioned twice.
+    """
+    shots = {}
+    shot_files = {}
+    for path in CAPTION_PATH:
+        for result in _read_results(path):
+            caption = caption_text(result)
+            if not caption:
+                continue
+            video = str(result["video"]).replace(".mp4", "")
+            start, end = result.get("start_frame"), result.get("end_frame")
+            if start is None or end is None:
+                frame_range = (
+                    _shot_frame_range(SHOT_DIR, video, int(result["shot_index"]), shot_files)
+                    if SHOT_DIR
+                    else None
+                )
+                if frame_range is None:
+                    logger.warning(
+                        f"No frame range for {video} shot #{result.get('shot_index')}, skipped"
+                    )
+                    continue
+                start, end = frame_range
+            shots[(video, result.get("shot_index"), start)] = {
+                "video": video,
+                "start_frame": int(start),
+                "end_frame": int(end),
+                "caption": caption,
+            }
+    yield from shots.values()
@@ -0,0 +1,308 @@
+import os
+import shutil
+import ujson
+import numpy as np
+from typing import List, Sequence, Tuple
+
+from pathlib import Path
+import sys
+
+current_path = Path(__file__).resolve()
+for parent in current_path.parents:
+    if parent.name == "SIU_Pumpking":
+        #print(f"Adding {parent} to sys.path")
+        sys.path.append(str(parent))
+        break
+else:
+    raise RuntimeError("Could not find 'SIU_Pumpking' in the path hierarchy.")
+
+# Consolidated dominant colours of one batch, next to the per-frame JSONs
+# (<color_dir>/Keyframes_Lxx/keyframes/Lxx_Vyyy/00000.json):
+#   <color_dir>/color_table/videos.json  video vocabulary, row video_id -> "L01_V001"
+#   <color_dir>/color_table/keys.npy     int64   (M,)   sorted (video_id << 32 | frame)
+#   <color_dir>/color_table/rgb.npy      float32 (M, 3) dominant colour, 0-255
+#   <color_dir>/color_table/hsv.npy      float32 (M, 3) HSV of rgb / 255
+#   <color_dir>/color_table/step.npy     int32   (M, 3) (hue, luminance, value) sort key
+#   <color_dir>/color_table/hist.npy     float16 (M, HIST_BINS) L1-normalised RGB
+#                                        histogram, tables built from images only
+TABLE_DIR = "color_table"
+STEP_REPETITIONS = 8
+HIST_LEVELS = 4  # bins per channel
+HIST_BINS = HIST_LEVELS**3
+
+
+def rgb_to_hsv(rgb) -> np.ndarray:
+    """colorsys.rgb_to_hsv over an (n, 3) array of channels in [0, 1]."""
+    rgb = np.asarray(rgb, dtype=np.float64).reshape(-1, 3)
+    r, g, b = rgb[:, 0], rgb[:, 1], rgb[:, 2]
+    maxc = rgb.max(axis=1)
+    minc = rgb.min(axis=1)
+    span = maxc - minc
+    safe_span = np.where(span == 0, 1.0, span)
+    rc = (maxc - r) / safe_span
+    gc = (maxc - g) / safe_span
+    bc = (maxc - b) / safe_span
+    h = np.where(r == maxc, bc - gc, np.where(g == maxc, 2.0 + rc - bc, 4.0 + gc - rc))
+    h = np.where(span == 0, 0.0, (h / 6.0) % 1.0)
+    s = np.where(span == 0, 0.0, span / np.where(maxc == 0, 1.0, maxc))
+    return np.stack([h, s, maxc], axis=1)
+
+
+def step_keys(rgb, repetitions: int = STEP_REPETITIONS) -> np.ndarray:
+    """
+    (hue, luminance, value) step sort keys of (n, 3) RGB colours in 0-255,
+    the key RerankHandler has always sorted dominant colours by.
+    """
+    rgb = np.asarray(rgb, dtype=np.float64).reshape(-1, 3)
+    lum = np.sqrt(0.241 * rgb[:, 0] + 0.691 * rgb[:, 1] + 0.068 * rgb[:, 2])
+    hsv = rgb_to_hsv(rgb / 255.0)
+    return np.stack(
+        [hsv[:, 0] * repetitions, lum * repetitions, hsv[:, 2] * repetitions], axis=1
+    ).astype(np.int32)
+
+
+def color_distance(rgb, target) -> np.ndarray:
+    """
+    "Redmean" weighted RGB distance of (n, 3) colours to one target colour,
+    a cheap approximation of perceptual distance.
+    """
+    rgb = np.asarray(rgb, dtype=np.float64).reshape(-1, 3)
+    target = np.asarray(target, dtype=np.float64)
+    rmean = (rgb[:, 0] + target[0]) / 2.0
+    dr, dg, db = (rgb - target).T
+    return np.sqrt(
+        (2.0 + rmean / 256.0) * dr**2 + 4.0 * dg**2 + (2.0 + (255.0 - rmean) / 256.0) * db**2
+    )
+
+
+def palette_histogram(colors, weights=None, levels: int = HIST_LEVELS) -> np.ndarray:
+    """
+    L1-normalised histogram of a colour palette ((n, 3) RGB in 0-255, with
+    optional weights), in the bins of the stored frame histograms.
+    """
+    colors = np.asarray(colors, dtype=np.float64).reshape(-1, 3)
+    weights = np.ones(len(colors)) if weights is None else np.asarray(weights, dtype=np.float64)
+    quantised = np.minimum((colors * (levels / 256.0)).astype(np.int64), levels - 1)
+    bins = (quantised[:, 0] * levels + quantised[:, 1]) * levels + quantised[:, 2]
+    hist = np.bincount(bins, weights=weights, minlength=levels**3)
+    return (hist / max(hist.sum(), 1e-12)).astype(np.float32)
+
+
+def histogram_similarity(hists, query, method: str = "intersection") -> np.ndarray:
+    """
+    Similarity in [0, 1] of (n, bins) L1-normalised histograms to one query
+    histogram: "intersection" sums the bin minima, "chi2" is 1 - the
+    symmetric chi-square distance 0.5 * sum((a - b)² / (a + b)).
+    """
+    hists = np.asarray(hists, dtype=np.float32)
+    query = np.asarray(query, dtype=np.float32)
+    if method == "intersection":
+        return np.minimum(hists, query).sum(axis=1)
+    if method == "chi2":
+        total = hists + query
+        diff = (hists - query) ** 2
+        chi2 = 0.5 * np.divide(diff, total, out=np.zeros_like(diff), where=total > 0).sum(axis=1)
+        return 1.0 - chi2
+    raise ValueError(f"Unknown histogram method '{method}', expected 'intersection' or 'chi2'")
+
+
+def _frame_key(video_id, frame):
+    return (np.asarray(video_id, dtype=np.int64) << 32) | np.asarray(frame, dtype=np.int64)
+
+
+def load_color_json(json_path: str) -> Tuple[float, float, float]:
+    """Dominant RGB of one per-frame colour JSON ({"rgb"} or a list of them)."""
+    with open(json_path, "r") as f:
+        color_data = ujson.load(f)
+    if isinstance(color_data, dict):
+        color_data = [color_data]
+    colors = [c["rgb"] for c in color_data if isinstance(c, dict) and "rgb" in c]
+    if not colors:
+        return (0.0, 0.0, 0.0)
+    keys = step_keys(colors)
+    return tuple(colors[int(np.lexsort(keys.T[::-1])[0])])
+
+
+class ColorTableWriter:
+    """
+    Build a colour table one video at a time. Rows are appended to raw column
+    files and every finished video is committed to a progress log, so an
+    interrupted build resumes after the last committed video (see done).
+    """
+
+    def __init__(self, output_dir: str, with_hist: bool = True, resume: bool = True):
+        self.output_dir = output_dir
+        self.tmp_dir = output_dir + ".tmp"
+        self.with_hist = with_hist
+        self.columns = {
+            "frame": (np.int32, ()),
+            "rgb": (np.float32, (3,)),
+        }
+        if with_hist:
+            self.columns["hist"] = (np.float16, (HIST_BINS,))
+        self.progress_path = os.path.join(self.tmp_dir, "progress.jsonl")
+
+        self.videos: List[str] = []
+        self.counts: List[int] = []
+        if resume and os.path.isfile(self.progress_path):
+            with open(self.progress_path, "r") as f:
+                for line in f:
+                    try:
+                        entry = ujson.loads(line)
+                    except ValueError:
+                        break  # torn last line
+                    self.videos.append(entry["video"])
+                    self.counts.append(int(entry["rows"]))
+            with open(self.progress_path, "w") as f:
+                for video, count in zip(self.videos, self.counts):
+                    f.write(ujson.dumps({"video": video, "rows": count}) + "\n")
+        else:
+            if os.path.isdir(self.tmp_dir):
+                shutil.rmtree(self.tmp_dir)
+            os.makedirs(self.tmp_dir)
+            open(self.progress_path, "w").close()
+
+        self._files = {}
+        for name, (dtype, shape) in self.columns.items():
+            raw_path = os.path.join(self.tmp_dir, f"{name}.bin")
+            # drop rows of a video that was being written when the build stopped
+            committed = self.rows * np.dtype(dtype).itemsize * int(np.prod(shape, dtype=np.int64))
+            with open(raw_path, "ab") as f:
+                f.truncate(committed)
+            self._files[name] = open(raw_path, "ab")
+        self._progress = open(self.progress_path, "a")
+
+    @property
+    def rows(self) -> int:
+        return int(sum(self.counts))
+
+    @property
+    def done(self) -> set:
+        return set(self.videos)
+
+    def add_video(self, video_name: str, frames, rgb, hist=None) -> None:
+        """Append and commit the colours of one video. Videos must be added only once."""
+        frames = np.asarray(frames, dtype=np.int32).reshape(-1)
+        columns = {"frame": frames, "rgb": np.asarray(rgb, dtype=np.float32).reshape(-1, 3)}
+        if self.with_hist:
+            if hist is None:
+                raise ValueError(f"{video_name}: this table stores histograms")
+            columns["hist"] = np.asarray(hist, dtype=np.float16).reshape(-1, HIST_BINS)
+        for name, values in columns.items():
+            if len(values) != len(frames):
+                raise ValueError(f"{video_name}: {name} has {len(values)} rows, expected {len(frames)}")
+            values.tofile(self._files[name])
+            self._files[name].flush()
+        self._progress.write(ujson.dumps({"video": video_name, "rows": len(frames)}) + "\n")
+        self._progress.flush()
+        self.videos.append(video_name)
+        self.counts.append(len(frames))
+
+    def _close_files(self) -> None:
+        for f in self._files.values():
+            f.close()
+        self._progress.close()
+
+    def close(self) -> int:
+        """Sort by (video, frame), derive HSV and step keys, swap the table in."""
+        self._close_files()
+        rows = self.rows
+        columns = {}
+        for name, (dtype, shape) in self.columns.items():
+            raw_path = os.path.join(self.tmp_dir, f"{name}.bin")
+            columns[name] = (
+                np.fromfile(raw_path, dtype=dtype).reshape((rows,) + shape)
+                if rows
+                else np.empty((0,) + shape, dtype=dtype)
+            )
+
+        # a video may have been re-added after a failed run: keep its last rows
+        video_names = sorted(set(self.videos))
+        video_index = {name: idx for idx, name in enumerate(video_names)}
+        last = {name: pos for pos, name in enumerate(self.videos)}
+        keep = np.repeat(
+            [last[name] == pos for pos, name in enumerate(self.videos)], self.counts
+        ).astype(bool)
+        video_ids = np.repeat([video_index[name] for name in self.videos], self.counts)
+
+        keys = _frame_key(video_ids, columns["frame"])[keep]
+        order = np.argsort(keys, kind="stable")
+        rgb = columns["rgb"][keep][order]
+        np.save(os.path.join(self.tmp_dir, "keys.npy"), keys[order])
+        np.save(os.path.join(self.tmp_dir, "rgb.npy"), rgb)
+        np.save(os.path.join(self.tmp_dir, "hsv.npy"), rgb_to_hsv(rgb / 255.0).astype(np.float32))
+        np.save(os.path.join(self.tmp_dir, "step.npy"), step_keys(rgb))
+        if self.with_hist:
+            np.save(os.path.join(self.tmp_dir, "hist.npy"), columns["hist"][keep][order])
+        with open(os.path.join(self.tmp_dir, "videos.json"), "w") as f:
+            ujson.dump(video_names, f)
+        del columns
+
+        for name in self.columns:
+            os.remove(os.path.join(self.tmp_dir, f"{name}.bin"))
+        os.remove(self.progress_path)
+        if os.path.isdir(self.output_dir):
+            shutil.rmtree(self.output_dir)
+        os.replace(self.tmp_dir, self.output_dir)
+        return len(rgb)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # keep the committed videos for the next run
+            self._close_files()
+
+
+def build_color_table(color_dir: str, output_dir: str = None) -> int:
+    """
+    Consolidate the per-frame colour JSONs of color_dir (the layout older
+    color_sort_gen runs wrote). Returns the row count.
+    """
+    output_dir = output_dir or os.path.join(color_dir, TABLE_DIR)
+    with ColorTableWriter(output_dir, with_hist=False, resume=False) as writer:
+        for video_dir in sorted(Path(color_dir).glob("Keyframes_*/keyframes/*")):
+            if not video_dir.is_dir():
+                continue
+            json_paths = sorted(video_dir.glob("*.json"))
+            writer.add_video(
+                video_dir.name,
+                [int(json_path.stem) for json_path in json_paths],
+                [load_color_json(str(json_path)) for json_path in json_paths],
+            )
+    return writer.rows
+
+
+class ColorTable:
+    """Read-only, memory-mapped view of a colour table directory."""
+
+    def __init__(self, table_dir: str):
+        self.table_dir = table_dir
+        load = lambda name: np.load(os.path.join(table_dir, f"{name}.npy"), mmap_mode="r")
+        self.keys = np.asarray(load("keys"))
+        self.rgb = load("rgb")
+        self.hsv = load("hsv")
+        self.step = load("step")
+        hist_path = os.path.join(table_dir, "hist.npy")
+        self.hist = np.load(hist_path, mmap_mode="r") if os.path.isfile(hist_path) else None
+        with open(os.path.join(table_dir, "videos.json")) as f:
+            self.videos: List[str] = ujson.load(f)
+        self.video_ids = {name: idx for idx, name in enumerate(self.videos)}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def rows(self, videos: Sequence[str], frames: Sequence[int]) -> np.ndarray:
+        """Row of every (video, frame) pair, -1 where the frame is missing."""
+        video_ids = np.fromiter(
+            (self.video_ids.get(video, -1) for video in videos), np.int64, len(videos)
+        )
+        keys = _frame_key(np.maximum(video_ids, 0), np.asarray(frames, dtype=np.int64))
+        pos = np.minimum(np.searchsorted(self.keys, keys), max(len(self.keys) - 1, 0))
+        if not len(self.keys):
+            return np.full(len(keys), -1, dtype=np.int64)
+        found = (video_ids >= 0) & (self.keys[pos] == keys)
+        return np.where(found, pos, -1)
@@ -0,0 +1,258 @@
+import os
+import shutil
+import ujson
+import numpy as np
+from typing import Iterable, List, Optional, Tuple
+
+from pathlib import Path
+import sys
+
+current_path = Path(__file__).resolve()
+for parent in current_path.parents:
+    if parent.name == "SIU_Pumpking":
+        #print(f"Adding {parent} to sys.path")
+        sys.path.append(str(parent))
+        break
+else:
+    raise RuntimeError("Could not find 'SIU_Pumpking' in the path hierarchy.")
+
+# Feature files come in two layouts, both read through open_features():
+#
+# per-video folder (output of the feature extraction stage)
+#   Lxx_Vyyy.npy        (n, dim) float32 / float16 / int8, one row per keyframe
+#   Lxx_Vyyy.scale.npy  float32 (n,) per-vector scale, int8 files only
+#
+# consolidated shard of one batch (build_feature_shard)
+#   manifest.json       {"version", "dtype", "dim", "count"}
+#   videos.json         video vocabulary, row video_id -> "L01_V001"
+#   features.npy        (N, dim) every vector of the batch, videos in order
+#   scale.npy           float32 (N,) per-vector scale, int8 shards only
+#   offsets.npy         int64 (V+1,) rows of video i are offsets[i]:offsets[i+1]
+FEATURE_DTYPES = ("float32", "float16", "int8")
+SHARD_VERSION = 1
+SCALE_SUFFIX = ".scale.npy"
+
+
+def quantize(features, dtype: str = "float16") -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    (values, scale) of float features (n, dim) stored as dtype. int8 uses a
+    symmetric per-vector scale (max |x| / 127), the other dtypes have no scale.
+    """
+    if dtype not in FEATURE_DTYPES:
+        raise ValueError(f"Unknown feature dtype '{dtype}', expected one of {FEATURE_DTYPES}")
+    features = np.asarray(features, dtype=np.float32)
+    features = features.reshape(-1, features.shape[-1]) if features.size else features.reshape(0, 0)
+    if dtype != "int8":
+        return features.astype(dtype), None
+    scale = np.abs(features).max(axis=1) / 127.0
+    scale[scale == 0] = 1.0
+    values = np.rint(features / scale[:, None]).astype(np.int8)
+    return values, scale.astype(np.float32)
+
+
+def dequantize(values, scale=None) -> np.ndarray:
+    """float32 copy of stored vectors (a slice of a memory map is enough)."""
+    vectors = np.asarray(values, dtype=np.float32)
+    if scale is not None:
+        vectors *= np.asarray(scale, dtype=np.float32)[:, None]
+    return vectors
+
+
+def save_features(feature_file: str, features, dtype: str = "float16") -> None:
+    """Save the features of one video, plus the scale sidecar for int8."""
+    values, scale = quantize(features, dtype)
+    np.save(feature_file, values)
+    scale_file = feature_file[: -len(".npy")] + SCALE_SUFFIX
+    if scale is not None:
+        np.save(scale_file, scale)
+    elif os.path.isfile(scale_file):
+        os.remove(scale_file)
+
+
+def load_features(feature_file: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Memory-mapped (values, scale) of one per-video feature file."""
+    values = np.load(feature_file, mmap_mode="r")
+    scale_file = feature_file[: -len(".npy")] + SCALE_SUFFIX
+    scale = np.load(scale_file, mmap_mode="r") if os.path.isfile(scale_file) else None
+    return values, scale
+
+
+class FeatureFolder:
+    """Per-video feature files of one folder, read lazily."""
+
+    def __init__(self, folder_path: str):
+        self.folder_path = folder_path
+        self.videos: List[str] = sorted(
+            name[: -len(".npy")]
+            for name in os.listdir(folder_path)
+            if name.endswith(".npy") and not name.endswith(SCALE_SUFFIX)
+        )
+
+    def __len__(self):
+        return len(self.videos)
+
+    def get(self, video: str) -> np.ndarray:
+        values, scale = load_features(os.path.join(self.folder_path, f"{video}.npy"))
+        return dequantize(values.reshape(-1, values.shape[-1]), scale)
+
+
+class FeatureShardWriter:
+    """
+    Build a consolidated feature shard one video at a time. Rows are appended
+    to raw files, so memory stays bounded by one video.
+    """
+
+    def __init__(self, output_dir: str, dtype: str = "float16"):
+        if dtype not in FEATURE_DTYPES:
+            raise ValueError(f"Unknown feature dtype '{dtype}', expected one of {FEATURE_DTYPES}")
+        self.output_dir = output_dir
+        self.tmp_dir = output_dir + ".tmp"
+        self.dtype = dtype
+        if os.path.isdir(self.tmp_dir):
+            shutil.rmtree(self.tmp_dir)
+        os.makedirs(self.tmp_dir)
+        self.videos: List[str] = []
+        self.offsets: List[int] = [0]
+        self.dim: Optional[int] = None
+        self._features = open(os.path.join(self.tmp_dir, "features.bin"), "wb")
+        self._scale = open(os.path.join(self.tmp_dir, "scale.bin"), "wb")
+
+    @property
+    def rows(self) -> int:
+        return self.offsets[-1]
+
+    def add_video(self, video_name: str, features, scale=None) -> None:
+        """
+        Append the features of one video. Already quantised values of the
+        shard dtype (and their scale) are copied as they are, anything else
+        is quantised first.
+        """
+        features = np.asarray(features)
+        if features.size and not (
+            features.dtype == np.dtype(self.dtype)
+            and (scale is not None) == (self.dtype == "int8")
+        ):
+            features, scale = quantize(dequantize(features, scale), self.dtype)
+        if features.size:
+            features = features.reshape(-1, features.shape[-1])
+            if self.dim is None:
+                self.dim = features.shape[1]
+            elif features.shape[1] != self.dim:
+                raise ValueError(
+                    f"{video_name}: feature size {features.shape[1]}, shard has {self.dim}"
+                )
+            features.tofile(self._features)
+            if scale is not None:
+                np.asarray(scale, dtype=np.float32).tofile(self._scale)
+        self.videos.append(video_name)
+        self.offsets.append(self.rows + (len(features) if features.size else 0))
+
+    def add_file(self, feature_file: str) -> None:
+        values, scale = load_features(feature_file)
+        self.add_video(os.path.basename(feature_file)[: -len(".npy")], values, scale)
+
+    def close(self) -> int:
+        """Finalise the shard, swap it in and return its row count."""
+        self._features.close()
+        self._scale.close()
+        dim = self.dim or 0
+
+        for name, dtype, shape in [
+            ("features", self.dtype, (self.rows, dim)),
+            ("scale", np.float32, (self.rows,)),
+        ]:
+            raw_path = os.path.join(self.tmp_dir, f"{name}.bin")
+            if name == "scale" and self.dtype != "int8":
+                os.remove(raw_path)
+                continue
+            if self.rows:
+                raw = np.memmap(raw_path, dtype=dtype, mode="r", shape=shape)
+            else:
+                raw = np.empty(shape, dtype=dtype)
+            np.save(os.path.join(self.tmp_dir, f"{name}.npy"), raw)
+            del raw
+            os.remove(raw_path)
+
+        np.save(os.path.join(self.tmp_dir, "offsets.npy"), np.asarray(self.offsets, dtype=np.int64))
+        with open(os.path.join(self.tmp_dir, "videos.json"), "w") as f:
+            ujson.dump(self.videos, f)
+        with open(os.path.join(self.tmp_dir, "manifest.json"), "w") as f:
+            ujson.dump(
+                {"version": SHARD_VERSION, "dtype": self.dtype, "dim": dim, "count": self.rows},
+                f,
+            )
+
+        if os.path.isdir(self.output_dir):
+            shutil.rmtree(self.output_dir)
+        os.replace(self.tmp_dir, self.output_dir)
+        return self.rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._features.close()
+            self._scale.close()
+            shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+def build_feature_shard(feature_files: Iterable[str], output_dir: str, dtype: str = "float16") -> int:
+    """Consolidate per-video feature files into one shard. Returns the row count."""
+    with FeatureShardWriter(output_dir, dtype) as writer:
+        for feature_file in sorted(feature_files):
+            writer.add_file(feature_file)
+    return writer.rows
+
+
+class FeatureShard:
+    """Read-only, memory-mapped view of a feature shard directory."""
+
+    def __init__(self, shard_dir: str):
+        self.shard_dir = shard_dir
+        with open(os.path.join(shard_dir, "manifest.json")) as f:
+            self.manifest = ujson.load(f)
+        if self.manifest.get("version") != SHARD_VERSION:
+            raise ValueError(
+                f"{shard_dir}: shard version {self.manifest.get('version')}, expected {SHARD_VERSION}"
+            )
+        self.dtype: str = self.manifest["dtype"]
+        self.dim: int = self.manifest["dim"]
+        self.features = np.load(os.path.join(shard_dir, "features.npy"), mmap_mode="r")
+        self.scale = (
+            np.load(os.path.join(shard_dir, "scale.npy"), mmap_mode="r")
+            if self.dtype == "int8"
+            else None
+        )
+        self.offsets = np.load(os.path.join(shard_dir, "offsets.npy"))
+        with open(os.path.join(shard_dir, "videos.json")) as f:
+            self.videos: List[str] = ujson.load(f)
+        self.video_ids = {name: idx for idx, name in enumerate(self.videos)}
+
+    def __len__(self):
+        return len(self.videos)
+
+    def rows(self, video: str) -> Tuple[int, int]:
+        """Row range [start, end) of the vectors of video."""
+        video_id = self.video_ids.get(video)
+        if video_id is None:
+            return 0, 0
+        return int(self.offsets[video_id]), int(self.offsets[video_id + 1])
+
+    def get(self, video: str) -> np.ndarray:
+        start, end = self.rows(video)
+        return dequantize(
+            self.features[start:end],
+            None if self.scale is None else self.scale[start:end],
+        )
+
+
+def is_feature_shard(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, "manifest.json"))
+
+
+def open_features(path: str):
+    """FeatureShard of a shard directory, FeatureFolder of a per-video folder."""
+    return FeatureShard(path) if is_feature_shard(path) else FeatureFolder(path)
@@ -0,0 +1,199 @@
+import math
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+from pathlib import Path
+import sys
+
+current_path = Path(__file__).resolve()
+for parent in current_path.parents:
+    if parent.name == "SIU_Pumpking":
+        #print(f"Adding {parent} to sys.path")
+        sys.path.append(str(parent))
+        break
+else:
+    raise RuntimeError("Could not find 'SIU_Pumpking' in the path hierarchy.")
+
+from utils.logger import get_logger
+
+logger = get_logger()
+
+# Qwen2.5-VL works on 14 px patches merged 2x2: frame sides are multiples of 28
+QWEN_VL_FACTOR = 28
+QWEN_VL_MIN_PIXELS = 56 * 56
+
+
+def unique_frames(frame_paths: Sequence[str]) -> List[str]:
+    """frame_paths without duplicates, in order of first occurrence."""
+    if len(frame_paths) == 0:
+        return []
+    paths = np.asarray(frame_paths, dtype=object)
+    _, first = np.unique(paths.astype(str), return_index=True)
+    return paths[np.sort(first)].tolist()
+
+
+def sample_frames_evenly(frame_paths: Sequence[str], max_frames: int = 40) -> List[str]:
+    """
+    Up to max_frames distinct frames spread evenly over the shot: always the
+    first and the last, the rest at linspace(1, n - 2) positions.
+    """
+    unique_paths = unique_frames(frame_paths)
+    n = len(unique_paths)
+    if n <= max_frames:
+        return unique_paths
+    indices = [0, n - 1]
+    if max_frames > 2:
+        indices.append(np.linspace(1, n - 2, num=max_frames - 2, dtype=int))
+    indices = np.unique(np.concatenate([np.atleast_1d(i) for i in indices]))
+    return [unique_paths[i] for i in indices]
+
+
+def target_size(
+    height: int,
+    width: int,
+    factor: int = QWEN_VL_FACTOR,
+    min_pixels: int = QWEN_VL_MIN_PIXELS,
+    max_pixels: Optional[int] = None,
+) -> Tuple[int, int]:
+    """
+    (height, width) the Qwen2.5-VL processor resizes a frame to (its
+    smart_resize): sides rounded to multiples of factor, area kept within
+    [min_pixels, max_pixels] with the aspect ratio preserved.
+    """
+    h = max(factor, round(height / factor) * factor)
+    w = max(factor, round(width / factor) * factor)
+    if max_pixels and h * w > max_pixels:
+        beta = math.sqrt(height * width / max_pixels)
+        h = max(factor, math.floor(height / beta / factor) * factor)
+        w = max(factor, math.floor(width / beta / factor) * factor)
+    elif h * w < min_pixels:
+        beta = math.sqrt(min_pixels / (height * width))
+        h = math.ceil(height * beta / factor) * factor
+        w = math.ceil(width * beta / factor) * factor
+    return h, w
+
+
+class FrameLoader:
+    """
+    Decode keyframes once, at the resolution the VLM processor would resize
+    them to, and keep the RGB arrays in an LRU bounded by cache_bytes. The
+    processor's own resize is then a no-op, and frames shared by several
+    calls (title frames, sampled event frames, reruns) are decoded once.
+    JPEGs are decoded in draft mode when the target is at most half size.
+
+    The shot JSONs list frames without extension: their suffix is replaced
+    by suffix (Path.with_suffix). Pass suffix=None for full paths.
+    """
+
+    def __init__(
+        self,
+        max_pixels: Optional[int] = None,
+        min_pixels: int = QWEN_VL_MIN_PIXELS,
+        factor: int = QWEN_VL_FACTOR,
+        workers: int = 16,
+        cache_bytes: int = 2 << 30,
+        suffix: Optional[str] = ".jpg",
+    ):
+        self.max_pixels = max_pixels
+        self.min_pixels = min_pixels
+        self.factor = factor
+        self.cache_bytes = cache_bytes
+        self.suffix = suffix
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def for_processor(cls, processor, max_pixels: Optional[int] = None, **kwargs) -> "FrameLoader":
+        """
+        Loader matching the resize of a Qwen2.5-VL processor (video processor
+        if there is one). max_pixels may lower the processor's bound, to cap
+        the number of visual tokens per frame.
+        """
+        frame_processor = getattr(processor, "video_processor", None) or processor.image_processor
+        size = getattr(frame_processor, "size", None) or {}
+        processor_max = getattr(frame_processor, "max_pixels", None) or size.get("longest_edge")
+        processor_min = getattr(frame_processor, "min_pixels", None) or size.get("shortest_edge")
+        if max_pixels and processor_max:
+            max_pixels = min(max_pixels, processor_max)
+        return cls(
+            max_pixels=max_pixels or processor_max,
+            min_pixels=processor_min or QWEN_VL_MIN_PIXELS,
+            factor=getattr(frame_processor, "patch_size", 14) * getattr(frame_processor, "merge_size", 2),
+            **kwargs,
+        )
+
+    def _resolve(self, path: str) -> str:
+        return str(Path(path).with_suffix(self.suffix)) if self.suffix else str(path)
+
+    def _decode(self, path: str) -> Optional[np.ndarray]:
+        try:
+            with Image.open(path) as image:
+                height, width = target_size(
+                    image.height,
+                    image.width,
+                    self.factor,
+                    self.min_pixels,
+                    self.max_pixels,
+                )
+                image.draft("RGB", (width, height))
+                image = image.convert("RGB")
+                if image.size != (width, height):
+                    image = image.resize((width, height), Image.BICUBIC)
+                return np.asarray(image)
+        except Exception as e:
+            logger.warning(f"Cannot load frame {path}: {e}")
+            return None
+
+    def load(self, path: str) -> Optional[np.ndarray]:
+        """RGB (h, w, 3) uint8 frame at the target resolution, None if unreadable."""
+        path = self._resolve(path)
+        with self._lock:
+            frame = self._cache.get(path)
+            if frame is not None:
+                self._cache.move_to_end(path)
+                self.hits += 1
+                return frame
+            self.misses += 1
+
+        frame = self._decode(path)
+        if frame is None:
+            return None
+        frame.setflags(write=False)  # shared between callers through the cache
+        with self._lock:
+            if path not in self._cache:
+                self._cache[path] = frame
+                self._cached_bytes += frame.nbytes
+            while self._cached_bytes > self.cache_bytes and len(self._cache) > 1:
+                _, evicted = self._cache.popitem(last=False)
+                self._cached_bytes -= evicted.nbytes
+        return frame
+
+    def load_many(self, frame_paths: Sequence[str]) -> List[np.ndarray]:
+        """Frames that could be loaded, in order, decoded by the worker pool."""
+        return [frame for frame in self._pool.map(self.load, frame_paths) if frame is not None]
+
+    def video(self, frame_paths: Sequence[str]) -> Optional[np.ndarray]:
+        """(n, h, w, 3) stack of the loadable frames, None if there are none."""
+        frames = self.load_many(frame_paths)
+        if not frames:
+            return None
+        height, width = frames[0].shape[:2]
+        frames = [
+            f
+            if f.shape[:2] == (height, width)
+            else np.asarray(Image.fromarray(f).resize((width, height), Image.BICUBIC))
+            for f in frames
+        ]
+        return np.stack(frames)
+
+    def close(self) -> None:
+        self._pool.shutdown()
@@ -0,0 +1,52 @@
+import io
+from typing import Optional
+
+from PIL import Image
+
+from pathlib import Path
+import sys
+
+current_path = Path(__file__).resolve()
+for parent in current_path.parents:
+    if parent.name == "SIU_Pumpking":
+        #print(f"Adding {parent} to sys.path")
+        sys.path.append(str(parent))
+        break
+else:
+    raise RuntimeError("Could not find 'SIU_Pumpking' in the path hierarchy.")
+
+# Query images only feed a model with a fixed input resolution (384 px for
+# SigLIP2, 224 / 378 px for MetaCLIP), so nothing above it is ever used: a 4K
+# paste-in is decoded at reduced scale and shrunk before it is sent anywhere.
+JPEG_QUALITY = 95
+
+
+def downscale(image: Image.Image, min_side: int) -> Image.Image:
+    """image shrunk so its short side is min_side, never enlarged."""
+    width, height = image.size
+    short = min(width, height)
+    if short <= min_side:
+        return image
+    size = (max(1, round(width * min_side / short)), max(1, round(height * min_side / short)))
+    return image.resize(size, Image.BICUBIC, reducing_gap=2.0)
+
+
+def decode_image(data: bytes, min_side: Optional[int] = None) -> Image.Image:
+    """
+    RGB image of encoded bytes. With min_side, JPEGs are decoded in draft
+    mode (DCT scaling to 1/2, 1/4 or 1/8, both sides kept >= min_side) and
+    the result is downscaled to a short side of min_side.
+    """
+    image = Image.open(io.BytesIO(data))
+    if min_side:
+        width, height = image.size
+        scale = max(min_side / width, min_side / height)
+        image.draft("RGB", (int(width * scale) + 1, int(height * scale) + 1))
+    image = image.convert("RGB")
+    return downscale(image, min_side) if min_side else image
+
+
+def encode_jpeg(image: Image.Image, quality: int = JPEG_QUALITY) -> bytes:
+    buffered = io.BytesIO()
+    image.save(buffered, format="JPEG", quality=quality)
+    return buffered.getvalue()
@@ -0,0 +1,278 @@
+import os
+import re
+import time
+import asyncio
+import hashlib
+import unicodedata
+import ujson
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import httpx
+import trafilatura
+from rank_bm25 import BM25Okapi
+
+from pathlib import Path
+import sys
+
+current_path = Path(__file__).resolve()
+for parent in current_path.parents:
+    if parent.name == "SIU_Pumpking":
+        #print(f"Adding {parent} to sys.path")
+        sys.path.append(str(parent))
+        break
+else:
+    raise RuntimeError("Could not find 'SIU_Pumpking' in the path hierarchy.")
+
+from utils.logger import get_logger
+
+logger = get_logger()
+
+# async (query, num_results) -> candidate URLs, replaceable by a fake in tests
+SearchProvider = Callable[[str, int], Awaitable[List[str]]]
+
+USER_AGENT = "Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)"
+
+
+async def google_search(query: str, num_results: int = 10) -> List[str]:
+    """googlesearch-python in a worker thread, so the event loop keeps running."""
+    from googlesearch import search
+
+    return await asyncio.to_thread(
+        lambda: list(search(query, num_results=num_results, lang="vi"))
+    )
+
+
+def extract_article(html: str) -> Optional[str]:
+    return trafilatura.extract(
+        html, favor_recall=True, include_comments=False, include_tables=False
+    )
+
+
+def remove_diacritics(text: str) -> str:
+    text = unicodedata.normalize("NFD", text.lower().replace("đ", "d"))
+    return "".join(c for c in text if unicodedata.category(c) != "Mn")
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in re.split(r"[^a-z0-9]+", remove_diacritics(text)) if t]
+
+
+def content_hash(content: str) -> str:
+    """Hash of the whitespace-normalised text: syndicated copies of one article match."""
+    return hashlib.sha1(" ".join(content.lower().split()).encode("utf-8")).hexdigest()
+
+
+def make_article(url: str, content: Optional[str]) -> dict:
+    return {
+        "url": url,
+        "content": content,
+        "content_hash": content_hash(content) if content else None,
+        "fetched_at": time.time(),
+    }
+
+
+class ArticleCache:
+    """
+    Cleaned articles on disk, one JSON file per URL, valid for ttl seconds.
+    Pages without extractable content are cached too (content None), so
+    they are not downloaded again before the TTL runs out.
+    """
+
+    def __init__(self, cache_dir: str, ttl: float = 7 * 24 * 3600):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+
+    def _path(self, url: str) -> str:
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, url: str) -> Optional[dict]:
+        path = self._path(url)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                article = ujson.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - article.get("fetched_at", 0) > self.ttl:
+            return None
+        return article
+
+    def set(self, url: str, article: dict) -> None:
+        path = self._path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            ujson.dump(article, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+class AsyncNewsCrawler:
+    """
+    Search -> BM25 rank of the candidate URLs -> concurrent fetch of the top
+    candidates. A crawl returns as soon as max_articles distinct acceptable
+    pages (at least min_chars of extracted text) are in, so its wall time is
+    set by the fastest acceptable page, and never exceeds deadline seconds.
+
+    Requests share one connection pool (max_connections) and at most
+    per_host requests run against one site at a time.
+    """
+
+    def __init__(
+        self,
+        search_provider: Optional[SearchProvider] = None,
+        allowed_sites: Optional[Iterable[str]] = None,
+        cache_dir: Optional[str] = None,
+        cache_ttl: float = 7 * 24 * 3600,
+        num_results: int = 10,
+        max_candidates: int = 5,
+        max_articles: int = 1,
+        min_chars: int = 300,
+        deadline: float = 30.0,
+        request_timeout: float = 10.0,
+        per_host: int = 2,
+        max_connections: int = 16,
+        search_retries: int = 3,
+        retry_backoff: float = 2.0,
+        verify: bool = True,
+        extract: Callable[[str], Optional[str]] = extract_article,
+    ):
+        self.search_provider = search_provider or google_search
+        self.allowed_sites = list(allowed_sites) if allowed_sites else None
+        self.cache = ArticleCache(cache_dir, cache_ttl) if cache_dir else None
+        self.num_results = num_results
+        self.max_candidates = max_candidates
+        self.max_articles = max_articles
+        self.min_chars = min_chars
+        self.deadline = deadline
+        self.request_timeout = request_timeout
+        self.per_host = per_host
+        self.max_connections = max_connections
+        self.search_retries = search_retries
+        self.retry_backoff = retry_backoff
+        self.verify = verify
+        self.extract = extract
+
+    # ------------------------------------------------------------ search
+
+    @staticmethod
+    def search_query(title: str, year: Optional[str] = None) -> str:
+        query = f'"{title}"'
+        return f"{query} năm: {year}" if year else query
+
+    def _allowed(self, url: str) -> bool:
+        if self.allowed_sites is None:
+            return True
+        netloc = urlparse(url).netloc
+        return any(site in netloc for site in self.allowed_sites)
+
+    async def search(self, title: str, year: Optional[str] = None) -> List[str]:
+        """Allowed candidate URLs, retried with backoff when the provider rate-limits."""
+        query = self.search_query(title, year)
+        for attempt in range(self.search_retries):
+            try:
+                urls = await self.search_provider(query, self.num_results)
+                break
+            except Exception as e:
+                if "429" not in str(e) or attempt == self.search_retries - 1:
+                    logger.error(f"Search failed for {query}: {e}")
+                    return []
+                delay = self.retry_backoff * 2**attempt
+                logger.warning(f"Search rate-limited, retrying in {delay:.0f}s")
+                await asyncio.sleep(delay)
+        return list(dict.fromkeys(url for url in urls if self._allowed(url)))
+
+    @staticmethod
+    def rank(title: str, urls: List[str]) -> List[str]:
+        """urls ordered by BM25 of their tokens against the title, best first."""
+        if len(urls) < 2:
+            return list(urls)
+        scores = BM25Okapi([tokenize(url) or [""] for url in urls]).get_scores(tokenize(title))
+        return [urls[i] for i in sorted(range(len(urls)), key=lambda i: -scores[i])]
+
+    # ------------------------------------------------------------- fetch
+
+    async def _fetch(self, client: httpx.AsyncClient, hosts, url: str) -> Optional[dict]:
+        try:
+            async with hosts[urlparse(url).netloc]:
+                response = await client.get(url)
+            response.raise_for_status()
+            content = await asyncio.to_thread(self.extract, response.text)
+        except Exception as e:
+            # network errors are not cached, the page may be back next time
+            logger.warning(f"Fetch failed for {url}: {e}")
+            return None
+        article = make_article(url, content)
+        if self.cache is not None:
+            self.cache.set(url, article)
+        return article
+
+    async def _crawl(self, client, hosts, title: str, year: Optional[str]) -> List[dict]:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline
+        try:
+            urls = await asyncio.wait_for(self.search(title, year), timeout=self.deadline)
+        except asyncio.TimeoutError:
+            logger.error(f"Search for {title} hit the {self.deadline}s deadline")
+            return []
+        candidates = self.rank(title, urls)[: self.max_candidates]
+
+        articles, seen = [], set()
+
+        def accept(article: Optional[dict]) -> bool:
+            """Keep an acceptable, not yet seen article; True once enough are kept."""
+            if article and article["content"] and len(article["content"]) >= self.min_chars:
+                if article["content_hash"] not in seen:
+                    seen.add(article["content_hash"])
+                    articles.append(article)
+            return len(articles) >= self.max_articles
+
+        # cached pages first, they cost nothing
+        to_fetch = []
+        for url in candidates:
+            cached = self.cache.get(url) if self.cache is not None else None
+            if cached is None:
+                to_fetch.append(url)
+            elif accept(cached):
+                return articles
+
+        pending = {asyncio.create_task(self._fetch(client, hosts, url)) for url in to_fetch}
+        try:
+            while pending:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    logger.warning(f"Crawl for {title} hit the {self.deadline}s deadline")
+                    break
+                done, pending = await asyncio.wait(
+                    pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if accept(task.result()):
+                        return articles
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        return articles
+
+    async def crawl_many(
+        self, queries: List[Tuple[str, Optional[str]]]
+    ) -> List[List[dict]]:
+        """Articles of every (title, year) query, crawled concurrently."""
+        hosts: Dict[str, asyncio.Semaphore] = defaultdict(
+            lambda: asyncio.Semaphore(self.per_host)
+        )
+        async with httpx.AsyncClient(
+            headers={"User-Agent": USER_AGENT},
+            timeout=self.request_timeout,
+            limits=httpx.Limits(max_connections=self.max_connections),
+            follow_redirects=True,
+            verify=self.verify,
+        ) as client:
+            return await asyncio.gather(
+                *(self._crawl(client, hosts, title, year) for title, year in queries)
+            )
+
+    async def crawl(self, title: str, year: Optional[str] = None) -> List[dict]:
+        return (await self.crawl_many([(title, year)]))[0]
@@ -0,0 +1,254 @@
+import os
+import shutil
+import ujson
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pathlib import Path
+import sys
+
+current_path = Path(__file__).resolve()
+for parent in current_path.parents:
+    if parent.name == "SIU_Pumpking":
+        #print(f"Adding {parent} to sys.path")
+        sys.path.append(str(parent))
+        break
+else:
+    raise RuntimeError("Could not find 'SIU_Pumpking' in the path hierarchy.")
+
+# Columnar layout of an object store directory:
+#   videos.json        video vocabulary, row video_id -> "L01_V001"
+#   labels.json        label vocabulary, row label_id -> "person"
+#   video_id.npy       int32  (N,)    one row per detection, sorted by (video, frame)
+#   frame.npy          int32  (N,)
+#   label_id.npy       int32  (N,)
+#   conf.npy           float32 (N,)
+#   bbox.npy           float32 (N, 4)
+#   keys.npy           int64  (M,)    (video_id << 32 | frame) of every frame with detections
+#   key_offsets.npy    int64  (M+1,)  rows of keys[i] are key_offsets[i]:key_offsets[i+1]
+#   label_rows.npy     int64  (N,)    row ids grouped by label, confidence descending
+#   label_offsets.npy  int64  (L+1,)  rows of label j are label_rows[label_offsets[j]:label_offsets[j+1]]
+COLUMNS = {
+    "video_id": (np.int32, ()),
+    "frame": (np.int32, ()),
+    "label_id": (np.int32, ()),
+    "conf": (np.float32, ()),
+    "bbox": (np.float32, (4,)),
+}
+
+
+def _frame_key(video_id, frame):
+    return (np.asarray(video_id, dtype=np.int64) << 32) | np.asarray(frame, dtype=np.int64)
+
+
+class ObjectStoreWriter:
+    """
+    Build an object store from per-video detection JSONs
+    ({frame_name: [{"label", "score", "bbox"}]}) one video at a time. Rows are
+    appended to raw column files, so memory stays bounded by one video.
+    """
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        self.tmp_dir = output_dir + ".tmp"
+        if os.path.isdir(self.tmp_dir):
+            shutil.rmtree(self.tmp_dir)
+        os.makedirs(self.tmp_dir)
+        self.videos: List[str] = []
+        self.labels: List[str] = []
+        self._label_ids: Dict[str, int] = {}
+        self._files = {
+            name: open(os.path.join(self.tmp_dir, f"{name}.bin"), "wb")
+            for name in COLUMNS
+        }
+        self.rows = 0
+
+    def _label_id(self, label: str) -> int:
+        if label not in self._label_ids:
+            self._label_ids[label] = len(self.labels)
+            self.labels.append(label)
+        return self._label_ids[label]
+
+    def add_video(self, video_name: str, frames: Dict[str, List[Dict]]) -> None:
+        """Append the detections of one video. Videos must be added only once."""
+        video_id = len(self.videos)
+        self.videos.append(video_name)
+
+        detections = [
+            (int(frame), obj)
+            for frame, objs in frames.items()
+            for obj in objs
+        ]
+        if not detections:
+            return
+        detections.sort(key=lambda item: item[0])
+
+        count = len(detections)
+        columns = {
+            "video_id": np.full(count, video_id, dtype=np.int32),
+            "frame": np.fromiter((d[0] for d in detections), np.int32, count),
+            "label_id": np.fromiter(
+                (self._label_id(d[1]["label"]) for d in detections), np.int32, count
+            ),
+            "conf": np.fromiter((d[1]["score"] for d in detections), np.float32, count),
+            "bbox": np.asarray([d[1]["bbox"] for d in detections], dtype=np.float32),
+        }
+        for name, values in columns.items():
+            values.tofile(self._files[name])
+        self.rows += count
+
+    def add_json(self, json_path: str) -> None:
+        with open(json_path, "r") as f:
+            frames = ujson.load(f)
+        self.add_video(os.path.splitext(os.path.basename(json_path))[0], frames)
+
+    def close(self) -> None:
+        """Finalise the columns and the lookup offsets, then swap the store in."""
+        for f in self._files.values():
+            f.close()
+
+        for name, (dtype, shape) in COLUMNS.items():
+            raw_path = os.path.join(self.tmp_dir, f"{name}.bin")
+            if self.rows:
+                raw = np.memmap(raw_path, dtype=dtype, mode="r", shape=(self.rows,) + shape)
+            else:
+                raw = np.empty((0,) + shape, dtype=dtype)
+            np.save(os.path.join(self.tmp_dir, f"{name}.npy"), raw)
+            del raw
+            os.remove(raw_path)
+
+        video_id = np.load(os.path.join(self.tmp_dir, "video_id.npy"), mmap_mode="r")
+        frame = np.load(os.path.join(self.tmp_dir, "frame.npy"), mmap_mode="r")
+        keys = _frame_key(video_id, frame)
+        # Rows are already grouped by (video, frame): boundaries are key changes
+        if self.rows:
+            starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        else:
+            starts = np.empty(0, dtype=np.int64)
+        np.save(os.path.join(self.tmp_dir, "keys.npy"), keys[starts].astype(np.int64))
+        np.save(
+            os.path.join(self.tmp_dir, "key_offsets.npy"),
+            np.r_[starts, self.rows].astype(np.int64),
+        )
+        del keys, video_id, frame
+
+        label_id = np.load(os.path.join(self.tmp_dir, "label_id.npy"))
+        conf = np.load(os.path.join(self.tmp_dir, "conf.npy"))
+        label_rows = np.lexsort((-conf, label_id)).astype(np.int64)
+        counts = np.bincount(label_id, minlength=len(self.labels))
+        np.save(os.path.join(self.tmp_dir, "label_rows.npy"), label_rows)
+        np.save(
+            os.path.join(self.tmp_dir, "label_offsets.npy"),
+            np.r_[0, np.cumsum(counts)].astype(np.int64),
+        )
+        del label_id, conf, label_rows
+
+        for name, values in [("videos", self.videos), ("labels", self.labels)]:
+            with open(os.path.join(self.tmp_dir, f"{name}.json"), "w") as f:
+                ujson.dump(values, f)
+
+        if os.path.isdir(self.output_dir):
+            shutil.rmtree(self.output_dir)
+        os.replace(self.tmp_dir, self.output_dir)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            for f in self._files.values():
+                f.close()
+            shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+def build_object_store(json_files: Iterable[str], output_dir: str) -> int:
+    """Build an object store from per-video detection JSON files. Returns the row count."""
+    with ObjectStoreWriter(output_dir) as writer:
+        for json_path in sorted(json_files):
+            writer.add_json(json_path)
+    return writer.rows
+
+
+class ObjectStore:
+    """
+    Read-only, memory-mapped view of an object store directory.
+
+    get(video, frame) returns the detections of one frame in the same shape
+    preprocess_object_dict produces ([{"object", "conf", "bbox"}]), and
+    label(label) lists the detections of one label by descending confidence
+    like an entry of the old total_json.json.
+    """
+
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+        load = lambda name: np.load(os.path.join(store_dir, f"{name}.npy"), mmap_mode="r")
+        for name in COLUMNS:
+            setattr(self, name, load(name))
+        self.keys = np.asarray(load("keys"))
+        self.key_offsets = np.asarray(load("key_offsets"))
+        self.label_rows = load("label_rows")
+        self.label_offsets = np.asarray(load("label_offsets"))
+        with open(os.path.join(store_dir, "videos.json")) as f:
+            self.videos: List[str] = ujson.load(f)
+        with open(os.path.join(store_dir, "labels.json")) as f:
+            self.labels: List[str] = ujson.load(f)
+        self.video_ids = {name: idx for idx, name in enumerate(self.videos)}
+        self.label_ids = {name: idx for idx, name in enumerate(self.labels)}
+
+    def __len__(self):
+        return len(self.conf)
+
+    def _rows(self, rows) -> List[Dict]:
+        label_id = self.label_id[rows]
+        conf = self.conf[rows]
+        bbox = self.bbox[rows]
+        return [
+            {
+                "object": self.labels[int(label_id[i])],
+                "conf": round(float(conf[i]), 3),
+                "bbox": [round(float(x), 2) for x in bbox[i]],
+            }
+            for i in range(len(label_id))
+        ]
+
+    def frame_rows(self, video: str, frame: int) -> Tuple[int, int]:
+        """Row range [start, end) of the detections of (video, frame)."""
+        video_id = self.video_ids.get(video)
+        if video_id is None:
+            return 0, 0
+        key = _frame_key(video_id, frame)
+        pos = np.searchsorted(self.keys, key)
+        if pos >= len(self.keys) or self.keys[pos] != key:
+            return 0, 0
+        return int(self.key_offsets[pos]), int(self.key_offsets[pos + 1])
+
+    def get(self, key: Tuple[str, int], default=None) -> Optional[List[Dict]]:
+        """Detections of key = (video, frame), dict.get style."""
+        start, end = self.frame_rows(key[0], int(key[1]))
+        if start == end:
+            return default
+        return self._rows(slice(start, end))
+
+    def label(self, label: str, min_conf: float = 0.0, limit: Optional[int] = None) -> List[Dict]:
+        """Detections of one label, highest confidence first."""
+        label_id = self.label_ids.get(label)
+        if label_id is None:
+            return []
+        rows = self.label_rows[self.label_offsets[label_id] : self.label_offsets[label_id + 1]]
+        if min_conf > 0:
+            # rows are sorted by confidence descending
+            keep = np.searchsorted(-self.conf[rows], -min_conf, side="right")
+            rows = rows[:keep]
+        if limit is not None:
+            rows = rows[:limit]
+        return [
+            {
+                "video": self.videos[int(self.video_id[row])],
+                "frame": f"{int(self.frame[row]):05d}",
+                "conf": round(float(self.conf[row]), 3),
+                "bbox": [round(float(x), 2) for x in self.bbox[row]],
+            }
+            for row in rows
+        ]
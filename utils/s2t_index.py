@@ -0,0 +1,340 @@
+import os
+import re
+import shutil
+import unicodedata
+import ujson
+import numpy as np
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pathlib import Path
+import sys
+
+current_path = Path(__file__).resolve()
+for parent in current_path.parents:
+    if parent.name == "SIU_Pumpking":
+        #print(f"Adding {parent} to sys.path")
+        sys.path.append(str(parent))
+        break
+else:
+    raise RuntimeError("Could not find 'SIU_Pumpking' in the path hierarchy.")
+
+# Layout of a transcript index directory (one document per keyframe / point id):
+#   videos.json        video vocabulary, row video_id -> "L01_V001"
+#   terms.json         term vocabulary, row term_id -> "ha_noi"
+#   doc_ids.npy        int64  (D,)    point id of every document
+#   doc_video.npy      int32  (D,)    video_id of every document
+#   doc_offsets.npy    int64  (D+1,)  forward index: terms of doc i are
+#   doc_terms.npy      int32  (T,)    doc_terms[doc_offsets[i]:doc_offsets[i+1]]
+#   post_offsets.npy   int64  (V+1,)  inverted index: postings of term j are
+#   post_docs.npy      int32  (P,)    post_docs / post_tf[post_offsets[j]:post_offsets[j+1]]
+#   post_tf.npy        uint16 (P,)    (document rows ascending)
+# The forward index lets one video be replaced without re-reading the others.
+FORWARD = ["doc_ids", "doc_video", "doc_offsets", "doc_terms"]
+INVERTED = ["post_offsets", "post_docs", "post_tf"]
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def fold_diacritics(text: str) -> str:
+    """'Hà Nội' -> 'ha noi'"""
+    text = unicodedata.normalize("NFD", text.lower())
+    text = "".join(ch for ch in text if unicodedata.category(ch) != "Mn")
+    return text.replace("đ", "d")
+
+
+def syllables(text: str) -> List[str]:
+    return _NON_WORD.sub(" ", fold_diacritics(text).replace("_", " ")).split()
+
+
+def transcript_terms(words) -> List[str]:
+    """
+    Index terms of a segmented transcript (["hà nội", "hôm nay"] or
+    "hà_nội hôm_nay"): every folded syllable plus every multi-syllable word
+    as one compound term ("ha_noi").
+    """
+    if isinstance(words, str):
+        words = words.split()
+    terms = []
+    for word in words:
+        parts = syllables(word)
+        terms.extend(parts)
+        if len(parts) > 1:
+            terms.append("_".join(parts))
+    return terms
+
+
+def folded_text(words) -> str:
+    """
+    Diacritic-folded syllables of a transcript (segmented word list or
+    string), space separated: the "s2t_folded" payload of a keyframe.
+    """
+    if not isinstance(words, str):
+        words = " ".join(words)
+    return " ".join(syllables(words))
+
+
+def query_terms(text: str, max_compound: int = 3) -> Tuple[List[str], List[str]]:
+    """
+    Split a raw query into folded syllables and candidate compounds (adjacent
+    syllable n-grams). The query is not word-segmented: compounds that are
+    not in the vocabulary simply match nothing.
+    """
+    parts = syllables(text)
+    compounds = [
+        "_".join(parts[i : i + n])
+        for n in range(2, max_compound + 1)
+        for i in range(len(parts) - n + 1)
+    ]
+    return parts, compounds
+
+
+def caption_terms(text: str, max_compound: int = 3) -> List[str]:
+    """
+    Index terms of free text that is not word-segmented (VLM captions):
+    every folded syllable plus every adjacent syllable n-gram, the same
+    compounds query_terms builds on the query side.
+    """
+    parts, compounds = query_terms(text or "", max_compound)
+    return parts + compounds
+
+
+class S2TIndexWriter:
+    """
+    Create or update a transcript index. Existing documents are kept unless
+    their video is passed to update_video / remove_video, so re-ingesting one
+    video only re-tokenizes that video; reset=True starts from an empty index
+    instead. terms turns one document into its index terms (transcript_terms
+    for segmented transcripts, caption_terms for captions).
+    """
+
+    def __init__(
+        self,
+        index_dir: str,
+        terms: Callable[..., List[str]] = transcript_terms,
+        reset: bool = False,
+    ):
+        self.index_dir = index_dir
+        self.terms_of = terms
+        self.videos: List[str] = []
+        self.terms: List[str] = []
+        self._removed = set()
+        self._new: Dict[str, Tuple[np.ndarray, List[List[int]]]] = {}
+        self._forward = None
+        if not reset and os.path.isfile(os.path.join(index_dir, "doc_ids.npy")):
+            load = lambda name: np.load(os.path.join(index_dir, f"{name}.npy"))
+            self._forward = {name: load(name) for name in FORWARD}
+            with open(os.path.join(index_dir, "videos.json")) as f:
+                self.videos = ujson.load(f)
+            with open(os.path.join(index_dir, "terms.json")) as f:
+                self.terms = ujson.load(f)
+        self._video_ids = {name: idx for idx, name in enumerate(self.videos)}
+        self._term_ids = {name: idx for idx, name in enumerate(self.terms)}
+
+    def _term_id(self, term: str) -> int:
+        if term not in self._term_ids:
+            self._term_ids[term] = len(self.terms)
+            self.terms.append(term)
+        return self._term_ids[term]
+
+    def _video_id(self, video: str) -> int:
+        if video not in self._video_ids:
+            self._video_ids[video] = len(self.videos)
+            self.videos.append(video)
+        return self._video_ids[video]
+
+    def update_video(self, video: str, point_ids: Sequence[int], transcripts: Sequence) -> None:
+        """(Re)place the documents of one video: one transcript per point id."""
+        video_id = self._video_id(video)
+        self._removed.add(video_id)
+        self._new[video] = (
+            np.asarray(point_ids, dtype=np.int64),
+            [[self._term_id(t) for t in self.terms_of(words)] for words in transcripts],
+        )
+
+    def remove_video(self, video: str) -> None:
+        if video in self._video_ids:
+            self._removed.add(self._video_ids[video])
+        self._new.pop(video, None)
+
+    def close(self) -> int:
+        """Merge, rebuild the postings and swap the index in. Returns the document count."""
+        parts_ids, parts_video, parts_len, parts_terms = [], [], [], []
+        if self._forward is not None:
+            keep = ~np.isin(self._forward["doc_video"], list(self._removed))
+            lengths = np.diff(self._forward["doc_offsets"])
+            term_keep = np.repeat(keep, lengths)
+            parts_ids.append(self._forward["doc_ids"][keep])
+            parts_video.append(self._forward["doc_video"][keep])
+            parts_len.append(lengths[keep])
+            parts_terms.append(self._forward["doc_terms"][term_keep])
+        for video, (point_ids, docs) in self._new.items():
+            parts_ids.append(point_ids)
+            parts_video.append(np.full(len(point_ids), self._video_ids[video], dtype=np.int32))
+            parts_len.append(np.array([len(doc) for doc in docs], dtype=np.int64))
+            parts_terms.append(np.fromiter((t for doc in docs for t in doc), np.int32))
+
+        concat = lambda parts, dtype: (
+            np.concatenate(parts).astype(dtype) if parts else np.empty(0, dtype=dtype)
+        )
+        doc_ids = concat(parts_ids, np.int64)
+        doc_video = concat(parts_video, np.int32)
+        doc_len = concat(parts_len, np.int64)
+        doc_terms = concat(parts_terms, np.int32)
+
+        # documents sorted by point id so id lookups are a searchsorted
+        order = np.argsort(doc_ids, kind="stable")
+        starts = np.r_[0, np.cumsum(doc_len)].astype(np.int64)[:-1]
+        doc_ids, doc_video, doc_len = doc_ids[order], doc_video[order], doc_len[order]
+        doc_offsets = np.r_[0, np.cumsum(doc_len)].astype(np.int64)
+        # gather the term runs in the new document order
+        gather = np.repeat(starts[order] - doc_offsets[:-1], doc_len) + np.arange(
+            doc_offsets[-1], dtype=np.int64
+        )
+        doc_terms = doc_terms[gather]
+
+        # inverted index: unique (term, doc) pairs with their counts
+        num_docs = len(doc_ids)
+        doc_rows = np.repeat(np.arange(num_docs, dtype=np.int64), doc_len)
+        pairs, tf = np.unique(
+            doc_terms.astype(np.int64) * max(num_docs, 1) + doc_rows, return_counts=True
+        )
+        post_terms = pairs // max(num_docs, 1)
+        post_docs = (pairs % max(num_docs, 1)).astype(np.int32)
+        post_offsets = np.searchsorted(
+            post_terms, np.arange(len(self.terms) + 1, dtype=np.int64)
+        ).astype(np.int64)
+
+        tmp_dir = self.index_dir + ".tmp"
+        if os.path.isdir(tmp_dir):
+            shutil.rmtree(tmp_dir)
+        os.makedirs(tmp_dir)
+        arrays = {
+            "doc_ids": doc_ids,
+            "doc_video": doc_video,
+            "doc_offsets": doc_offsets,
+            "doc_terms": doc_terms,
+            "post_offsets": post_offsets,
+            "post_docs": post_docs,
+            "post_tf": np.minimum(tf, np.iinfo(np.uint16).max).astype(np.uint16),
+        }
+        for name, values in arrays.items():
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), values)
+        for name, values in [("videos", self.videos), ("terms", self.terms)]:
+            with open(os.path.join(tmp_dir, f"{name}.json"), "w") as f:
+                ujson.dump(values, f, ensure_ascii=False)
+
+        if os.path.isdir(self.index_dir):
+            shutil.rmtree(self.index_dir)
+        os.replace(tmp_dir, self.index_dir)
+        return num_docs
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+
+
+class S2TIndex:
+    """
+    Read-only, memory-mapped BM25 index over keyframe transcripts.
+
+    match_ids(text) returns the point ids whose transcript contains every
+    (diacritic-folded) syllable of text, for use as a HasIdCondition
+    pre-filter. score(text) ranks documents by BM25, compounds included.
+    """
+
+    def __init__(self, index_dir: str, k1: float = 1.2, b: float = 0.75):
+        self.index_dir = index_dir
+        self.k1 = k1
+        self.b = b
+        load = lambda name: np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode="r")
+        for name in FORWARD + INVERTED:
+            setattr(self, name, load(name))
+        self.doc_ids = np.asarray(self.doc_ids)
+        self.post_offsets = np.asarray(self.post_offsets)
+        with open(os.path.join(index_dir, "terms.json")) as f:
+            self.terms: List[str] = ujson.load(f)
+        self.term_ids = {name: idx for idx, name in enumerate(self.terms)}
+
+        doc_len = np.diff(np.asarray(self.doc_offsets)).astype(np.float32)
+        avg_len = float(doc_len.mean()) if len(doc_len) else 0.0
+        # BM25 length normalisation, precomputed per document
+        self._norm = self.k1 * (1 - self.b + self.b * doc_len / max(avg_len, 1e-6))
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def _postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            return np.empty(0, np.int32), np.empty(0, np.uint16)
+        start, end = self.post_offsets[term_id], self.post_offsets[term_id + 1]
+        return self.post_docs[start:end], self.post_tf[start:end]
+
+    def match_rows(self, text: str) -> Optional[np.ndarray]:
+        """Document rows containing every syllable of text (None: nothing to match on)."""
+        parts, _ = query_terms(text)
+        if not parts:
+            return None
+        postings = sorted((self._postings(term)[0] for term in set(parts)), key=len)
+        rows = np.asarray(postings[0])
+        for other in postings[1:]:
+            if not len(rows):
+                break
+            rows = rows[np.isin(rows, other, assume_unique=True)]
+        return rows
+
+    def match_ids(self, text: str) -> Optional[List[int]]:
+        rows = self.match_rows(text)
+        return None if rows is None else self.doc_ids[rows].tolist()
+
+    def score(
+        self, text: str, limit: Optional[int] = None, ids: Optional[Iterable[int]] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        BM25 of text over all documents, or only over point `ids`. Returns
+        (point_ids, scores) of the matching documents, best first.
+        """
+        parts, compounds = query_terms(text)
+        num_docs = len(self.doc_ids)
+        scores = np.zeros(num_docs, dtype=np.float32)
+        for term in parts + compounds:
+            rows, tf = self._postings(term)
+            if not len(rows):
+                continue
+            idf = np.log(1.0 + (num_docs - len(rows) + 0.5) / (len(rows) + 0.5))
+            tf = np.asarray(tf, dtype=np.float32)
+            scores[rows] += idf * tf * (self.k1 + 1) / (tf + self._norm[rows])
+
+        if ids is not None:
+            rows = self.rows_of(ids)
+            rows = rows[scores[rows] > 0]
+        else:
+            rows = np.flatnonzero(scores > 0)
+        if limit is not None and len(rows) > limit:
+            rows = rows[np.argpartition(-scores[rows], limit - 1)[:limit]]
+        rows = rows[np.argsort(-scores[rows], kind="stable")]
+        return self.doc_ids[rows], scores[rows]
+
+    def rows_of(self, ids: Iterable[int]) -> np.ndarray:
+        """Document rows of point ids, ids without a document are dropped."""
+        ids = np.fromiter(ids, dtype=np.int64)
+        rows = np.searchsorted(self.doc_ids, ids)
+        found = rows < len(self.doc_ids)
+        found[found] = self.doc_ids[rows[found]] == ids[found]
+        return rows[found]
+
+
+def term_overlap(words, text: str, terms: Callable[..., List[str]] = transcript_terms) -> float:
+    """
+    Share of the query terms of text (syllables and compounds) found in a
+    document (a segmented transcript by default). Lexical score used when no
+    S2TIndex is available.
+    """
+    parts, compounds = query_terms(text)
+    query = set(parts + compounds)
+    if not query:
+        return 0.0
+    return len(query & set(terms(words))) / len(query)
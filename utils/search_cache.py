@@ -0,0 +1,66 @@
+import time
+import secrets
+import threading
+from collections import OrderedDict
+from typing import Any, List, Optional, Tuple
+
+
+class SearchCache:
+    """
+    In-process cache of complete result lists behind opaque cursor ids, so the
+    following pages of a search are a dictionary lookup instead of a new
+    encode + ANN search. Entries expire after ttl_seconds; past max_entries
+    entries or max_items cached results in total, the least recently used
+    entries are evicted.
+    """
+
+    def __init__(self, ttl_seconds: int = 600, max_entries: int = 256, max_items: int = 500_000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_items = max_items
+        self._entries: "OrderedDict[str, Tuple[float, List[Any]]]" = OrderedDict()
+        self._items = 0
+        self._lock = threading.Lock()
+
+    def _drop(self, cursor: str) -> None:
+        _, results = self._entries.pop(cursor)
+        self._items -= len(results)
+
+    def _evict(self, now: float) -> None:
+        for cursor in [c for c, (expires_at, _) in self._entries.items() if expires_at <= now]:
+            self._drop(cursor)
+        while self._entries and (
+            len(self._entries) > self.max_entries or self._items > self.max_items
+        ):
+            self._drop(next(iter(self._entries)))
+
+    def put(self, results: List[Any]) -> str:
+        """Cache a full result list and return its cursor id."""
+        cursor = secrets.token_urlsafe(12)
+        now = time.monotonic()
+        with self._lock:
+            self._entries[cursor] = (now + self.ttl_seconds, results)
+            self._items += len(results)
+            self._evict(now)
+        return cursor
+
+    def get(self, cursor: str) -> Optional[List[Any]]:
+        """Results of cursor, or None if unknown or expired."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(cursor)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                self._drop(cursor)
+                return None
+            self._entries.move_to_end(cursor)
+            return entry[1]
+
+
+def page_of(results: List[Any], offset: int = 0, page_size: Optional[int] = None):
+    """(page, next_page_offset) of a full result list; next_page_offset is None on the last page."""
+    if page_size is None:
+        return results[offset:], None
+    end = offset + page_size
+    return results[offset:end], (end if end < len(results) else None)
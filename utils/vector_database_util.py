@@ -1,6 +1,9 @@
 import os
+import re
 import ujson
 import json
+import hashlib
+import numpy as np
 from collections import defaultdict
 
 from pathlib import Path
@@ -96,6 +99,65 @@ def preprocess_object_dict(object_dict):
     }
 
 
+def object_label_key(label):
+    """
+    Payload-safe key for a detection label ("traffic light" -> "traffic_light"),
+    used under the object_count / object_max_conf payload fields.
+    """
+    return re.sub(r"[^0-9a-z]+", "_", str(label).strip().lower()).strip("_")
+
+
+def summarize_objects(objs, width=None, height=None):
+    """
+    Enrich the detections of one frame for filtering.
+
+    Args:
+        objs (list): [{"object", "conf", "bbox"}] with bbox = [x1, y1, x2, y2] in pixels.
+        width, height (int, optional): frame size used to normalise the geometry.
+
+    Returns:
+        dict: payload fields "object" (detections plus normalised "area", "cx",
+              "cy" when the frame size is known), "object_labels" (distinct
+              labels), "object_count" and "object_max_conf" (keyed by
+              object_label_key).
+    """
+    objects = []
+    counts = defaultdict(int)
+    max_conf = defaultdict(float)
+    for obj in objs:
+        obj = dict(obj)
+        if width and height:
+            x1, y1, x2, y2 = obj["bbox"]
+            obj["area"] = round(
+                max(0.0, x2 - x1) * max(0.0, y2 - y1) / float(width * height), 4
+            )
+            obj["cx"] = round((x1 + x2) / 2.0 / width, 4)
+            obj["cy"] = round((y1 + y2) / 2.0 / height, 4)
+        key = object_label_key(obj["object"])
+        counts[key] += 1
+        max_conf[key] = max(max_conf[key], float(obj["conf"]))
+        objects.append(obj)
+
+    return {
+        "object": objects,
+        "object_labels": sorted({obj["object"] for obj in objects}),
+        "object_count": dict(counts),
+        "object_max_conf": dict(max_conf),
+    }
+
+
+def shot_id(video_name, related_start_frame):
+    """
+    Integer id of a shot, stable across ingests: a 40-bit hash of the video
+    name (with or without ".mp4") above the 23-bit shot start frame.
+    """
+    video_name = str(video_name)
+    if video_name.endswith(".mp4"):
+        video_name = video_name[: -len(".mp4")]
+    digest = hashlib.blake2b(video_name.encode("utf-8"), digest_size=5).digest()
+    return (int.from_bytes(digest, "big") << 23) | (int(related_start_frame) & 0x7FFFFF)
+
+
 def preprocessing_text(model, text):
     text_feat_arr = model.get_text_features(text)
     text_feat_arr = text_feat_arr.reshape(1, -1).astype("float32")  # => float32
@@ -106,3 +168,107 @@ def preprocessing_image(model, image):
     image_feat_arr = model.get_image_features(image)
     image_feat_arr = image_feat_arr.reshape(1, -1).astype("float32")  # => float32
     return image_feat_arr[0]
+
+
+def rocchio(positives, negatives=None, query=None, alpha=1.0, beta=0.75, gamma=0.15):
+    """
+    Rocchio relevance feedback: alpha * query + beta * mean(positives)
+    - gamma * mean(negatives) over L2-normalised vectors, L2-normalised.
+    Every term is optional, but query or positives must be given.
+    """
+
+    def unit(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, np.shape(vectors)[-1])
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    refined = 0.0
+    if query is not None:
+        refined = refined + alpha * unit(query)[0]
+    if positives is not None and len(positives):
+        refined = refined + beta * unit(positives).mean(axis=0)
+    if negatives is not None and len(negatives):
+        refined -= gamma * unit(negatives).mean(axis=0)
+    return refined / max(float(np.linalg.norm(refined)), 1e-12)
+
+
+def fuse_scores(dense, lexical, method="rrf", weight=0.3, rrf_k=60):
+    """
+    Fuse dense and lexical scores of candidate point ids ({id: score} each).
+
+    "rrf": weighted reciprocal rank fusion, (1 - weight) / (rrf_k + dense rank)
+           + weight / (rrf_k + lexical rank); ids without a lexical match get
+           no lexical term.
+    "weighted": (1 - weight) * dense + weight * lexical, both min-max
+           normalised over the candidates.
+    """
+    ids = set(dense) | set(lexical)
+    if method == "rrf":
+        fused = dict.fromkeys(ids, 0.0)
+        dense_ranked = sorted(dense, key=dense.get, reverse=True)
+        lexical_ranked = sorted(
+            (i for i in lexical if lexical[i] > 0), key=lexical.get, reverse=True
+        )
+        for ranked, w in ((dense_ranked, 1.0 - weight), (lexical_ranked, weight)):
+            for rank, i in enumerate(ranked):
+                fused[i] += w / (rrf_k + rank + 1)
+        return fused
+
+    if method == "weighted":
+
+        def normalise(scores):
+            if not scores:
+                return {}
+            low, high = min(scores.values()), max(scores.values())
+            span = high - low
+            return {i: (s - low) / span if span else 1.0 for i, s in scores.items()}
+
+        dense_n, lexical_n = normalise(dense), normalise(lexical)
+        return {
+            i: (1.0 - weight) * dense_n.get(i, 0.0) + weight * lexical_n.get(i, 0.0)
+            for i in ids
+        }
+
+    raise ValueError(f"Unknown fusion method '{method}', expected 'rrf' or 'weighted'")
+
+
+def mmr_select(vectors, scores, k, diversity=0.0, groups=None, max_per_group=None):
+    """
+    Greedy maximal marginal relevance over candidate vectors (n, d).
+
+    Each step picks argmax (1 - diversity) * relevance - diversity * max
+    cosine similarity to the already selected items, relevance being scores
+    min-max normalised to [0, 1]. Candidates of a group (e.g. video) that
+    already holds max_per_group items are skipped. Returns the selected
+    row indices in selection order.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scores = np.asarray(scores, dtype=np.float32)
+    n = len(scores)
+    if n == 0:
+        return []
+
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    span = float(scores.max() - scores.min())
+    relevance = (scores - scores.min()) / span if span else np.ones(n, dtype=np.float32)
+
+    if groups is not None:
+        _, group_ids = np.unique(np.asarray(groups), return_inverse=True)
+        group_counts = np.zeros(group_ids.max() + 1, dtype=np.int64)
+    available = np.ones(n, dtype=bool)
+    max_similarity = np.zeros(n, dtype=np.float32)
+    selected = []
+    for _ in range(min(int(k), n)):
+        gain = (1.0 - diversity) * relevance - diversity * max_similarity
+        gain[~available] = -np.inf
+        best = int(np.argmax(gain))
+        if not np.isfinite(gain[best]):
+            break
+        selected.append(best)
+        available[best] = False
+        if diversity > 0:
+            np.maximum(max_similarity, vectors @ vectors[best], out=max_similarity)
+        if groups is not None and max_per_group:
+            group_counts[group_ids[best]] += 1
+            if group_counts[group_ids[best]] >= max_per_group:
+                available[group_ids == group_ids[best]] = False
+    return selected